@@ -17,6 +17,27 @@ GO
 --=====================================================================
 -----Drop all tables if they exist (in reverse dependency order)-------
 --=====================================================================
+DROP TABLE IF EXISTS dbo.Rollup_Watermark;
+DROP TABLE IF EXISTS dbo.Sales_Daily;
+DROP TABLE IF EXISTS dbo.Trending_Product;
+DROP TABLE IF EXISTS dbo.Product_Stats;
+DROP TABLE IF EXISTS dbo.Product_Hold;
+DROP TABLE IF EXISTS dbo.Pickup_Slot_Booking;
+DROP TABLE IF EXISTS dbo.Pickup_Slot;
+DROP TABLE IF EXISTS dbo.Saved_Search_Match;
+DROP TABLE IF EXISTS dbo.Saved_Search_Term;
+DROP TABLE IF EXISTS dbo.Saved_Search;
+DROP TABLE IF EXISTS dbo.Product_Similar;
+DROP TABLE IF EXISTS dbo.Escrow_Audit_Logs_Archive;
+DROP TABLE IF EXISTS dbo.Dispute_Evidence_Archive;
+DROP TABLE IF EXISTS dbo.Dispute_Archive;
+DROP TABLE IF EXISTS dbo.Rating_Archive;
+DROP TABLE IF EXISTS dbo.Order_Collection_Archive;
+DROP TABLE IF EXISTS dbo.Escrow_Archive;
+DROP TABLE IF EXISTS dbo.Order_Archive;
+DROP TABLE IF EXISTS dbo.Write_Behind_Applied;
+DROP TABLE IF EXISTS dbo.Replica_Heartbeat;
+DROP TABLE IF EXISTS dbo.User_Activity_Stats;
 DROP TABLE IF EXISTS dbo.Order_Collection;
 DROP TABLE IF EXISTS dbo.Dispute_Evidence;
 DROP TABLE IF EXISTS dbo.Dispute;
@@ -80,6 +101,7 @@ CREATE TABLE dbo.[User] (
     [Password] NVARCHAR(255) NULL,             -- plain password column (for demo; real systems should hash)
     Agg_Seller_Rating DECIMAL(3,2) DEFAULT (0.00),
     Email_ID NVARCHAR(255) NOT NULL UNIQUE,
+    Row_Version ROWVERSION,                     -- change tracking for the in-memory catalog (seller name/rating)
     FOREIGN KEY (CampusID) REFERENCES dbo.Campus(CampusID)
         ON DELETE NO ACTION
         ON UPDATE CASCADE
@@ -87,6 +109,8 @@ CREATE TABLE dbo.[User] (
 GO
 
 CREATE INDEX IX_User_Campus ON dbo.[User](CampusID);
+CREATE INDEX IX_User_Name   ON dbo.[User](User_Name);   -- prefix search in admin user directory
+CREATE INDEX IX_User_RowVersion ON dbo.[User](Row_Version);
 GO
 
 -- =====================================================
@@ -145,6 +169,9 @@ CREATE TABLE dbo.Product (
     Quantity INT NOT NULL,
     Product_Status NVARCHAR(20) NOT NULL,
     Created_date DATE NOT NULL,
+    Primary_Media_ID INT NULL,           -- denormalized cover image (Product_Media.Media_ID); no FK to avoid a cycle with Product_Media's cascade
+    Row_Version ROWVERSION,              -- bumped on every change; drives get_products_changed_since()
+    Rank_Score FLOAT NOT NULL DEFAULT (0),  -- "Recommended" sort; recomputed by python jobs.py refresh-rank-scores
     FOREIGN KEY (Category_ID) REFERENCES dbo.Category(Category_ID)
         ON DELETE NO ACTION
         ON UPDATE CASCADE,
@@ -160,6 +187,8 @@ GO
 CREATE INDEX IX_Product_Category ON dbo.Product(Category_ID);
 CREATE INDEX IX_Product_Seller   ON dbo.Product(Seller_ID);
 CREATE INDEX IX_Product_Status   ON dbo.Product(Product_Status);
+CREATE INDEX IX_Product_RowVersion ON dbo.Product(Row_Version);
+CREATE INDEX IX_Product_Rank     ON dbo.Product(Product_Status, Rank_Score DESC);
 GO
 
 -- =====================================================
@@ -190,6 +219,7 @@ CREATE TABLE dbo.[Order] (
     Order_Date  DATE NOT NULL,
     Quantity    INT  NOT NULL,
     Status      NVARCHAR(50) NOT NULL,
+    Row_Version ROWVERSION,      -- incremental Parquet export (python jobs.py export-parquet)
     FOREIGN KEY (Product_ID) REFERENCES dbo.Product(Product_ID)
         ON DELETE NO ACTION
         ON UPDATE CASCADE,          
@@ -207,7 +237,8 @@ GO
 CREATE INDEX IX_Order_Product ON dbo.[Order](Product_ID);
 CREATE INDEX IX_Order_Seller  ON dbo.[Order](Seller_ID);
 CREATE INDEX IX_Order_Buyer   ON dbo.[Order](Buyer_ID);
-CREATE INDEX IX_Order_Status  ON dbo.[Order](Status);
+CREATE INDEX IX_Order_Status  ON dbo.[Order](Status, Order_Date);   -- also drives the archival scan
+CREATE INDEX IX_Order_RowVersion ON dbo.[Order](Row_Version);
 GO
 
 -- ============================================================
@@ -220,6 +251,7 @@ CREATE TABLE dbo.Escrow (
     Status        NVARCHAR(20)  NOT NULL,
     Created_Date  DATETIME NOT NULL,
     Release_Date  DATETIME NULL,
+    Row_Version   ROWVERSION,     -- incremental Parquet export
     FOREIGN KEY (OrderID) REFERENCES dbo.[Order](OrderID)
         ON DELETE NO ACTION
         ON UPDATE CASCADE,
@@ -232,6 +264,7 @@ GO
 
 CREATE INDEX IX_Escrow_Order  ON dbo.Escrow(OrderID);
 CREATE INDEX IX_Escrow_Status ON dbo.Escrow(Status);
+CREATE INDEX IX_Escrow_RowVersion ON dbo.Escrow(Row_Version);
 GO
 
 -- =====================================================
@@ -248,6 +281,7 @@ CREATE TABLE dbo.Rating (
     Rated_UserID   INT NOT NULL,         -- must be the Seller of that Order
     Rating_Value   DECIMAL(3,2) NOT NULL,
     Rating_Date    DATE NOT NULL,
+    Row_Version    ROWVERSION,           -- incremental Parquet export
 
     -- Referential integrity
     CONSTRAINT FK_Rating_Order
@@ -266,6 +300,9 @@ CREATE TABLE dbo.Rating (
 );
 GO
 
+CREATE INDEX IX_Rating_RowVersion ON dbo.Rating(Row_Version);
+GO
+
 IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'UQ_Order_OrderID_Buyer')
     CREATE UNIQUE INDEX UQ_Order_OrderID_Buyer ON dbo.[Order](OrderID, Buyer_ID);
 GO
@@ -377,6 +414,7 @@ CREATE TABLE dbo.Dispute (
     Resolution_Details  NVARCHAR(MAX) NULL,          
     Resolved_Date       DATE NULL,
     Status              VARCHAR(50) NOT NULL,
+    Row_Version         ROWVERSION,                  -- incremental Parquet export
     FOREIGN KEY (EscrowID) REFERENCES dbo.Escrow(EscrowID)
         ON DELETE NO ACTION
         ON UPDATE NO ACTION,  
@@ -391,6 +429,8 @@ GO
 CREATE INDEX IX_Dispute_Escrow   ON dbo.Dispute(EscrowID);
 CREATE INDEX IX_Dispute_FiledBy  ON dbo.Dispute(FiledByUserID);
 CREATE INDEX IX_Dispute_Status   ON dbo.Dispute(Status);
+CREATE INDEX IX_Dispute_OpenDate ON dbo.Dispute(Open_Date) INCLUDE (EscrowID);   -- sales rollup
+CREATE INDEX IX_Dispute_RowVersion ON dbo.Dispute(Row_Version);
 GO
 
 -- =====================================================
@@ -433,6 +473,390 @@ GO
 
 CREATE INDEX IX_OrderCollection_Order       ON dbo.Order_Collection(Order_ID);
 CREATE INDEX IX_OrderCollection_PickupPoint ON dbo.Order_Collection(Pickup_Point_ID);
+CREATE INDEX IX_OrderCollection_Slot        ON dbo.Order_Collection(Pickup_Point_ID, Scheduled_Date, Scheduled_Time) INCLUDE (Order_ID);
+GO
+
+-- =============================================================================
+----------Table: User_Activity_Stats (1-to-1 with User, precomputed)------------
+-- =============================================================================
+-- Maintained incrementally by DatabaseManager on every product, order, escrow,
+-- rating and dispute write; rebuilt from scratch by
+--     python jobs.py rebuild-activity-stats
+-- Replaces the fan-out joins vw_User_Activity_Summary used to do per request.
+CREATE TABLE dbo.User_Activity_Stats (
+    UserID                   INT           NOT NULL PRIMARY KEY,
+    Total_Products_Listed    INT           NOT NULL DEFAULT (0),
+    Active_Listings          INT           NOT NULL DEFAULT (0),
+    Products_Sold            INT           NOT NULL DEFAULT (0),
+    Orders_As_Seller         INT           NOT NULL DEFAULT (0),
+    Total_Revenue_As_Seller  DECIMAL(12,2) NOT NULL DEFAULT (0),
+    Orders_As_Buyer          INT           NOT NULL DEFAULT (0),
+    Total_Spent_As_Buyer     DECIMAL(12,2) NOT NULL DEFAULT (0),
+    Ratings_Received_Count   INT           NOT NULL DEFAULT (0),
+    Ratings_Received_Sum     DECIMAL(12,2) NOT NULL DEFAULT (0),   -- average = Sum / Count
+    Ratings_Given_Count      INT           NOT NULL DEFAULT (0),
+    Disputes_Filed           INT           NOT NULL DEFAULT (0),
+    First_Listing_Date       DATE          NULL,
+    Last_Updated             DATETIME      NOT NULL DEFAULT (GETDATE()),
+    FOREIGN KEY (UserID) REFERENCES dbo.[User](UserID)
+        ON DELETE NO ACTION
+        ON UPDATE NO ACTION
+);
+GO
+
+-- =====================================================
+-----------------Table: Replica_Heartbeat----------------
+-- =====================================================
+-- Single row stamped on the primary by jobs.py replica-heartbeat; a read replica's
+-- copy of Beat_Time tells how far behind it is (staleness budget).
+CREATE TABLE dbo.Replica_Heartbeat (
+    Heartbeat_ID  INT        NOT NULL PRIMARY KEY CHECK (Heartbeat_ID = 1),
+    Beat_Time     DATETIME2  NOT NULL DEFAULT (SYSUTCDATETIME())
+);
+GO
+
+INSERT INTO dbo.Replica_Heartbeat (Heartbeat_ID) VALUES (1);
+GO
+
+-- =====================================================
+---------------Table: Write_Behind_Applied---------------
+-- =====================================================
+-- Idempotency keys of write-behind entries (write_behind.py) already
+-- applied, written in the same transaction as the entries themselves so
+-- a replayed batch is skipped. Keys older than 7 days are pruned.
+CREATE TABLE dbo.Write_Behind_Applied (
+    Idempotency_Key  NVARCHAR(100) NOT NULL PRIMARY KEY,
+    Applied_At       DATETIME2     NOT NULL DEFAULT (SYSUTCDATETIME())
+);
+GO
+
+CREATE INDEX IX_Write_Behind_Applied_At ON dbo.Write_Behind_Applied(Applied_At);
+GO
+
+-- =====================================================
+-------------------Archive tables------------------------
+-- =====================================================
+-- Cold copies of finished orders (Delivered/Cancelled with the escrow
+-- Released/Refunded and no open dispute) older than the archival cutoff,
+-- moved in batches by dbo.usp_ArchiveOrders
+-- (python jobs.py archive-orders). Same columns and keys as the hot
+-- tables, no IDENTITY, and no FKs so rows can be bulk-moved. History
+-- pages only read these when the user asks for older history.
+CREATE TABLE dbo.Order_Archive (
+    OrderID      INT          NOT NULL PRIMARY KEY,
+    Product_ID   INT          NOT NULL,
+    Seller_ID    INT          NOT NULL,
+    Buyer_ID     INT          NOT NULL,
+    Order_Date   DATE         NOT NULL,
+    Quantity     INT          NOT NULL,
+    Status       NVARCHAR(50) NOT NULL,
+    Archived_At  DATETIME2    NOT NULL DEFAULT (SYSUTCDATETIME()),
+    Row_Version  ROWVERSION   -- incremental Parquet export
+);
+GO
+
+CREATE INDEX IX_Order_Archive_Buyer  ON dbo.Order_Archive(Buyer_ID, OrderID);
+CREATE INDEX IX_Order_Archive_Seller ON dbo.Order_Archive(Seller_ID, OrderID);
+CREATE INDEX IX_Order_Archive_Date   ON dbo.Order_Archive(Order_Date);   -- sales rollup
+CREATE INDEX IX_Order_Archive_RowVersion ON dbo.Order_Archive(Row_Version);
+GO
+
+CREATE TABLE dbo.Escrow_Archive (
+    EscrowID      INT           NOT NULL PRIMARY KEY,
+    OrderID       INT           NOT NULL UNIQUE,
+    Amount        DECIMAL(10,2) NOT NULL,
+    Status        NVARCHAR(20)  NOT NULL,
+    Created_Date  DATETIME      NOT NULL,
+    Release_Date  DATETIME      NULL,
+    Row_Version   ROWVERSION
+);
+GO
+
+CREATE INDEX IX_Escrow_Archive_RowVersion ON dbo.Escrow_Archive(Row_Version);
+GO
+
+CREATE TABLE dbo.Order_Collection_Archive (
+    Collection_ID    INT  NOT NULL PRIMARY KEY,
+    Order_ID         INT  NOT NULL UNIQUE,
+    Pickup_Point_ID  INT  NOT NULL,
+    Scheduled_Time   TIME NULL,
+    Scheduled_Date   DATE NULL
+);
+GO
+
+CREATE TABLE dbo.Rating_Archive (
+    RatingID      INT          NOT NULL PRIMARY KEY,
+    Order_ID      INT          NOT NULL UNIQUE,
+    Rater_UserID  INT          NOT NULL,
+    Rated_UserID  INT          NOT NULL,
+    Rating_Value  DECIMAL(3,2) NOT NULL,
+    Rating_Date   DATE         NOT NULL,
+    Row_Version   ROWVERSION
+);
+GO
+
+CREATE INDEX IX_Rating_Archive_RowVersion ON dbo.Rating_Archive(Row_Version);
+GO
+
+-- Seller average (ufn_GetSellerAverageRating) still counts archived ratings
+CREATE INDEX IX_Rating_Archive_Rated ON dbo.Rating_Archive(Rated_UserID) INCLUDE (Rating_Value);
+GO
+
+CREATE TABLE dbo.Dispute_Archive (
+    Dispute_ID          INT           NOT NULL PRIMARY KEY,
+    EscrowID            INT           NOT NULL,
+    FiledByUserID       INT           NOT NULL,
+    Description         NVARCHAR(MAX) NOT NULL,
+    Open_Date           DATE          NOT NULL,
+    Resolution_Details  NVARCHAR(MAX) NULL,
+    Resolved_Date       DATE          NULL,
+    Status              VARCHAR(50)   NOT NULL,
+    Row_Version         ROWVERSION
+);
+GO
+
+CREATE INDEX IX_Dispute_Archive_RowVersion ON dbo.Dispute_Archive(Row_Version);
+CREATE INDEX IX_Dispute_Archive_FiledBy ON dbo.Dispute_Archive(FiledByUserID);
+CREATE INDEX IX_Dispute_Archive_Escrow  ON dbo.Dispute_Archive(EscrowID);
+CREATE INDEX IX_Dispute_Archive_OpenDate ON dbo.Dispute_Archive(Open_Date) INCLUDE (EscrowID);
+GO
+
+CREATE TABLE dbo.Dispute_Evidence_Archive (
+    Evidence_ID  INT          NOT NULL PRIMARY KEY,
+    Dispute_ID   INT          NOT NULL,
+    Media_link   VARCHAR(500) NOT NULL,
+    Media_Type   VARCHAR(50)  NOT NULL
+);
+GO
+
+CREATE TABLE dbo.Escrow_Audit_Logs_Archive (
+    Escrow_Audit_ID      INT          NOT NULL PRIMARY KEY,
+    Performed_By_UserID  INT          NOT NULL,
+    Escrow_ID            INT          NOT NULL,
+    [Timestamp]          DATETIME     NOT NULL,
+    Field_Change         VARCHAR(100) NOT NULL,
+    Old_status           VARCHAR(20)  NULL,
+    New_status           VARCHAR(20)  NULL
+);
+GO
+
+CREATE INDEX IX_Escrow_Audit_Archive_Escrow ON dbo.Escrow_Audit_Logs_Archive(Escrow_ID);
+CREATE INDEX IX_Escrow_Audit_Archive_Timestamp ON dbo.Escrow_Audit_Logs_Archive([Timestamp]);
+GO
+
+-- =====================================================
+-----------------Table: Product_Similar-----------------
+-- =====================================================
+-- Precomputed "Similar listings": up to k neighbors per product, ranked
+-- by TF-IDF cosine over name, description and category. Written only by
+-- python jobs.py build-similar-items; the product page reads one
+-- product's rows with a clustered-key seek. No FKs, so rebuilds never
+-- contend with catalog writes; rows for products that are no longer
+-- Active are filtered out on read and dropped at the next full rebuild.
+CREATE TABLE dbo.Product_Similar (
+    Product_ID          INT     NOT NULL,
+    Rank                TINYINT NOT NULL,
+    Similar_Product_ID  INT     NOT NULL,
+    Score               REAL    NOT NULL,
+    CONSTRAINT PK_Product_Similar PRIMARY KEY (Product_ID, Rank)
+);
+GO
+
+-- =====================================================
+------------------Table: Saved_Search-------------------
+-- =====================================================
+-- A buyer's saved marketplace search: words, optional category and
+-- max price. Term_Count is how many Saved_Search_Term rows it has; a new
+-- listing matches when it hits all of them.
+CREATE TABLE dbo.Saved_Search (
+    Saved_Search_ID  INT IDENTITY(1,1) PRIMARY KEY,
+    UserID           INT            NOT NULL,
+    Query            NVARCHAR(200)  NOT NULL DEFAULT (N''),
+    Category_ID      INT            NULL,
+    Max_Price        DECIMAL(10,2)  NULL,
+    Term_Count       TINYINT        NOT NULL,
+    Created_At       DATETIME2      NOT NULL DEFAULT (SYSUTCDATETIME()),
+    FOREIGN KEY (UserID) REFERENCES dbo.[User](UserID)
+        ON DELETE CASCADE,
+    FOREIGN KEY (Category_ID) REFERENCES dbo.Category(Category_ID)
+);
+GO
+
+CREATE INDEX IX_Saved_Search_User ON dbo.Saved_Search(UserID);
+GO
+
+-- =====================================================
+----------------Table: Saved_Search_Term----------------
+-- =====================================================
+-- Reverse index for percolating new listings: one row per word of each
+-- saved search, plus '#c<Category_ID>' when it has a category. Keyed by
+-- term, so a listing only touches the searches that share its words.
+CREATE TABLE dbo.Saved_Search_Term (
+    Term             NVARCHAR(50) NOT NULL,
+    Saved_Search_ID  INT          NOT NULL,
+    CONSTRAINT PK_Saved_Search_Term PRIMARY KEY (Term, Saved_Search_ID),
+    FOREIGN KEY (Saved_Search_ID) REFERENCES dbo.Saved_Search(Saved_Search_ID)
+        ON DELETE CASCADE
+);
+GO
+
+-- =====================================================
+----------------Table: Saved_Search_Match---------------
+-- =====================================================
+-- Per-user inbox of listings that matched a saved search when they were
+-- added. UserID is copied from Saved_Search so the sidebar reads one
+-- index range; Product_ID has no FK, like Product_Similar.
+CREATE TABLE dbo.Saved_Search_Match (
+    Saved_Search_ID  INT        NOT NULL,
+    Product_ID       INT        NOT NULL,
+    UserID           INT        NOT NULL,
+    Matched_At       DATETIME2  NOT NULL DEFAULT (SYSUTCDATETIME()),
+    Is_Seen          BIT        NOT NULL DEFAULT (0),
+    CONSTRAINT PK_Saved_Search_Match PRIMARY KEY (Saved_Search_ID, Product_ID),
+    FOREIGN KEY (Saved_Search_ID) REFERENCES dbo.Saved_Search(Saved_Search_ID)
+        ON DELETE CASCADE
+);
+GO
+
+CREATE INDEX IX_Saved_Search_Match_Inbox ON dbo.Saved_Search_Match(UserID, Is_Seen, Matched_At DESC) INCLUDE (Product_ID);
+GO
+
+-- =====================================================
+-------------------Table: Pickup_Slot-------------------
+-- =====================================================
+-- Weekly pickup slots a location offers: one row per weekday and start
+-- time, with how many pickups it can take. Weekday is 0 = Monday ...
+-- 6 = Sunday (Python's date.weekday(), independent of @@DATEFIRST).
+CREATE TABLE dbo.Pickup_Slot (
+    Pickup_Point_ID  INT       NOT NULL,
+    Weekday          TINYINT   NOT NULL,
+    Start_Time       TIME(0)   NOT NULL,
+    Slot_Minutes     SMALLINT  NOT NULL DEFAULT (30),
+    Capacity         SMALLINT  NOT NULL,
+    CONSTRAINT PK_Pickup_Slot PRIMARY KEY (Pickup_Point_ID, Weekday, Start_Time),
+    FOREIGN KEY (Pickup_Point_ID) REFERENCES dbo.Pickup_Point(PickupPointID)
+        ON DELETE CASCADE,
+    CONSTRAINT CHK_Pickup_Slot_Weekday  CHECK (Weekday BETWEEN 0 AND 6),
+    CONSTRAINT CHK_Pickup_Slot_Minutes  CHECK (Slot_Minutes > 0),
+    CONSTRAINT CHK_Pickup_Slot_Capacity CHECK (Capacity > 0)
+);
+GO
+
+-- =====================================================
+---------------Table: Pickup_Slot_Booking---------------
+-- =====================================================
+-- Occupancy counter per slot and day, created from Pickup_Slot on the
+-- first booking and incremented in the checkout transaction. Availability
+-- for a day is one key range here, however many collections exist.
+CREATE TABLE dbo.Pickup_Slot_Booking (
+    Pickup_Point_ID  INT       NOT NULL,
+    Slot_Date        DATE      NOT NULL,
+    Start_Time       TIME(0)   NOT NULL,
+    Capacity         SMALLINT  NOT NULL,
+    Booked           SMALLINT  NOT NULL DEFAULT (0),
+    CONSTRAINT PK_Pickup_Slot_Booking PRIMARY KEY (Pickup_Point_ID, Slot_Date, Start_Time),
+    FOREIGN KEY (Pickup_Point_ID) REFERENCES dbo.Pickup_Point(PickupPointID)
+        ON DELETE CASCADE,
+    CONSTRAINT CHK_Pickup_Slot_Booking_Booked CHECK (Booked BETWEEN 0 AND Capacity)
+);
+GO
+
+-- =====================================================
+------------------Table: Product_Hold-------------------
+-- =====================================================
+-- Short-lived reservations: units a buyer put in their cart, held for a
+-- few minutes (Expires_At, UTC) so other buyers can't take them mid-
+-- checkout. Available = Product.Quantity - SUM(active holds), one range
+-- seek on the primary key. Checkout deletes the buyer's holds as it
+-- turns them into orders; python jobs.py sweep-escrows deletes expired ones.
+CREATE TABLE dbo.Product_Hold (
+    Product_ID  INT        NOT NULL,
+    UserID      INT        NOT NULL,
+    Quantity    INT        NOT NULL,
+    Expires_At  DATETIME2  NOT NULL,
+    Created_At  DATETIME2  NOT NULL DEFAULT (SYSUTCDATETIME()),
+    CONSTRAINT PK_Product_Hold PRIMARY KEY (Product_ID, UserID),
+    FOREIGN KEY (Product_ID) REFERENCES dbo.Product(Product_ID)
+        ON DELETE CASCADE,
+    FOREIGN KEY (UserID) REFERENCES dbo.[User](UserID),
+    CONSTRAINT CHK_Product_Hold_Quantity CHECK (Quantity > 0)
+);
+GO
+
+CREATE INDEX IX_Product_Hold_Expires ON dbo.Product_Hold(Expires_At);
+GO
+
+-- =====================================================
+------------------Table: Product_Stats------------------
+-- =====================================================
+-- Hourly view and click counts per listing. Each app process counts in
+-- memory (view_counters.py) and adds its totals here with one MERGE per
+-- flush, so a page view never writes on its own. Clustered on the bucket
+-- first: the trending refresh reads a recent time range and the flushes
+-- only touch the newest buckets. No FK, like Product_Similar; old buckets
+-- are deleted by python jobs.py refresh-trending.
+CREATE TABLE dbo.Product_Stats (
+    Bucket_Start  DATETIME2(0) NOT NULL,
+    Product_ID    INT          NOT NULL,
+    Views         INT          NOT NULL DEFAULT (0),
+    Clicks        INT          NOT NULL DEFAULT (0),
+    CONSTRAINT PK_Product_Stats PRIMARY KEY (Bucket_Start, Product_ID)
+);
+GO
+
+-- =====================================================
+-----------------Table: Trending_Product----------------
+-- =====================================================
+-- Precomputed "Trending on campus": top listings per seller campus by
+-- decayed Product_Stats activity, plus an all-campus list under
+-- Campus_ID 0. Rewritten by python jobs.py refresh-trending; the
+-- marketplace reads one campus with a clustered-key seek.
+CREATE TABLE dbo.Trending_Product (
+    Campus_ID     INT        NOT NULL,
+    Rank          SMALLINT   NOT NULL,
+    Product_ID    INT        NOT NULL,
+    Score         FLOAT      NOT NULL,
+    Refreshed_At  DATETIME2  NOT NULL DEFAULT (SYSUTCDATETIME()),
+    CONSTRAINT PK_Trending_Product PRIMARY KEY (Campus_ID, Rank)
+);
+GO
+
+-- =====================================================
+-------------------Table: Sales_Daily-------------------
+-- =====================================================
+-- Daily sales rollup per category and seller campus for the admin
+-- Analytics tab, so reports never scan the order tables. Each measure is
+-- dated by its own event: Orders/Units/GMV by Order_Date, Refunds by the
+-- day the escrow was refunded, Disputes by Open_Date. Maintained by
+-- python jobs.py rollup-sales, which recomputes a range of days at a time
+-- and keeps going from Rollup_Watermark; archived orders stay counted.
+CREATE TABLE dbo.Sales_Daily (
+    Sales_Date     DATE           NOT NULL,
+    Category_ID    INT            NOT NULL,
+    CampusID       INT            NOT NULL,
+    Orders         INT            NOT NULL DEFAULT (0),
+    Units          INT            NOT NULL DEFAULT (0),
+    GMV            DECIMAL(14,2)  NOT NULL DEFAULT (0),
+    Refunds        INT            NOT NULL DEFAULT (0),
+    Refund_Amount  DECIMAL(14,2)  NOT NULL DEFAULT (0),
+    Disputes       INT            NOT NULL DEFAULT (0),
+    CONSTRAINT PK_Sales_Daily PRIMARY KEY (Sales_Date, Category_ID, CampusID),
+    FOREIGN KEY (Category_ID) REFERENCES dbo.Category(Category_ID),
+    FOREIGN KEY (CampusID) REFERENCES dbo.Campus(CampusID)
+);
+GO
+
+-- =====================================================
+-----------------Table: Rollup_Watermark----------------
+-- =====================================================
+-- Last day each rollup has been computed through. Moved in the same
+-- transaction as the rows it covers, so an interrupted job resumes from
+-- the last finished range.
+CREATE TABLE dbo.Rollup_Watermark (
+    Rollup_Name        VARCHAR(50)  NOT NULL PRIMARY KEY,
+    Rolled_Up_Through  DATE         NOT NULL,
+    Updated_At         DATETIME2    NOT NULL DEFAULT (SYSUTCDATETIME())
+);
 GO
 
 -- =====================================================
@@ -23,6 +23,33 @@ CREATE INDEX IX_User_Campus
 ON dbo.[User](CampusID);
 GO
 
+-- Prefix search (User_Name LIKE 'abc%') for the admin user directory.
+-- Email_ID prefix search uses the UNIQUE constraint's index.
+IF EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_User_Name'
+      AND object_id = OBJECT_ID('dbo.[User]')
+)
+    DROP INDEX IX_User_Name ON dbo.[User];
+GO
+
+CREATE INDEX IX_User_Name 
+ON dbo.[User](User_Name);
+GO
+
+-- Delta catalog sync: seller changes since a rowversion watermark.
+IF EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_User_RowVersion'
+      AND object_id = OBJECT_ID('dbo.[User]')
+)
+    DROP INDEX IX_User_RowVersion ON dbo.[User];
+GO
+
+CREATE INDEX IX_User_RowVersion 
+ON dbo.[User](Row_Version);
+GO
+
 /* ============================
    Pickup_Point table indexes
    ============================ */
@@ -89,6 +116,32 @@ CREATE INDEX IX_Product_Status
 ON dbo.Product(Product_Status);
 GO
 
+-- "Recommended" sort: active listings by precomputed Rank_Score.
+IF EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Product_Rank'
+      AND object_id = OBJECT_ID('dbo.Product')
+)
+    DROP INDEX IX_Product_Rank ON dbo.Product;
+GO
+
+CREATE INDEX IX_Product_Rank 
+ON dbo.Product(Product_Status, Rank_Score DESC);
+GO
+
+-- Delta catalog sync: listings changed since a rowversion watermark.
+IF EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Product_RowVersion'
+      AND object_id = OBJECT_ID('dbo.Product')
+)
+    DROP INDEX IX_Product_RowVersion ON dbo.Product;
+GO
+
+CREATE INDEX IX_Product_RowVersion 
+ON dbo.Product(Row_Version);
+GO
+
 /* ============================
    Product_Media table indexes
    ============================ */
@@ -151,8 +204,9 @@ IF EXISTS (
     DROP INDEX IX_Order_Status ON dbo.[Order];
 GO
 
+-- Order_Date second so the archival scan (usp_ArchiveOrders) is a range seek
 CREATE INDEX IX_Order_Status  
-ON dbo.[Order](Status);
+ON dbo.[Order](Status, Order_Date);
 GO
 
 -- Unique indexes for composite FKs (used by Rating)
@@ -324,6 +378,19 @@ CREATE INDEX IX_Dispute_Status
 ON dbo.Dispute(Status);
 GO
 
+-- Disputes opened per day (python jobs.py rollup-sales).
+IF EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Dispute_OpenDate'
+      AND object_id = OBJECT_ID('dbo.Dispute')
+)
+    DROP INDEX IX_Dispute_OpenDate ON dbo.Dispute;
+GO
+
+CREATE INDEX IX_Dispute_OpenDate
+ON dbo.Dispute(Open_Date) INCLUDE (EscrowID);
+GO
+
 /* ============================
    Dispute_Evidence indexes
    ============================ */
@@ -365,3 +432,236 @@ GO
 CREATE INDEX IX_OrderCollection_PickupPoint 
 ON dbo.Order_Collection(Pickup_Point_ID);
 GO
+
+-- Pickups at a location on a day (slot manifests)
+IF EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_OrderCollection_Slot'
+      AND object_id = OBJECT_ID('dbo.Order_Collection')
+)
+    DROP INDEX IX_OrderCollection_Slot ON dbo.Order_Collection;
+GO
+
+CREATE INDEX IX_OrderCollection_Slot
+ON dbo.Order_Collection(Pickup_Point_ID, Scheduled_Date, Scheduled_Time) INCLUDE (Order_ID);
+GO
+
+/* ============================
+   Saved search indexes
+   ============================ */
+IF EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Saved_Search_User'
+      AND object_id = OBJECT_ID('dbo.Saved_Search')
+)
+    DROP INDEX IX_Saved_Search_User ON dbo.Saved_Search;
+GO
+
+CREATE INDEX IX_Saved_Search_User
+ON dbo.Saved_Search(UserID);
+GO
+
+-- Sidebar inbox: a user's unseen matches, newest first.
+IF EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Saved_Search_Match_Inbox'
+      AND object_id = OBJECT_ID('dbo.Saved_Search_Match')
+)
+    DROP INDEX IX_Saved_Search_Match_Inbox ON dbo.Saved_Search_Match;
+GO
+
+CREATE INDEX IX_Saved_Search_Match_Inbox
+ON dbo.Saved_Search_Match(UserID, Is_Seen, Matched_At DESC) INCLUDE (Product_ID);
+GO
+
+/* ============================
+   Product_Hold indexes
+   ============================ */
+-- Expired-hold sweep (python jobs.py sweep-escrows).
+IF EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Product_Hold_Expires'
+      AND object_id = OBJECT_ID('dbo.Product_Hold')
+)
+    DROP INDEX IX_Product_Hold_Expires ON dbo.Product_Hold;
+GO
+
+CREATE INDEX IX_Product_Hold_Expires
+ON dbo.Product_Hold(Expires_At);
+GO
+
+/* ============================
+   Archive indexes for the sales rollup
+   ============================ */
+-- python jobs.py rollup-sales reads each day range from the hot and the
+-- archive tables alike.
+IF EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Order_Archive_Date'
+      AND object_id = OBJECT_ID('dbo.Order_Archive')
+)
+    DROP INDEX IX_Order_Archive_Date ON dbo.Order_Archive;
+GO
+
+CREATE INDEX IX_Order_Archive_Date
+ON dbo.Order_Archive(Order_Date);
+GO
+
+IF EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Dispute_Archive_OpenDate'
+      AND object_id = OBJECT_ID('dbo.Dispute_Archive')
+)
+    DROP INDEX IX_Dispute_Archive_OpenDate ON dbo.Dispute_Archive;
+GO
+
+CREATE INDEX IX_Dispute_Archive_OpenDate
+ON dbo.Dispute_Archive(Open_Date) INCLUDE (EscrowID);
+GO
+
+IF EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Escrow_Audit_Archive_Timestamp'
+      AND object_id = OBJECT_ID('dbo.Escrow_Audit_Logs_Archive')
+)
+    DROP INDEX IX_Escrow_Audit_Archive_Timestamp ON dbo.Escrow_Audit_Logs_Archive;
+GO
+
+CREATE INDEX IX_Escrow_Audit_Archive_Timestamp
+ON dbo.Escrow_Audit_Logs_Archive([Timestamp]);
+GO
+
+/* ============================
+   Row_Version indexes for the Parquet export
+   ============================ */
+-- python jobs.py export-parquet pages each table in Row_Version order.
+-- Databases created before the column existed get it here first.
+IF COL_LENGTH('dbo.[Order]', 'Row_Version') IS NULL
+    ALTER TABLE dbo.[Order] ADD Row_Version ROWVERSION;
+GO
+
+IF EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Order_RowVersion'
+      AND object_id = OBJECT_ID('dbo.[Order]')
+)
+    DROP INDEX IX_Order_RowVersion ON dbo.[Order];
+GO
+
+CREATE INDEX IX_Order_RowVersion
+ON dbo.[Order](Row_Version);
+GO
+
+IF COL_LENGTH('dbo.Escrow', 'Row_Version') IS NULL
+    ALTER TABLE dbo.Escrow ADD Row_Version ROWVERSION;
+GO
+
+IF EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Escrow_RowVersion'
+      AND object_id = OBJECT_ID('dbo.Escrow')
+)
+    DROP INDEX IX_Escrow_RowVersion ON dbo.Escrow;
+GO
+
+CREATE INDEX IX_Escrow_RowVersion
+ON dbo.Escrow(Row_Version);
+GO
+
+IF COL_LENGTH('dbo.Rating', 'Row_Version') IS NULL
+    ALTER TABLE dbo.Rating ADD Row_Version ROWVERSION;
+GO
+
+IF EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Rating_RowVersion'
+      AND object_id = OBJECT_ID('dbo.Rating')
+)
+    DROP INDEX IX_Rating_RowVersion ON dbo.Rating;
+GO
+
+CREATE INDEX IX_Rating_RowVersion
+ON dbo.Rating(Row_Version);
+GO
+
+IF COL_LENGTH('dbo.Dispute', 'Row_Version') IS NULL
+    ALTER TABLE dbo.Dispute ADD Row_Version ROWVERSION;
+GO
+
+IF EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Dispute_RowVersion'
+      AND object_id = OBJECT_ID('dbo.Dispute')
+)
+    DROP INDEX IX_Dispute_RowVersion ON dbo.Dispute;
+GO
+
+CREATE INDEX IX_Dispute_RowVersion
+ON dbo.Dispute(Row_Version);
+GO
+
+-- Archive tables are exported the same way, so history moved by
+-- python jobs.py archive-orders is in the files too.
+IF COL_LENGTH('dbo.Order_Archive', 'Row_Version') IS NULL
+    ALTER TABLE dbo.Order_Archive ADD Row_Version ROWVERSION;
+GO
+
+IF EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Order_Archive_RowVersion'
+      AND object_id = OBJECT_ID('dbo.Order_Archive')
+)
+    DROP INDEX IX_Order_Archive_RowVersion ON dbo.Order_Archive;
+GO
+
+CREATE INDEX IX_Order_Archive_RowVersion
+ON dbo.Order_Archive(Row_Version);
+GO
+
+IF COL_LENGTH('dbo.Escrow_Archive', 'Row_Version') IS NULL
+    ALTER TABLE dbo.Escrow_Archive ADD Row_Version ROWVERSION;
+GO
+
+IF EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Escrow_Archive_RowVersion'
+      AND object_id = OBJECT_ID('dbo.Escrow_Archive')
+)
+    DROP INDEX IX_Escrow_Archive_RowVersion ON dbo.Escrow_Archive;
+GO
+
+CREATE INDEX IX_Escrow_Archive_RowVersion
+ON dbo.Escrow_Archive(Row_Version);
+GO
+
+IF COL_LENGTH('dbo.Rating_Archive', 'Row_Version') IS NULL
+    ALTER TABLE dbo.Rating_Archive ADD Row_Version ROWVERSION;
+GO
+
+IF EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Rating_Archive_RowVersion'
+      AND object_id = OBJECT_ID('dbo.Rating_Archive')
+)
+    DROP INDEX IX_Rating_Archive_RowVersion ON dbo.Rating_Archive;
+GO
+
+CREATE INDEX IX_Rating_Archive_RowVersion
+ON dbo.Rating_Archive(Row_Version);
+GO
+
+IF COL_LENGTH('dbo.Dispute_Archive', 'Row_Version') IS NULL
+    ALTER TABLE dbo.Dispute_Archive ADD Row_Version ROWVERSION;
+GO
+
+IF EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Dispute_Archive_RowVersion'
+      AND object_id = OBJECT_ID('dbo.Dispute_Archive')
+)
+    DROP INDEX IX_Dispute_Archive_RowVersion ON dbo.Dispute_Archive;
+GO
+
+CREATE INDEX IX_Dispute_Archive_RowVersion
+ON dbo.Dispute_Archive(Row_Version);
+GO
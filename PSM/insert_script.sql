@@ -159,6 +159,16 @@ INSERT INTO Product_Media (Product_ID, Media_link, Media_Type) VALUES
 (14, 'https://cdn.marketplace.neu.edu/products/canon-t7-camera-kit.jpg', 'image/jpeg'),
 (15, 'https://cdn.marketplace.neu.edu/products/lab-goggles-safety-set.jpg', 'image/jpeg');
 
+-- Denormalize each product's first image as its cover (Primary_Media_ID)
+UPDATE p
+SET Primary_Media_ID = m.Media_ID
+FROM Product p
+JOIN (
+    SELECT Product_ID, MIN(Media_ID) AS Media_ID
+    FROM Product_Media
+    GROUP BY Product_ID
+) m ON m.Product_ID = p.Product_ID;
+
 -- =====================================================
 -- Insert Orders (15 rows)
 -- Status must be: 'Confirmed', 'Delivered', or 'Cancelled'
@@ -356,6 +366,17 @@ INSERT INTO Order_Collection (Order_ID, Pickup_Point_ID, Scheduled_Time, Schedul
 (14, 14, '14:30:00', '2024-10-26'),
 (15, 15, '10:00:00', '2024-10-29');
 
+-- =====================================================
+-- Insert Pickup Slots
+-- Every pickup point, Monday-Friday, half-hour slots from
+-- 10:00 to 17:30, 4 pickups each
+-- =====================================================
+INSERT INTO Pickup_Slot (Pickup_Point_ID, Weekday, Start_Time, Slot_Minutes, Capacity)
+SELECT pp.PickupPointID, d.Weekday, DATEADD(MINUTE, 30 * h.n, CAST('10:00' AS TIME(0))), 30, 4
+FROM Pickup_Point pp
+CROSS JOIN (VALUES (0), (1), (2), (3), (4)) d(Weekday)
+CROSS JOIN (VALUES (0), (1), (2), (3), (4), (5), (6), (7), (8), (9), (10), (11), (12), (13), (14), (15)) h(n);
+
 -- =====================================================
 -- Data Insertion Complete
 -- =====================================================
\ No newline at end of file
@@ -728,10 +728,14 @@ AS
 BEGIN
     DECLARE @Avg DECIMAL(4,2);
 
+    -- Ratings on archived orders (usp_ArchiveOrders) still count
     SELECT 
         @Avg = AVG(CAST(Rating_Value AS DECIMAL(4,2)))
-    FROM dbo.Rating
-    WHERE Rated_UserID = @SellerID;
+    FROM (
+        SELECT Rating_Value FROM dbo.Rating WHERE Rated_UserID = @SellerID
+        UNION ALL
+        SELECT Rating_Value FROM dbo.Rating_Archive WHERE Rated_UserID = @SellerID
+    ) r;
 
     RETURN ISNULL(@Avg, 0.00);
 END;
@@ -812,14 +816,12 @@ SELECT
    u.Agg_Seller_Rating AS Seller_Rating,
    u.Verification_Status,
    cam.Campus_Name,
-   (SELECT TOP 1 Media_link
-    FROM Product_Media pm
-    WHERE pm.Product_ID = p.Product_ID
-    ORDER BY pm.Media_ID) AS Primary_Image_URL
+   pm.Media_link AS Primary_Image_URL
 FROM Product p
    INNER JOIN Category c ON p.Category_ID = c.Category_ID
    INNER JOIN [User] u ON p.Seller_ID = u.UserID
-   INNER JOIN Campus cam ON u.CampusID = cam.CampusID;
+   INNER JOIN Campus cam ON u.CampusID = cam.CampusID
+   LEFT JOIN Product_Media pm ON pm.Media_ID = p.Primary_Media_ID;   -- PK seek on the denormalized cover image
 GO
 
 
@@ -868,6 +870,9 @@ GO
 
 -- =====================================================
 -- View 3: User Activity Summary
+-- Reads the precomputed dbo.User_Activity_Stats row per user
+-- (maintained by the application write paths) instead of
+-- LEFT JOINing every product, order, escrow, rating and dispute.
 -- =====================================================
 CREATE VIEW vw_User_Activity_Summary AS
 SELECT
@@ -878,34 +883,21 @@ SELECT
    u.Verification_Status,
    u.Agg_Seller_Rating,
    cam.Campus_Name,
-   COUNT(DISTINCT p.Product_ID) AS Total_Products_Listed,
-   COUNT(DISTINCT CASE WHEN p.Product_Status = 'Active' THEN p.Product_ID END) AS Active_Listings,
-   COUNT(DISTINCT CASE WHEN p.Product_Status = 'Sold' THEN p.Product_ID END) AS Products_Sold,
-   COUNT(DISTINCT sell_order.OrderID) AS Orders_As_Seller,
-   ISNULL(SUM(sell_escrow.Amount), 0) AS Total_Revenue_As_Seller,
-   COUNT(DISTINCT buy_order.OrderID) AS Orders_As_Buyer,
-   ISNULL(SUM(buy_escrow.Amount), 0) AS Total_Spent_As_Buyer,
-   COUNT(DISTINCT rating_received.RatingID) AS Ratings_Received_Count,
-   AVG(rating_received.Rating_Value) AS Avg_Rating_Received,
-   COUNT(DISTINCT rating_given.RatingID) AS Ratings_Given_Count,
-   COUNT(DISTINCT dispute.Dispute_ID) AS Disputes_Filed,
-   DATEDIFF(DAY,
-       (SELECT MIN(Created_date) FROM Product WHERE Seller_ID = u.UserID),
-       GETDATE()
-   ) AS Days_Since_First_Listing
+   ISNULL(s.Total_Products_Listed, 0) AS Total_Products_Listed,
+   ISNULL(s.Active_Listings, 0) AS Active_Listings,
+   ISNULL(s.Products_Sold, 0) AS Products_Sold,
+   ISNULL(s.Orders_As_Seller, 0) AS Orders_As_Seller,
+   ISNULL(s.Total_Revenue_As_Seller, 0) AS Total_Revenue_As_Seller,
+   ISNULL(s.Orders_As_Buyer, 0) AS Orders_As_Buyer,
+   ISNULL(s.Total_Spent_As_Buyer, 0) AS Total_Spent_As_Buyer,
+   ISNULL(s.Ratings_Received_Count, 0) AS Ratings_Received_Count,
+   CAST(s.Ratings_Received_Sum / NULLIF(s.Ratings_Received_Count, 0) AS DECIMAL(3,2)) AS Avg_Rating_Received,
+   ISNULL(s.Ratings_Given_Count, 0) AS Ratings_Given_Count,
+   ISNULL(s.Disputes_Filed, 0) AS Disputes_Filed,
+   DATEDIFF(DAY, s.First_Listing_Date, GETDATE()) AS Days_Since_First_Listing
 FROM [User] u
    INNER JOIN Campus cam ON u.CampusID = cam.CampusID
-   LEFT JOIN Product p ON u.UserID = p.Seller_ID
-   LEFT JOIN [Order] sell_order ON u.UserID = sell_order.Seller_ID
-   LEFT JOIN Escrow sell_escrow ON sell_order.OrderID = sell_escrow.OrderID
-   LEFT JOIN [Order] buy_order ON u.UserID = buy_order.Buyer_ID
-   LEFT JOIN Escrow buy_escrow ON buy_order.OrderID = buy_escrow.OrderID
-   LEFT JOIN Rating rating_received ON u.UserID = rating_received.Rated_UserID
-   LEFT JOIN Rating rating_given ON u.UserID = rating_given.Rater_UserID
-   LEFT JOIN Dispute dispute ON u.UserID = dispute.FiledByUserID
-GROUP BY
-   u.UserID, u.User_Name, u.Email_ID, u.Phone_number,
-   u.Verification_Status, u.Agg_Seller_Rating, cam.Campus_Name;
+   LEFT JOIN User_Activity_Stats s ON u.UserID = s.UserID;
 GO
 
 
@@ -968,4 +960,251 @@ END;
 GO
 
 -- Now, whenever your procedures update Escrow.Status (e.g., to 'Held' or 'Released'), this trigger automatically writes appropriate rows into Escrow_Audit_Logs, 
--- which matches your “audit trigger” description.
\ No newline at end of file
+-- which matches your “audit trigger” description.
+
+-- Pickup slot places (Pickup_Slot_Booking.Booked) are taken at checkout
+-- and given back here, in the transaction that calls the order off: the
+-- escrow is refunded (admin refund, dispute resolution) or the order is
+-- cancelled. Whichever happens first releases the place, so an order
+-- that is both cancelled and refunded only gives it back once. Past
+-- slots are left alone.
+
+-- =====================================================
+-- Trigger: trg_Escrow_ReleasePickupSlot
+-- Gives back the pickup slot place of a scheduled order whose escrow is refunded
+-- =====================================================
+CREATE OR ALTER TRIGGER dbo.trg_Escrow_ReleasePickupSlot
+ON dbo.Escrow
+AFTER UPDATE
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    UPDATE b
+    SET Booked = CASE WHEN b.Booked > r.Places THEN b.Booked - r.Places ELSE 0 END
+    FROM dbo.Pickup_Slot_Booking b
+    JOIN (
+        SELECT oc.Pickup_Point_ID, oc.Scheduled_Date, oc.Scheduled_Time, COUNT(*) AS Places
+        FROM inserted i
+        JOIN deleted d ON d.EscrowID = i.EscrowID
+        JOIN dbo.Order_Collection oc ON oc.Order_ID = i.OrderID
+        WHERE i.Status = N'Refunded' AND d.Status <> N'Refunded'
+          AND oc.Scheduled_Date >= CAST(GETDATE() AS DATE)
+          AND NOT EXISTS (SELECT 1 FROM dbo.[Order] o WHERE o.OrderID = i.OrderID AND o.Status = N'Cancelled')
+        GROUP BY oc.Pickup_Point_ID, oc.Scheduled_Date, oc.Scheduled_Time
+    ) r ON r.Pickup_Point_ID = b.Pickup_Point_ID
+       AND r.Scheduled_Date = b.Slot_Date
+       AND r.Scheduled_Time = b.Start_Time;
+END;
+GO
+
+-- =====================================================
+-- Trigger: trg_Order_ReleasePickupSlot
+-- Gives back the pickup slot place of a scheduled order that is cancelled
+-- =====================================================
+CREATE OR ALTER TRIGGER dbo.trg_Order_ReleasePickupSlot
+ON dbo.[Order]
+AFTER UPDATE
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    UPDATE b
+    SET Booked = CASE WHEN b.Booked > r.Places THEN b.Booked - r.Places ELSE 0 END
+    FROM dbo.Pickup_Slot_Booking b
+    JOIN (
+        SELECT oc.Pickup_Point_ID, oc.Scheduled_Date, oc.Scheduled_Time, COUNT(*) AS Places
+        FROM inserted i
+        JOIN deleted d ON d.OrderID = i.OrderID
+        JOIN dbo.Order_Collection oc ON oc.Order_ID = i.OrderID
+        WHERE i.Status = N'Cancelled' AND d.Status <> N'Cancelled'
+          AND oc.Scheduled_Date >= CAST(GETDATE() AS DATE)
+          AND NOT EXISTS (SELECT 1 FROM dbo.Escrow e WHERE e.OrderID = i.OrderID AND e.Status = N'Refunded')
+        GROUP BY oc.Pickup_Point_ID, oc.Scheduled_Date, oc.Scheduled_Time
+    ) r ON r.Pickup_Point_ID = b.Pickup_Point_ID
+       AND r.Scheduled_Date = b.Slot_Date
+       AND r.Scheduled_Time = b.Start_Time;
+END;
+GO
+
+
+-- ====================================================================================================================================================================================================================
+
+-- =====================================================
+-- Table Type: DisputeDecisionList
+-- One row per dispute the admin is resolving in bulk.
+--   Action = 'refund'  -> Escrow.Status = 'Refunded'
+--   Action = 'release' -> Escrow.Status = 'Released'
+--   Action = 'close'   -> escrow untouched, dispute only
+-- =====================================================
+IF TYPE_ID('dbo.DisputeDecisionList') IS NULL
+    CREATE TYPE dbo.DisputeDecisionList AS TABLE (
+        Dispute_ID         INT           NOT NULL PRIMARY KEY,
+        Action             NVARCHAR(10)  NOT NULL,
+        New_Status         VARCHAR(50)   NOT NULL,
+        Resolution_Details NVARCHAR(MAX) NULL
+    );
+GO
+
+-- =====================================================
+-- Stored Procedure: usp_ResolveDisputesBulk
+--
+-- Applies many refund / release / close decisions in a
+-- single transaction using set-based updates:
+--   • Only disputes still 'Open' / 'In Progress' are touched,
+--     so re-submitting the same decisions is harmless.
+--   • Escrow rows are updated once per affected escrow
+--     (trg_Escrow_StatusAudit still logs every change).
+--   • Returns the number of disputes updated.
+-- =====================================================
+CREATE OR ALTER PROCEDURE dbo.usp_ResolveDisputesBulk
+    @Decisions dbo.DisputeDecisionList READONLY,
+    @Updated   INT OUTPUT
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @Pending TABLE (
+        Dispute_ID         INT PRIMARY KEY,
+        EscrowID           INT NOT NULL,
+        Action             NVARCHAR(10) NOT NULL,
+        New_Status         VARCHAR(50) NOT NULL,
+        Resolution_Details NVARCHAR(MAX) NULL
+    );
+
+    BEGIN TRAN;
+
+    INSERT INTO @Pending (Dispute_ID, EscrowID, Action, New_Status, Resolution_Details)
+    SELECT d.Dispute_ID, d.EscrowID, dec.Action, dec.New_Status, dec.Resolution_Details
+    FROM @Decisions dec
+    JOIN dbo.Dispute d WITH (UPDLOCK, ROWLOCK)
+        ON d.Dispute_ID = dec.Dispute_ID
+    WHERE d.Status IN ('Open', 'In Progress');
+
+    -- Money movement: one UPDATE for all refunds and releases
+    -- (if two disputes on the same escrow disagree, the refund wins)
+    UPDATE e
+    SET Status = CASE p.Action WHEN N'refund' THEN N'Refunded' ELSE N'Released' END,
+        Release_Date = GETDATE()
+    FROM dbo.Escrow e
+    JOIN (
+        SELECT EscrowID, MIN(Action) AS Action
+        FROM @Pending
+        WHERE Action IN (N'refund', N'release')
+        GROUP BY EscrowID
+    ) p ON e.EscrowID = p.EscrowID;
+
+    -- Dispute bookkeeping: one UPDATE for every decision
+    UPDATE d
+    SET Status = p.New_Status,
+        Resolution_Details = ISNULL(p.Resolution_Details, d.Resolution_Details),
+        Resolved_Date = CASE WHEN p.New_Status IN ('Resolved', 'Closed')
+                             THEN CAST(GETDATE() AS DATE)
+                             ELSE d.Resolved_Date END
+    FROM dbo.Dispute d
+    JOIN @Pending p ON d.Dispute_ID = p.Dispute_ID;
+
+    SET @Updated = @@ROWCOUNT;
+
+    COMMIT TRAN;
+END;
+GO
+
+
+-- =====================================================
+-- Stored Procedure: usp_ArchiveOrders
+--
+-- Moves one batch of finished orders older than @CutoffDate
+-- from the hot tables into the *_Archive tables:
+--   • Eligible: Order.Status Delivered/Cancelled, escrow
+--     Released/Refunded (or no escrow on a cancelled order),
+--     and no Open / In Progress dispute.
+--   • Each batch is its own short transaction; call it in a
+--     loop until @Archived = 0 (python jobs.py archive-orders).
+--   • Rows are copied before the hot rows are deleted, so the
+--     Rating delete trigger recomputes Agg_Seller_Rating with
+--     the archived ratings already in place.
+--   • READPAST skips orders another session has locked.
+-- =====================================================
+CREATE OR ALTER PROCEDURE dbo.usp_ArchiveOrders
+    @CutoffDate DATE,
+    @BatchSize  INT = 1000,
+    @Archived   INT OUTPUT
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @Batch TABLE (OrderID INT PRIMARY KEY, EscrowID INT NULL);
+
+    BEGIN TRAN;
+
+    INSERT INTO @Batch (OrderID, EscrowID)
+    SELECT TOP (@BatchSize) o.OrderID, e.EscrowID
+    FROM dbo.[Order] o WITH (UPDLOCK, READPAST, ROWLOCK)
+    LEFT JOIN dbo.Escrow e ON e.OrderID = o.OrderID
+    WHERE o.Status IN (N'Delivered', N'Cancelled')
+      AND o.Order_Date < @CutoffDate
+      AND (e.Status IN (N'Released', N'Refunded')
+           OR (e.EscrowID IS NULL AND o.Status = N'Cancelled'))
+      AND NOT EXISTS (
+          SELECT 1 FROM dbo.Dispute d
+          WHERE d.EscrowID = e.EscrowID AND d.Status IN ('Open', 'In Progress')
+      )
+    ORDER BY o.OrderID;
+
+    SET @Archived = @@ROWCOUNT;
+    IF @Archived = 0
+    BEGIN
+        COMMIT TRAN;
+        RETURN;
+    END
+
+    -- 1) Copy to the archive tables
+    INSERT INTO dbo.Order_Archive (OrderID, Product_ID, Seller_ID, Buyer_ID, Order_Date, Quantity, Status)
+    SELECT o.OrderID, o.Product_ID, o.Seller_ID, o.Buyer_ID, o.Order_Date, o.Quantity, o.Status
+    FROM dbo.[Order] o JOIN @Batch b ON b.OrderID = o.OrderID;
+
+    INSERT INTO dbo.Escrow_Archive (EscrowID, OrderID, Amount, Status, Created_Date, Release_Date)
+    SELECT e.EscrowID, e.OrderID, e.Amount, e.Status, e.Created_Date, e.Release_Date
+    FROM dbo.Escrow e JOIN @Batch b ON b.EscrowID = e.EscrowID;
+
+    INSERT INTO dbo.Order_Collection_Archive (Collection_ID, Order_ID, Pickup_Point_ID, Scheduled_Time, Scheduled_Date)
+    SELECT oc.Collection_ID, oc.Order_ID, oc.Pickup_Point_ID, oc.Scheduled_Time, oc.Scheduled_Date
+    FROM dbo.Order_Collection oc JOIN @Batch b ON b.OrderID = oc.Order_ID;
+
+    INSERT INTO dbo.Rating_Archive (RatingID, Order_ID, Rater_UserID, Rated_UserID, Rating_Value, Rating_Date)
+    SELECT r.RatingID, r.Order_ID, r.Rater_UserID, r.Rated_UserID, r.Rating_Value, r.Rating_Date
+    FROM dbo.Rating r JOIN @Batch b ON b.OrderID = r.Order_ID;
+
+    INSERT INTO dbo.Dispute_Archive (Dispute_ID, EscrowID, FiledByUserID, Description, Open_Date,
+                                     Resolution_Details, Resolved_Date, Status)
+    SELECT d.Dispute_ID, d.EscrowID, d.FiledByUserID, d.Description, d.Open_Date,
+           d.Resolution_Details, d.Resolved_Date, d.Status
+    FROM dbo.Dispute d JOIN @Batch b ON b.EscrowID = d.EscrowID;
+
+    INSERT INTO dbo.Dispute_Evidence_Archive (Evidence_ID, Dispute_ID, Media_link, Media_Type)
+    SELECT de.Evidence_ID, de.Dispute_ID, de.Media_link, de.Media_Type
+    FROM dbo.Dispute_Evidence de
+    JOIN dbo.Dispute d ON d.Dispute_ID = de.Dispute_ID
+    JOIN @Batch b ON b.EscrowID = d.EscrowID;
+
+    INSERT INTO dbo.Escrow_Audit_Logs_Archive (Escrow_Audit_ID, Performed_By_UserID, Escrow_ID, [Timestamp],
+                                               Field_Change, Old_status, New_status)
+    SELECT l.Escrow_Audit_ID, l.Performed_By_UserID, l.Escrow_ID, l.[Timestamp],
+           l.Field_Change, l.Old_status, l.New_status
+    FROM dbo.Escrow_Audit_Logs l JOIN @Batch b ON b.EscrowID = l.Escrow_ID;
+
+    -- 2) Delete the hot rows, children first (Dispute_Evidence cascades)
+    DELETE d FROM dbo.Dispute d JOIN @Batch b ON b.EscrowID = d.EscrowID;
+    DELETE l FROM dbo.Escrow_Audit_Logs l JOIN @Batch b ON b.EscrowID = l.Escrow_ID;
+    DELETE v FROM dbo.Escrow_Verification v JOIN @Batch b ON b.OrderID = v.OrderID;
+    DELETE r FROM dbo.Rating r JOIN @Batch b ON b.OrderID = r.Order_ID;
+    DELETE oc FROM dbo.Order_Collection oc JOIN @Batch b ON b.OrderID = oc.Order_ID;
+    DELETE e FROM dbo.Escrow e JOIN @Batch b ON b.EscrowID = e.EscrowID;
+    DELETE o FROM dbo.[Order] o JOIN @Batch b ON b.OrderID = o.OrderID;
+
+    COMMIT TRAN;
+END;
+GO
@@ -1,7 +1,14 @@
 import streamlit as st
 import pandas as pd
-from database import DatabaseManager
-from datetime import datetime, date, time
+from database import DatabaseManager, QueryTimeoutError, QueryCancelledError, PRICE_BUCKETS
+from media_store import MediaStore, IMAGE_TYPES
+from catalog import CatalogCache
+from catalog_snapshot import SnapshotReader
+from write_behind import WriteBehindQueue
+from view_counters import ViewCounters
+from datetime import datetime, date, time, timedelta
+import uuid
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 # ==================== PAGE CONFIGURATION ====================
 st.set_page_config(
@@ -18,6 +25,36 @@ def get_db_manager():
 
 db = get_db_manager()
 
+@st.cache_resource
+def get_media_store():
+    return MediaStore()
+
+media_store = get_media_store()
+
+@st.cache_resource
+def get_catalog():
+    return CatalogCache(db)
+
+catalog = get_catalog()
+
+@st.cache_resource
+def get_catalog_snapshots():
+    return SnapshotReader()
+
+catalog_snapshots = get_catalog_snapshots()
+
+@st.cache_resource
+def get_write_behind():
+    return WriteBehindQueue(db).start()
+
+write_behind = get_write_behind()
+
+@st.cache_resource
+def get_view_counters():
+    return ViewCounters(db).start()
+
+view_counters = get_view_counters()
+
 # ==================== SESSION STATE INITIALIZATION ====================
 if 'logged_in_user' not in st.session_state:
     st.session_state.logged_in_user = None
@@ -31,6 +68,26 @@ if 'order_created' not in st.session_state:
     st.session_state.order_created = None
 if 'verification_code' not in st.session_state:
     st.session_state.verification_code = None
+if 'session_key' not in st.session_state:
+    st.session_state.session_key = uuid.uuid4().hex
+if 'viewed_products' not in st.session_state:
+    st.session_state.viewed_products = set()
+
+def rerun_requested(ctx) -> bool:
+    """
+    True once Streamlit has queued a rerun/stop for this script run. The
+    new run can't start until a blocked query returns, so the DB watchdog
+    polls this to cancel it. Streamlit has no public API for this; if its
+    internals change this degrades to "never cancel".
+    """
+    requests = getattr(ctx, 'script_requests', None)
+    state = getattr(requests, '_state', None)
+    return getattr(state, 'name', None) in ('RERUN', 'STOP')
+
+# Reads after this session's own writes go to the primary, and reads
+# still running when the user navigates away are cancelled
+_script_ctx = get_script_run_ctx()
+db.bind_session(st.session_state.session_key, cancel_check=lambda: rerun_requested(_script_ctx))
 
 # ==================== DARK THEME WITH MONGODB GREEN ====================
 st.markdown("""
@@ -234,6 +291,19 @@ def format_currency(amount):
     """Format currency with $ symbol"""
     return f"${float(amount):.2f}"
 
+@st.cache_data(max_entries=2000, show_spinner=False)
+def load_image_bytes(path):
+    """Media files are content-addressed and never change, so cache them for the process lifetime"""
+    with open(path, 'rb') as f:
+        return f.read()
+
+def product_image(media_link, thumbnail=True):
+    """Image bytes for a Product_Media link, or None if it isn't available locally (yet)"""
+    if media_link is None or pd.isna(media_link):
+        return None
+    path = media_store.thumbnail_path(media_link) if thumbnail else media_store.original_path(media_link)
+    return load_image_bytes(path) if path else None
+
 def show_verification_code(code, order_id):
     """Display verification code prominently"""
     st.markdown(f"""
@@ -328,43 +398,132 @@ def login_page():
 
 # ==================== MARKETPLACE PAGE ====================
 
+SORT_OPTIONS = {
+    "Recommended": ('recommended', 'Rank_Score', False),
+    "Newest": ('newest', 'Product_ID', False),
+    "Price: Low to High": ('price_asc', 'Unit_price', True),
+    "Price: High to Low": ('price_desc', 'Unit_price', False),
+}
+
+RATING_OPTIONS = [None, 4, 3, 2]
+
+MARKET_PAGE_SIZE = 60
+
+WEEKDAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Admin Analytics chart options -> Sales_Daily column
+ANALYTICS_MEASURES = {
+    "GMV ($)": "GMV",
+    "Orders": "Orders",
+    "Units sold": "Units",
+    "Refunds ($)": "Refund_Amount",
+    "Disputes": "Disputes",
+}
+
+def reset_market_page():
+    st.session_state.market_page = 0
+
 def marketplace_page():
     st.markdown("### 🏠 Campus Marketplace")
     
+    # Filter values from the last run, so the counts shown next to each
+    # option come back in the same round-trip as the results
+    search_query = st.session_state.get("search", "")
+    category_filter = st.session_state.get("market_category", "All")
+    price_filter = st.session_state.get("market_price")
+    rating_filter = st.session_state.get("market_rating")
+    price_sort = st.session_state.get("market_sort", "Recommended")
+    sort_key, sort_by, ascending = SORT_OPTIONS[price_sort]
+    filtered = bool(search_query) or category_filter != "All" or price_filter is not None or rating_filter is not None
+    
+    try:
+        snapshot = catalog_snapshots.current()
+        if filtered:
+            # Facet engine: page of results + counts in one query
+            page = st.session_state.get("market_page", 0)
+            result = db.search_products_faceted(
+                search=search_query or None,
+                category=None if category_filter == "All" else category_filter,
+                price_bucket=price_filter,
+                min_rating=rating_filter,
+                sort=sort_key,
+                page=page,
+                page_size=MARKET_PAGE_SIZE
+            )
+            products, facets = result['products'], result
+        else:
+            page = 0
+            if snapshot is not None:
+                # Shared host-wide snapshot: sort on the mapped columns
+                products = snapshot.select(sort_by=sort_by, ascending=ascending)
+                facets = snapshot.facets or catalog.facets()
+            else:
+                products = catalog.active_products().sort_values(sort_by, ascending=ascending)
+                facets = catalog.facets()
+    except (QueryTimeoutError, QueryCancelledError):
+        raise
+    except Exception as e:
+        st.error(f"Error loading products: {e}")
+        return
+    
     # Search and filters
-    col1, col2, col3 = st.columns([3, 1, 1])
+    col1, col2, col3, col4, col5 = st.columns([3, 1.3, 1.3, 1.3, 1.3])
     with col1:
-        search_query = st.text_input("🔍 Search products", placeholder="Search by name or description...", key="search")
+        st.text_input("🔍 Search products", placeholder="Search by name or description...", key="search", on_change=reset_market_page)
     with col2:
         categories = db.get_categories()
-        category_filter = st.selectbox("Category", ["All"] + categories['Category_Name'].tolist())
+        category_counts = facets['categories']
+        st.selectbox(
+            "Category", ["All"] + categories['Category_Name'].tolist(), key="market_category", on_change=reset_market_page,
+            format_func=lambda name: name if name == "All" else f"{name} ({category_counts.get(name, 0)})"
+        )
     with col3:
-        price_sort = st.selectbox("Sort by", ["Newest", "Price: Low to High", "Price: High to Low"])
+        price_counts = facets['price_buckets']
+        st.selectbox(
+            "Price", [None] + list(range(len(PRICE_BUCKETS))), key="market_price", on_change=reset_market_page,
+            format_func=lambda i: "Any price" if i is None else f"{PRICE_BUCKETS[i][0]} ({price_counts[i]})"
+        )
+    with col4:
+        rating_counts = facets['ratings']
+        st.selectbox(
+            "Seller rating", RATING_OPTIONS, key="market_rating", on_change=reset_market_page,
+            format_func=lambda r: "Any rating" if r is None else f"{'⭐' * r} & up ({sum(rating_counts[r:])})"
+        )
+    with col5:
+        st.selectbox("Sort by", list(SORT_OPTIONS), key="market_sort", on_change=reset_market_page)
+    
+    if search_query or category_filter != "All":
+        with st.expander("🔔 Save this search and get notified about new listings"):
+            default_max = PRICE_BUCKETS[price_filter][2] if price_filter is not None else None
+            max_price = st.number_input("Max price ($, 0 = any)", min_value=0.0, step=5.0,
+                                        value=float(default_max or 0), key="saved_search_max_price")
+            if st.button("Save search", key="save_search"):
+                category_id = None
+                if category_filter != "All":
+                    category_id = int(categories[categories['Category_Name'] == category_filter]['Category_ID'].iloc[0])
+                success, message = db.save_search(
+                    st.session_state.logged_in_user['id'], search_query, category_id, max_price or None
+                )
+                (st.success if success else st.error)(message)
     
     st.markdown("---")
     
-    # Get products
+    if not filtered:
+        trending_strip(st.session_state.logged_in_user.get('campus_id', 0))
+    
     try:
-        products = db.get_all_products()
-        products = products[products['Product_Status'] == 'Active']
-        
-        # Apply filters
-        if search_query:
-            products = products[
-                products['Product_Name'].str.contains(search_query, case=False, na=False) |
-                products['Description'].str.contains(search_query, case=False, na=False)
-            ]
-        
-        if category_filter != "All":
-            products = products[products['Category_Name'] == category_filter]
-        
-        # Apply sorting
-        if price_sort == "Price: Low to High":
-            products = products.sort_values('Unit_price', ascending=True)
-        elif price_sort == "Price: High to Low":
-            products = products.sort_values('Unit_price', ascending=False)
-        else:
-            products = products.sort_values('Product_ID', ascending=False)
+        if filtered and facets['total'] > MARKET_PAGE_SIZE:
+            pages = (facets['total'] + MARKET_PAGE_SIZE - 1) // MARKET_PAGE_SIZE
+            st.caption(f"{facets['total']} listings · page {page + 1} of {pages}")
+            nav_prev, nav_next, _ = st.columns([1, 1, 6])
+            with nav_prev:
+                if st.button("← Previous", disabled=page == 0):
+                    st.session_state.market_page = page - 1
+                    st.rerun()
+            with nav_next:
+                if st.button("Next →", disabled=page + 1 >= pages):
+                    st.session_state.market_page = page + 1
+                    st.rerun()
         
         if products.empty:
             st.info("📦 No products found matching your criteria.")
@@ -381,6 +540,9 @@ def marketplace_page():
                         product = products.iloc[product_idx]
                         
                         with cols[col_idx]:
+                            thumbnail = product_image(product['Primary_Media_Link'])
+                            if thumbnail:
+                                st.image(thumbnail, use_column_width=True)
                             st.markdown(f"""
                                 <div class="product-card">
                                     <div class="product-title">{product['Product_Name']}</div>
@@ -401,18 +563,61 @@ def marketplace_page():
     except Exception as e:
         st.error(f"Error loading products: {e}")
 
+def trending_strip(campus_id, limit=6):
+    """Precomputed from the view counters (python jobs.py refresh-trending)."""
+    try:
+        trending = db.get_trending_products(campus_id, limit=limit)
+        if trending.empty and campus_id:
+            # Quiet campus: fall back to the all-campus list
+            trending = db.get_trending_products(0, limit=limit)
+    except QueryTimeoutError:
+        # Optional strip: leave it out rather than fail the page
+        return
+    if trending.empty:
+        return
+    
+    st.markdown("#### 🔥 Trending on campus")
+    cols = st.columns(len(trending))
+    for idx, (_, item) in enumerate(trending.iterrows()):
+        with cols[idx]:
+            thumbnail = product_image(item['Primary_Media_Link'])
+            if thumbnail:
+                st.image(thumbnail, use_column_width=True)
+            st.markdown(f"""
+                <div class="product-card">
+                    <div class="product-title">{item['Product_Name']}</div>
+                    <div class="product-price">{format_currency(item['Unit_price'])}</div>
+                </div>
+            """, unsafe_allow_html=True)
+            if st.button("👁️ View", key=f"trending_{item['Product_ID']}", use_container_width=True):
+                st.session_state.selected_product = int(item['Product_ID'])
+                st.session_state.current_page = 'product_details'
+                st.rerun()
+    st.markdown("---")
+
 # ==================== PRODUCT DETAILS PAGE ====================
 
 def product_details_page():
     product_id = st.session_state.selected_product
     
     try:
-        products = db.get_all_products()
-        product = products[products['Product_ID'] == product_id].iloc[0]
+        snapshot = catalog_snapshots.current()
+        product = snapshot.find(product_id) if snapshot is not None else None
+        if product is None:
+            product = catalog.get_product(product_id)
+        if product is None:
+            # No longer active (sold out or delisted): read it directly
+            products = db.get_all_products()
+            product = products[products['Product_ID'] == product_id].iloc[0]
         
         users = db.get_all_users()
         seller = users[users['User_Name'] == product['Seller']].iloc[0]
         
+        # Counted in memory, once per session; flushed to Product_Stats in batches
+        if product_id not in st.session_state.viewed_products:
+            st.session_state.viewed_products.add(product_id)
+            view_counters.record_view(product_id)
+        
         if st.button("← Back to Marketplace"):
             st.session_state.current_page = 'marketplace'
             st.rerun()
@@ -422,10 +627,15 @@ def product_details_page():
         col1, col2 = st.columns([1, 1])
         
         with col1:
+            image = product_image(product['Primary_Media_Link'], thumbnail=False)
+            if image:
+                st.image(image, use_column_width=True)
             st.markdown(f"## {product['Product_Name']}")
             st.markdown(f"<div class='product-price'>{format_currency(product['Unit_price'])}</div>", unsafe_allow_html=True)
             st.markdown(f"**Category:** {product['Category_Name']}")
-            st.markdown(f"**Available Quantity:** {int(product['Quantity'])}")
+            held_units = db.get_held_quantity(int(product['Product_ID']))
+            reserved_note = f" ({held_units} reserved in carts)" if held_units else ""
+            st.markdown(f"**Available Quantity:** {int(product['Quantity'])}{reserved_note}")
             st.markdown(f"**Status:** {product['Product_Status']}")
             
             st.markdown("---")
@@ -435,11 +645,13 @@ def product_details_page():
         with col2:
             st.markdown("### 👤 Seller Information")
             rating_stars = '⭐' * int(seller['Agg_Seller_Rating'])
+            seller_activity = db.get_user_activity(int(seller['UserID']))
             st.info(f"""
                 **Name:** {seller['User_Name']}  
-                **Rating:** {rating_stars} ({seller['Agg_Seller_Rating']:.2f})  
+                **Rating:** {rating_stars} ({seller['Agg_Seller_Rating']:.2f}, {int(seller_activity['Ratings_Received_Count'])} ratings)  
                 **Verification:** {seller['Verification_Status']}  
                 **Email:** {seller['Email_ID']}  
+                **Sales:** {int(seller_activity['Orders_As_Seller'])} | **Listings:** {int(seller_activity['Total_Products_Listed'])}  
             """)
             
             st.markdown("---")
@@ -453,52 +665,179 @@ def product_details_page():
                 
                 st.markdown(f"**Total Price:** {format_currency(total_price)}")
                 
-                if st.button("🛒 Buy Now", type="primary", use_container_width=True):
-                    # Check availability before adding to cart
-                    available, current_qty, msg = db.check_product_availability(int(product['Product_ID']), quantity)
+                col_add, col_buy = st.columns(2)
+                with col_add:
+                    add_clicked = st.button("🛒 Add to Cart", use_container_width=True)
+                with col_buy:
+                    buy_clicked = st.button("⚡ Buy Now", type="primary", use_container_width=True)
+                
+                if add_clicked or buy_clicked:
+                    view_counters.record_click(int(product['Product_ID']))
+                    # Reserve the units so other buyers can't take them mid-checkout
+                    held, available, expires_at, msg = db.hold_product(
+                        st.session_state.logged_in_user['id'], int(product['Product_ID']), int(quantity)
+                    )
                     
-                    if not available:
+                    if not held:
                         st.error(f"❌ {msg}")
                     else:
-                        st.session_state.cart = {
+                        st.session_state.cart[int(product['Product_ID'])] = {
                             'product_id': int(product['Product_ID']),
                             'product_name': str(product['Product_Name']),
                             'seller_id': int(seller['UserID']),
                             'seller_name': str(seller['User_Name']),
                             'quantity': int(quantity),
                             'unit_price': float(product['Unit_price']),
-                            'total_price': float(total_price)
+                            'hold_expires': expires_at
                         }
-                        st.session_state.current_page = 'checkout'
-                        st.rerun()
+                        if buy_clicked:
+                            st.session_state.current_page = 'checkout'
+                            st.rerun()
+                        st.success(f"✅ Added to cart ({len(st.session_state.cart)} item(s))")
+        
+        similar_listings_panel(int(product['Product_ID']))
     
     except Exception as e:
         st.error(f"Error loading product details: {e}")
 
+def similar_listings_panel(product_id, limit=6):
+    """Precomputed neighbors from Product_Similar (python jobs.py build-similar-items)."""
+    try:
+        similar = db.get_similar_products(product_id, limit=limit)
+    except QueryTimeoutError:
+        # Optional panel: leave it out rather than fail the page
+        return
+    if similar.empty:
+        return
+    
+    st.markdown("---")
+    st.markdown("### 🔍 Similar listings")
+    cols = st.columns(3)
+    for idx, (_, item) in enumerate(similar.iterrows()):
+        with cols[idx % 3]:
+            thumbnail = product_image(item['Primary_Media_Link'])
+            if thumbnail:
+                st.image(thumbnail, use_column_width=True)
+            st.markdown(f"""
+                <div class="product-card">
+                    <div class="product-title">{item['Product_Name']}</div>
+                    <div class="product-price">{format_currency(item['Unit_price'])}</div>
+                    <div class="seller-info">📁 {item['Category_Name']}</div>
+                </div>
+            """, unsafe_allow_html=True)
+            if st.button("👁️ View", key=f"similar_{item['Product_ID']}", use_container_width=True):
+                st.session_state.selected_product = int(item['Product_ID'])
+                st.rerun()
+
+# ==================== SAVED SEARCHES PAGE ====================
+
+def open_search_match(product_id):
+    db.mark_search_matches_seen(st.session_state.logged_in_user['id'], product_id)
+    st.session_state.selected_product = int(product_id)
+    st.session_state.current_page = 'product_details'
+
+def search_inbox_sidebar(user_id):
+    """Unseen saved-search matches, filled in when listings are added."""
+    try:
+        inbox = db.get_search_inbox(user_id, unseen_only=True, limit=5)
+    except QueryTimeoutError:
+        return
+    if inbox.empty:
+        return
+    st.markdown("#### 🔔 New matches")
+    for _, item in inbox.iterrows():
+        label = f"{item['Product_Name']} · {format_currency(item['Unit_price'])}"
+        if st.button(label, key=f"inbox_{item['Saved_Search_ID']}_{item['Product_ID']}", use_container_width=True):
+            open_search_match(item['Product_ID'])
+            st.rerun()
+    if st.button("Mark all as seen", key="inbox_clear", use_container_width=True):
+        db.mark_search_matches_seen(user_id)
+        st.rerun()
+    st.markdown("---")
+
+def saved_searches_page():
+    st.markdown("### 🔔 Saved Searches")
+    st.caption("Save a search from the Marketplace. New listings that match it show up in your sidebar.")
+    user_id = st.session_state.logged_in_user['id']
+    
+    searches = db.get_saved_searches(user_id)
+    if searches.empty:
+        st.info("No saved searches yet. Search or pick a category in the Marketplace, then use \"Save this search\".")
+    else:
+        for _, search in searches.iterrows():
+            col1, col2 = st.columns([5, 1])
+            with col1:
+                parts = [f"**{search['Query']}**" if search['Query'] else "*any words*"]
+                if search['Category_Name']:
+                    parts.append(f"in {search['Category_Name']}")
+                if pd.notna(search['Max_Price']):
+                    parts.append(f"up to {format_currency(search['Max_Price'])}")
+                st.markdown(f"{' '.join(parts)} · {int(search['Matches'])} match(es)")
+            with col2:
+                if st.button("🗑️ Delete", key=f"delete_search_{search['Saved_Search_ID']}"):
+                    db.delete_saved_search(user_id, int(search['Saved_Search_ID']))
+                    st.rerun()
+    
+    st.markdown("---")
+    st.markdown("#### Recent matches")
+    matches = db.get_search_inbox(user_id, unseen_only=False, limit=30)
+    if matches.empty:
+        st.info("No matches yet.")
+        return
+    for _, item in matches.iterrows():
+        col1, col2 = st.columns([5, 1])
+        with col1:
+            new_badge = "🆕 " if not item['Is_Seen'] else ""
+            st.markdown(f"{new_badge}**{item['Product_Name']}** · {format_currency(item['Unit_price'])} · "
+                        f"{item['Category_Name']} · matched \"{item['Saved_Query'] or item['Category_Name']}\"")
+        with col2:
+            if st.button("👁️ View", key=f"match_{item['Saved_Search_ID']}_{item['Product_ID']}"):
+                open_search_match(item['Product_ID'])
+                st.rerun()
+
 # ==================== CHECKOUT PAGE ====================
 
 def checkout_page():
-    st.markdown("## 🛒 Order Summary")
+    st.markdown("## 🛒 Your Cart")
     
-    if not st.session_state.cart:
+    cart = st.session_state.cart
+    if not cart:
         st.warning("Your cart is empty!")
         if st.button("← Back to Marketplace"):
             st.session_state.current_page = 'marketplace'
             st.rerun()
         return
     
-    cart = st.session_state.cart
+    user_id = st.session_state.logged_in_user['id']
+    if st.session_state.get('cart_error'):
+        st.error(f"❌ {st.session_state.pop('cart_error')}")
     
     col1, col2 = st.columns([2, 1])
     
     with col1:
-        st.markdown("### 📋 Order Details")
-        st.markdown(f"""
-        **Product:** {cart['product_name']}  
-        **Seller:** {cart['seller_name']}  
-        **Quantity:** {cart['quantity']}  
-        **Price per unit:** {format_currency(cart['unit_price'])}  
-        """)
+        st.markdown("### 📋 Items")
+        for product_id, line in list(cart.items()):
+            col_item, col_qty, col_remove = st.columns([4, 1.5, 1])
+            with col_item:
+                st.markdown(f"**{line['product_name']}**  \n"
+                            f"Seller: {line['seller_name']} · {format_currency(line['unit_price'])} each")
+                st.caption(hold_status(line.get('hold_expires')))
+            with col_qty:
+                st.number_input(
+                    "Quantity", min_value=1, value=int(line['quantity']),
+                    key=f"cart_qty_{product_id}", label_visibility="collapsed",
+                    on_change=change_cart_quantity, args=(product_id,)
+                )
+            with col_remove:
+                if st.button("🗑️", key=f"cart_remove_{product_id}"):
+                    db.release_holds(user_id, product_id)
+                    del cart[product_id]
+                    st.rerun()
+        
+        if st.button("🔄 Renew reservations"):
+            for product_id in list(cart):
+                renew_cart_hold(product_id, cart[product_id]['quantity'])
+            st.rerun()
         
         st.markdown("---")
         st.markdown("### 📍 Select Pickup Point")
@@ -513,122 +852,138 @@ def checkout_page():
         pickup_point_id = pickup_options[selected_pickup]
         
         st.markdown("### 📅 Schedule Pickup (Optional)")
+        slotted = not db.get_pickup_slot_templates(pickup_point_id).empty
         col_date, col_time = st.columns(2)
         with col_date:
-            scheduled_date = st.date_input("Preferred Date", value=None)
+            scheduled_date = st.date_input("Preferred Date", value=None, min_value=date.today())
         with col_time:
-            scheduled_time = st.time_input("Preferred Time", value=None)
+            if slotted:
+                # Every order in the cart takes a place in the slot
+                slot_times = pickup_slot_picker(pickup_point_id, scheduled_date, needed=len(cart))
+                scheduled_time = st.selectbox(
+                    "Pickup Slot", [None] + list(slot_times), disabled=not slot_times,
+                    format_func=lambda t: "Choose a slot" if t is None else slot_times[t]
+                )
+            else:
+                scheduled_time = st.time_input("Preferred Time", value=None)
+    
+    total_price = sum(line['quantity'] * line['unit_price'] for line in cart.values())
     
     with col2:
         st.markdown("### 💰 Payment Summary")
         st.markdown(f"""
-        **Subtotal:** {format_currency(cart['total_price'])}  
+        **Items:** {len(cart)}  
+        **Subtotal:** {format_currency(total_price)}  
         **Tax:** $0.00  
-        **Total:** {format_currency(cart['total_price'])}
+        **Total:** {format_currency(total_price)}
         """)
         
         st.markdown("---")
-        st.info("💰 Amount will be held in escrow until delivery is confirmed")
+        st.info("💰 Each item's amount is held in escrow until its pickup is confirmed")
         
         if st.button("✅ Confirm Order", type="primary", use_container_width=True):
+            # Convert date/time to proper format
+            sched_date = scheduled_date if scheduled_date else None
+            sched_time = scheduled_time if scheduled_time else None
+            if slotted and sched_date and not sched_time:
+                st.error("❌ Choose a pickup slot for that date, or clear the date")
+                return
+            
             with st.spinner("Processing your order..."):
-                try:
-                    # Final availability check (race condition protection)
-                    available, current_qty, msg = db.check_product_availability(
-                        cart['product_id'], 
-                        cart['quantity']
-                    )
-                    
-                    if not available:
-                        st.error(f"❌ {msg}")
-                        st.warning("Someone else purchased this item while you were checking out. Please try again.")
-                        return
-                    
-                    # Convert date/time to proper format
-                    sched_date = scheduled_date if scheduled_date else None
-                    sched_time = scheduled_time if scheduled_time else None
-                    
-                    # Create order using direct SQL
-                    success, order_id, message = db.create_order_with_collection(
-                        product_id=cart['product_id'],
-                        buyer_id=st.session_state.logged_in_user['id'],
-                        quantity=cart['quantity'],
-                        pickup_point_id=pickup_point_id,
-                        scheduled_date=sched_date,
-                        scheduled_time=sched_time
-                    )
-                    
-                    if not success:
-                        st.error(f"❌ Order creation failed: {message}")
-                        return
-                    
-                    st.info(f"✅ Order #{order_id} created successfully!")
-                    
-                    # Check if escrow already exists (might be created by trigger)
-                    check_escrow = db.fetch_data(f"SELECT * FROM Escrow WHERE OrderID = {order_id}")
-                    
-                    if check_escrow.empty:
-                        # Create escrow if it doesn't exist
-                        escrow_success = db.add_escrow(order_id, cart['total_price'], 'Held')
-                        
-                        if not escrow_success:
-                            st.error(f"❌ Failed to create escrow for Order #{order_id}")
-                            st.error("Check terminal for detailed error message")
-                            return
-                    else:
-                        st.info("ℹ️ Escrow already exists for this order")
-                    
-                    # Initiate escrow verification (generate code)
-                    code_success, verification_code, code_message = db.initiate_escrow_verification(order_id)
-                    
-                    if not code_success:
-                        st.error(f"❌ {code_message}")
-                        return
-                    
-                    # Update product quantity
-                    new_quantity = current_qty - cart['quantity']
-                    new_status = 'Sold' if new_quantity == 0 else 'Active'
-                    
-                    update_query = f"""
-                    UPDATE Product 
-                    SET Quantity = {new_quantity}, 
-                        Product_Status = '{new_status}'
-                    WHERE Product_ID = {cart['product_id']}
-                    """
-                    db.execute_query(update_query)
-                    
-                    # Success!
-                    st.success("✅ Order placed successfully!")
-                    st.balloons()
-                    
-                    # Display verification code prominently
-                    show_verification_code(verification_code, order_id)
-                    
-                    st.info(f"📦 Order ID: #{order_id} | {new_quantity} items remaining")
-                    st.info(f"💰 Escrow Status: Held | Amount: {format_currency(cart['total_price'])}")
-                    
-                    # Store in session for easy retrieval
-                    st.session_state.order_created = order_id
-                    st.session_state.verification_code = verification_code
-                    
-                    # Clear cart
-                    st.session_state.cart = {}
-                    
-                    st.markdown("---")
-                    if st.button("📋 View My Orders", type="primary"):
-                        st.session_state.current_page = 'my_purchases'
-                        st.rerun()
-                
-                except Exception as e:
-                    st.error(f"❌ Error processing order: {e}")
-                    import traceback
-                    st.code(traceback.format_exc())
+                # Availability, orders, escrows and codes: one transaction
+                success, placed, message = db.checkout_cart(
+                    buyer_id=st.session_state.logged_in_user['id'],
+                    lines=[{'product_id': line['product_id'], 'quantity': line['quantity'],
+                            'unit_price': line['unit_price']} for line in cart.values()],
+                    pickup_point_id=pickup_point_id,
+                    scheduled_date=sched_date,
+                    scheduled_time=sched_time
+                )
+            
+            if not success:
+                st.error(f"❌ {message}")
+                st.warning("Someone else may have bought an item while you were checking out. "
+                           "Update your cart and try again.")
+                return
+            
+            catalog.invalidate()
+            
+            # Success!
+            st.success(f"✅ {message}!")
+            st.balloons()
+            
+            # Display verification codes prominently
+            for order in placed:
+                st.markdown(f"**{cart[order['product_id']]['product_name']}** · "
+                            f"{format_currency(order['amount'])} held in escrow")
+                show_verification_code(order['verification_code'], order['order_id'])
+            
+            # Store in session for easy retrieval
+            st.session_state.order_created = placed[-1]['order_id']
+            st.session_state.verification_code = placed[-1]['verification_code']
+            
+            # Clear cart
+            st.session_state.cart = {}
+            
+            st.markdown("---")
+            if st.button("📋 View My Orders", type="primary"):
+                st.session_state.current_page = 'my_purchases'
+                st.rerun()
     
     st.markdown("---")
-    if st.button("← Cancel and go back"):
-        st.session_state.cart = {}
-        st.session_state.current_page = 'product_details'
-        st.rerun()
+    col_back, col_empty, _ = st.columns([1, 1, 3])
+    with col_back:
+        if st.button("← Continue Shopping"):
+            st.session_state.current_page = 'marketplace'
+            st.rerun()
+    with col_empty:
+        if st.button("🗑️ Empty Cart"):
+            db.release_holds(user_id)
+            st.session_state.cart = {}
+            st.rerun()
+
+def hold_status(expires_at):
+    """Caption for a cart line's reservation (expires_at is UTC)."""
+    if expires_at is None:
+        return "⌛ Not reserved"
+    minutes = (expires_at - datetime.utcnow()).total_seconds() / 60
+    if minutes <= 0:
+        return "⌛ Reservation expired: still yours at checkout if stock allows"
+    return f"⏳ Reserved for {max(int(minutes), 1)} more min"
+
+def renew_cart_hold(product_id, quantity):
+    """Re-reserve a cart line; returns False (and queues the message) if it can't be held."""
+    held, available, expires_at, msg = db.hold_product(st.session_state.logged_in_user['id'], product_id, quantity)
+    line = st.session_state.cart[product_id]
+    if not held:
+        st.session_state.cart_error = f"{line['product_name']}: {msg}"
+        return False
+    line['quantity'] = int(quantity)
+    line['hold_expires'] = expires_at
+    return True
+
+def change_cart_quantity(product_id):
+    key = f"cart_qty_{product_id}"
+    if not renew_cart_hold(product_id, int(st.session_state[key])):
+        # Put the widget back to the quantity that is still held
+        st.session_state[key] = st.session_state.cart[product_id]['quantity']
+
+def pickup_slot_picker(pickup_point_id, slot_date, needed=1):
+    """{Start_Time: label} for the slots at a pickup point on a date with `needed` places left."""
+    if slot_date is None:
+        return {}
+    slots = db.get_pickup_slots(pickup_point_id, slot_date)
+    if slots.empty:
+        st.caption("No pickup slots on this day")
+        return {}
+    options = {}
+    for slot in slots.itertuples():
+        if slot.Remaining >= needed:
+            end = (datetime.combine(slot_date, slot.Start_Time) + timedelta(minutes=int(slot.Slot_Minutes))).time()
+            options[slot.Start_Time] = f"{slot.Start_Time:%H:%M}-{end:%H:%M} ({int(slot.Remaining)} left)"
+    if not options:
+        st.caption("No slot on this day has enough places left")
+    return options
 
 # ==================== SELL ITEM PAGE ====================
 
@@ -660,6 +1015,9 @@ def sell_item_page():
             """)
         
         description = st.text_area("Description *", height=150)
+        photos = st.file_uploader("Photos (the first one is the cover image)",
+                                  type=['jpg', 'jpeg', 'png', 'webp', 'gif'],
+                                  accept_multiple_files=True)
         
         submitted = st.form_submit_button("📦 List Product", type="primary", use_container_width=True)
         
@@ -667,6 +1025,13 @@ def sell_item_page():
             if product_name and description:
                 category_id = int(categories[categories['Category_Name'] == category]['Category_ID'].iloc[0])
                 unit_price = standard_price / quantity
+
+                # Store photos locally; thumbnails render in the background
+                media = []
+                for photo in photos or []:
+                    content_type = 'image/jpeg' if photo.type == 'image/jpg' else photo.type
+                    if content_type in IMAGE_TYPES:
+                        media.append((media_store.save_upload(photo.getvalue(), content_type), content_type))
                 
                 success = db.add_product(
                     category_id,
@@ -676,10 +1041,12 @@ def sell_item_page():
                     standard_price,
                     unit_price,
                     quantity,
-                    'Active'
+                    'Active',
+                    media=media
                 )
                 
                 if success:
+                    catalog.invalidate()
                     st.success(f"✅ Product listed successfully! Unit price: {format_currency(unit_price)}")
                     st.balloons()
                 else:
@@ -694,23 +1061,10 @@ def my_purchases_page():
     
     user_id = st.session_state.logged_in_user['id']
     
+    include_archived = st.checkbox("Show older (archived) orders", key="purchases_archived")
+    
     try:
-        query = f"""
-        SELECT o.OrderID, o.Product_ID, o.Seller_ID, p.Product_Name, seller.User_Name as Seller,
-               o.Quantity, o.Status, o.Order_Date,
-               e.EscrowID, e.Amount, e.Status as Escrow_Status,
-               oc.Scheduled_Date, pp.Location_Name as Pickup_Location
-        FROM [Order] o
-        JOIN Product p ON o.Product_ID = p.Product_ID
-        JOIN [User] seller ON o.Seller_ID = seller.UserID
-        LEFT JOIN Escrow e ON o.OrderID = e.OrderID
-        LEFT JOIN Order_Collection oc ON o.OrderID = oc.Order_ID
-        LEFT JOIN Pickup_Point pp ON oc.Pickup_Point_ID = pp.PickupPointID
-        WHERE o.Buyer_ID = {user_id}
-        ORDER BY o.OrderID DESC
-        """
-        
-        orders = db.fetch_data(query)
+        orders = db.get_buyer_orders(user_id, include_archived=include_archived)
         
         if orders.empty:
             st.info("You haven't made any purchases yet.")
@@ -757,15 +1111,26 @@ def my_purchases_page():
                                 st.rerun()
                     
                     with action_col2:
-                        # Rating option
-                        if order['Status'] == 'Delivered' and order['Escrow_Status'] == 'Released':
-                            rating_check = db.fetch_data(f"SELECT * FROM Rating WHERE Order_ID = {int(order['OrderID'])}")
-                            if rating_check.empty:
-                                rating = st.slider("Rate Seller", 1.0, 5.0, 5.0, 0.5, key=f"rating_{int(order['OrderID'])}")
-                                if st.button(f"⭐ Submit Rating", key=f"rate_{int(order['OrderID'])}"):
-                                    db.add_rating(int(order['OrderID']), user_id, int(order['Seller_ID']), float(rating))
-                                    st.success("Rating submitted!")
-                                    st.rerun()
+                        # Rating option (archived orders are read-only)
+                        if order['Status'] == 'Delivered' and order['Escrow_Status'] == 'Released' and not order['Is_Archived']:
+                            rating_key = f"rating:{int(order['OrderID'])}"
+                            if write_behind.is_pending(rating_key):
+                                st.caption("⭐ Rating submitted")
+                            else:
+                                rating_check = db.fetch_data(f"SELECT * FROM Rating WHERE Order_ID = {int(order['OrderID'])}")
+                                if rating_check.empty:
+                                    rating = st.slider("Rate Seller", 1.0, 5.0, 5.0, 0.5, key=f"rating_{int(order['OrderID'])}")
+                                    if st.button(f"⭐ Submit Rating", key=f"rate_{int(order['OrderID'])}"):
+                                        # Queued locally; written to the database in the background
+                                        write_behind.enqueue('rating', {
+                                            'Order_ID': int(order['OrderID']),
+                                            'Rater_UserID': user_id,
+                                            'Rated_UserID': int(order['Seller_ID']),
+                                            'Rating_Value': float(rating),
+                                            'Rated_At': datetime.now().isoformat()
+                                        }, key=rating_key)
+                                        st.success("Rating submitted!")
+                                        st.rerun()
     
     except Exception as e:
         st.error(f"Error loading purchases: {e}")
@@ -777,23 +1142,22 @@ def my_sales_page():
     
     user_id = st.session_state.logged_in_user['id']
     
+    with st.expander("📅 Pickup calendar (next 7 days)"):
+        calendar = db.get_seller_pickup_calendar(user_id, date.today(), days=7)
+        if calendar.empty:
+            st.info("No pickups scheduled this week.")
+        else:
+            for day, pickups in calendar.groupby('Scheduled_Date', sort=True):
+                st.markdown(f"**{day:%A, %b %d}**")
+                for pickup in pickups.itertuples():
+                    when = f"{pickup.Scheduled_Time:%H:%M}" if pd.notna(pickup.Scheduled_Time) else "Any time"
+                    st.markdown(f"- {when} · {pickup.Location_Name} · Order #{int(pickup.OrderID)}: "
+                                f"{pickup.Product_Name} x{int(pickup.Quantity)} for {pickup.Buyer}")
+    
+    include_archived = st.checkbox("Show older (archived) sales", key="sales_archived")
+    
     try:
-        query = f"""
-        SELECT o.OrderID, p.Product_Name, buyer.User_Name as Buyer,
-               o.Quantity, o.Status, o.Order_Date,
-               e.EscrowID, e.Amount, e.Status as Escrow_Status,
-               oc.Scheduled_Date, pp.Location_Name as Pickup_Location
-        FROM [Order] o
-        JOIN Product p ON o.Product_ID = p.Product_ID
-        JOIN [User] buyer ON o.Buyer_ID = buyer.UserID
-        LEFT JOIN Escrow e ON o.OrderID = e.OrderID
-        LEFT JOIN Order_Collection oc ON o.OrderID = oc.Order_ID
-        LEFT JOIN Pickup_Point pp ON oc.Pickup_Point_ID = pp.PickupPointID
-        WHERE o.Seller_ID = {user_id}
-        ORDER BY o.OrderID DESC
-        """
-        
-        sales = db.fetch_data(query)
+        sales = db.get_seller_orders(user_id, include_archived=include_archived)
         
         if sales.empty:
             st.info("You haven't made any sales yet.")
@@ -863,7 +1227,7 @@ def my_listings_page():
         ORDER BY p.Product_ID DESC
         """
         
-        my_products = db.fetch_data(query)
+        my_products = db.fetch_data(query, replica_ok=True)
         
         if my_products.empty:
             st.info("You haven't listed any products yet.")
@@ -964,18 +1328,10 @@ def my_disputes_page():
     
     user_id = st.session_state.logged_in_user['id']
     
+    include_archived = st.checkbox("Show older (archived) disputes", key="disputes_archived")
+    
     try:
-        query = f"""
-        SELECT d.Dispute_ID, d.EscrowID, d.Description, d.Status, 
-               d.Open_Date, d.Resolved_Date, d.Resolution_Details,
-               e.OrderID, e.Amount
-        FROM Dispute d
-        JOIN Escrow e ON d.EscrowID = e.EscrowID
-        WHERE d.FiledByUserID = {user_id}
-        ORDER BY d.Dispute_ID DESC
-        """
-        
-        my_disputes = db.fetch_data(query)
+        my_disputes = db.get_user_disputes(user_id, include_archived=include_archived)
         
         if my_disputes.empty:
             st.info("You haven't filed any disputes.")
@@ -1023,14 +1379,32 @@ def admin_panel():
     with col5:
         st.metric("💰 Held Escrow", format_currency(stats.get('held_escrow', 0)))
     
+    with st.expander("🩺 Database Health"):
+        metrics = db.get_metrics()
+        if metrics['breakers']:
+            st.dataframe(pd.DataFrame(metrics['breakers']), use_container_width=True, hide_index=True)
+        if metrics['counters']:
+            st.dataframe(
+                pd.DataFrame(sorted(metrics['counters'].items()), columns=['Metric', 'Count']),
+                use_container_width=True, hide_index=True
+            )
+    
+    if db.replicas:
+        with st.expander("🔁 Read Replicas"):
+            st.caption(f"Staleness budget: {db.max_replica_lag:g}s")
+            st.dataframe(pd.DataFrame(db.get_replica_status()), use_container_width=True, hide_index=True)
+    
     st.markdown("---")
     
     # Tabs for different admin functions
-    tab1, tab2, tab3 = st.tabs(["🔍 All Orders", "⚖️ Manage Disputes", "👥 User Management"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(
+        ["🔍 All Orders", "⚖️ Manage Disputes", "👥 User Management", "📅 Pickup Slots", "📈 Analytics"]
+    )
     
     with tab1:
         st.markdown("### All Orders")
-        orders = db.get_all_orders()
+        include_archived = st.checkbox("Include archived orders", key="admin_orders_archived")
+        orders = db.get_all_orders(include_archived=include_archived)
         if not orders.empty:
             st.dataframe(orders, use_container_width=True)
         else:
@@ -1038,7 +1412,8 @@ def admin_panel():
     
     with tab2:
         st.markdown("### Dispute Resolution")
-        disputes = db.get_all_disputes()
+        include_archived_disputes = st.checkbox("Include archived disputes", key="admin_disputes_archived")
+        disputes = db.get_all_disputes(include_archived=include_archived_disputes)
         
         if disputes.empty:
             st.info("No disputes found")
@@ -1049,7 +1424,42 @@ def admin_panel():
                                           default=['Open', 'In Progress'])
             
             filtered_disputes = disputes[disputes['Status'].isin(status_filter)]
-            
+
+            # Bulk actions (one transaction for all selected disputes)
+            actionable = filtered_disputes[filtered_disputes['Status'].isin(['Open', 'In Progress'])]
+            if not actionable.empty:
+                with st.expander(f"🗂️ Bulk Actions ({len(actionable)} actionable)"):
+                    bulk_labels = {
+                        f"#{int(d['Dispute_ID'])} - Order #{int(d['OrderID'])} - {d['Filed_By']} ({format_currency(d['Amount'])})": int(d['Dispute_ID'])
+                        for _, d in actionable.iterrows()
+                    }
+                    selected_labels = st.multiselect("Select disputes", options=list(bulk_labels.keys()), key="bulk_disputes")
+
+                    bulk_col1, bulk_col2 = st.columns(2)
+                    with bulk_col1:
+                        bulk_action = st.selectbox("Action", ["Refund Buyer", "Release to Seller", "Close Only"], key="bulk_action")
+                    with bulk_col2:
+                        bulk_status = st.selectbox("New Dispute Status", ['Resolved', 'Closed', 'In Progress'], key="bulk_status")
+                    bulk_resolution = st.text_area("Resolution Details (applied to all)", key="bulk_resolution")
+
+                    if st.button("⚡ Apply to Selected", key="bulk_apply", disabled=not selected_labels):
+                        action_map = {"Refund Buyer": "refund", "Release to Seller": "release", "Close Only": "close"}
+                        decisions = [
+                            {
+                                'dispute_id': bulk_labels[label],
+                                'action': action_map[bulk_action],
+                                'status': bulk_status,
+                                'resolution': bulk_resolution or None
+                            }
+                            for label in selected_labels
+                        ]
+                        success, updated, message = db.resolve_disputes_bulk(decisions)
+                        if success:
+                            st.success(f"✅ {message}")
+                            st.rerun()
+                        else:
+                            st.error(f"❌ {message}")
+
             for _, dispute in filtered_disputes.iterrows():
                 with st.expander(f"Dispute #{int(dispute['Dispute_ID'])} - Order #{int(dispute['OrderID'])} ({dispute['Status']})"):
                     col1, col2 = st.columns(2)
@@ -1109,11 +1519,154 @@ def admin_panel():
     
     with tab3:
         st.markdown("### User Management")
-        users = db.get_all_users()
-        
-        if not users.empty:
+
+        filter_col1, filter_col2, filter_col3, filter_col4 = st.columns([3, 2, 2, 1])
+        with filter_col1:
+            user_prefix = st.text_input("🔍 Email or name starts with", key="user_search_prefix")
+        with filter_col2:
+            campuses = db.get_campuses()
+            campus_options = {"All": None}
+            campus_options.update({row['Campus_Name']: int(row['CampusID']) for _, row in campuses.iterrows()})
+            user_campus = st.selectbox("Campus", list(campus_options.keys()), key="user_search_campus")
+        with filter_col3:
+            user_verification = st.selectbox("Verification", ["All", "Verified", "Pending"], key="user_search_verification")
+        with filter_col4:
+            page_size = st.selectbox("Per page", [25, 50, 100], index=1, key="user_search_page_size")
+
+        # Keyset pagination: remember the last UserID of every page we've visited
+        search_key = (user_prefix, user_campus, user_verification, page_size)
+        if st.session_state.get('user_search_key') != search_key:
+            st.session_state.user_search_key = search_key
+            st.session_state.user_page_cursors = [0]
+
+        cursors = st.session_state.user_page_cursors
+        users = db.search_users(
+            prefix=user_prefix or None,
+            campus_id=campus_options[user_campus],
+            verification_status=None if user_verification == "All" else user_verification,
+            after_id=cursors[-1],
+            limit=page_size
+        )
+
+        if users.empty:
+            st.info("No users found")
+        else:
             st.dataframe(users, use_container_width=True)
 
+        nav_col1, nav_col2, nav_col3 = st.columns([1, 2, 1])
+        with nav_col1:
+            if st.button("← Previous", key="users_prev", disabled=len(cursors) <= 1):
+                cursors.pop()
+                st.rerun()
+        with nav_col2:
+            st.markdown(f"Page {len(cursors)}")
+        with nav_col3:
+            if st.button("Next →", key="users_next", disabled=len(users) < page_size):
+                cursors.append(int(users['UserID'].iloc[-1]))
+                st.rerun()
+    
+    with tab4:
+        st.markdown("### Pickup Slots")
+        st.caption("Buyers can only book the slots defined here, and each slot takes a limited number of pickups. "
+                   "Locations without slots accept any time.")
+        
+        pickup_points = db.get_pickup_points(campus_id=1)
+        point_options = {row['Location_Name']: int(row['PickupPointID']) for _, row in pickup_points.iterrows()}
+        point_name = st.selectbox("Pickup Location", list(point_options), key="slots_point")
+        point_id = point_options[point_name]
+        
+        templates = db.get_pickup_slot_templates(point_id)
+        if templates.empty:
+            st.info("No slots defined: buyers can pick any time at this location.")
+        else:
+            summary = templates.groupby('Weekday').agg(
+                First=('Start_Time', 'min'), Last=('Start_Time', 'max'),
+                Slots=('Start_Time', 'count'), Capacity=('Capacity', 'max')
+            ).reset_index()
+            summary['Weekday'] = summary['Weekday'].map(lambda d: WEEKDAY_NAMES[int(d)])
+            st.dataframe(summary, use_container_width=True, hide_index=True)
+        
+        with st.form("pickup_slots_form"):
+            weekdays = st.multiselect("Days", list(range(7)), default=[0, 1, 2, 3, 4],
+                                      format_func=lambda d: WEEKDAY_NAMES[d])
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                first_start = st.time_input("First slot starts", value=time(10, 0))
+            with col2:
+                last_start = st.time_input("Last slot starts", value=time(17, 30))
+            with col3:
+                slot_minutes = st.number_input("Minutes per slot", min_value=5, max_value=240, value=30, step=5)
+            with col4:
+                capacity = st.number_input("Pickups per slot (0 = remove)", min_value=0, max_value=500, value=4)
+            if st.form_submit_button("Save slots", type="primary"):
+                if not weekdays:
+                    st.warning("Pick at least one day")
+                else:
+                    success, message = db.set_pickup_slots(
+                        point_id, weekdays, first_start, last_start, int(slot_minutes), int(capacity)
+                    )
+                    if success:
+                        st.success(f"✅ {message}")
+                        st.rerun()
+                    else:
+                        st.error(f"❌ {message}")
+    
+    with tab5:
+        sales_analytics()
+
+def sales_analytics():
+    """Charts over the Sales_Daily rollup (python jobs.py rollup-sales), never the order tables."""
+    st.markdown("### Sales Analytics")
+    watermark = db.get_rollup_watermark()
+    if watermark is None:
+        st.info("No rollup yet. Run `python jobs.py rollup-sales` to build it.")
+        return
+    st.caption(f"Daily rollup, updated through {watermark}. Refunds are dated when the escrow was refunded, "
+               f"disputes when they were opened.")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        start = st.date_input("From", value=date.today() - timedelta(days=90), key="analytics_from")
+    with col2:
+        end = st.date_input("To", value=date.today(), key="analytics_to")
+    with col3:
+        measure = ANALYTICS_MEASURES[st.selectbox("Chart", list(ANALYTICS_MEASURES), key="analytics_measure")]
+    
+    try:
+        rollup = db.get_sales_rollup(start, end)
+    except QueryTimeoutError:
+        st.warning("Analytics are taking too long to load, please try again.")
+        return
+    if rollup.empty:
+        st.info("No sales in this range")
+        return
+    
+    measures = list(ANALYTICS_MEASURES.values())
+    rollup[measures] = rollup[measures].astype(float)
+    rollup['Sales_Date'] = pd.to_datetime(rollup['Sales_Date'])
+    totals = rollup[measures].sum()
+    
+    k1, k2, k3, k4, k5 = st.columns(5)
+    k1.metric("💰 GMV", format_currency(totals['GMV']))
+    k2.metric("🛒 Orders", int(totals['Orders']))
+    k3.metric("📦 Units", int(totals['Units']))
+    k4.metric("↩️ Refunds", format_currency(totals['Refund_Amount']))
+    k5.metric("⚖️ Disputes", int(totals['Disputes']))
+    
+    st.markdown("#### By day")
+    st.line_chart(rollup.groupby('Sales_Date')[measure].sum())
+    
+    col_cat, col_campus = st.columns(2)
+    with col_cat:
+        st.markdown("#### By category")
+        st.bar_chart(rollup.groupby('Category_Name')[measure].sum().sort_values(ascending=False))
+    with col_campus:
+        st.markdown("#### By campus")
+        st.bar_chart(rollup.groupby('Campus_Name')[measure].sum().sort_values(ascending=False))
+    
+    with st.expander("Daily rows"):
+        st.dataframe(rollup, use_container_width=True, hide_index=True)
+
 # ==================== MAIN APP ====================
 
 def main():
@@ -1132,14 +1685,18 @@ def main():
             st.markdown(f"✉️ {user['email']}")
             st.markdown("---")
             
+            search_inbox_sidebar(user['id'])
+            
             # Navigation menu
             menu_options = {
                 "🏠 Marketplace": "marketplace",
+                f"🛒 Cart ({len(st.session_state.cart)})": "checkout",
                 "➕ Sell Item": "sell_item",
                 "🛒 My Purchases": "my_purchases",
                 "💼 My Sales": "my_sales",
                 "📊 My Listings": "my_listings",
                 "⚖️ My Disputes": "my_disputes",
+                "🔔 Saved Searches": "saved_searches",
             }
             
             if is_admin():
@@ -1152,6 +1709,8 @@ def main():
             
             st.markdown("---")
             if st.sidebar.button("🚪 Logout", use_container_width=True):
+                if st.session_state.cart:
+                    db.release_holds(user['id'])
                 st.session_state.logged_in_user = None
                 st.session_state.cart = {}
                 st.session_state.current_page = 'marketplace'
@@ -1170,12 +1729,18 @@ def main():
             'my_listings': my_listings_page,
             'file_dispute': file_dispute_page,
             'my_disputes': my_disputes_page,
+            'saved_searches': saved_searches_page,
             'admin_panel': admin_panel,
         }
         
         current_page = st.session_state.current_page
         if current_page in page_map:
-            page_map[current_page]()
+            try:
+                page_map[current_page]()
+            except QueryTimeoutError as e:
+                st.warning(f"⏱️ {e}")
+            except QueryCancelledError:
+                pass    # superseded by the rerun that cancelled it
         else:
             marketplace_page()
 
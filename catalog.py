@@ -0,0 +1,131 @@
+"""
+Process-level, in-memory copy of the active product catalog.
+
+The first read loads every listing; after that the cache only asks the
+database for rows whose Product or seller [User] rowversion moved past
+its watermark (DatabaseManager.get_products_changed_since), so a
+refresh costs in proportion to what changed, not to the catalog size.
+"""
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from database import DatabaseManager, PRICE_BUCKETS
+
+
+def catalog_facets(products: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Facet counts for an unfiltered set of listings, in the same shape as
+    DatabaseManager.search_products_faceted returns (JSON-safe).
+    """
+    if products.empty:
+        return {'total': 0, 'categories': {}, 'price_buckets': [0] * len(PRICE_BUCKETS), 'ratings': [0] * 6}
+    edges = np.array([low for _, low, _ in PRICE_BUCKETS[1:]], dtype=float)
+    buckets = np.searchsorted(edges, products['Unit_price'].to_numpy(dtype=float), side='right')
+    stars = np.clip(np.floor(products['Seller_Rating'].fillna(0).to_numpy(dtype=float)), 0, 5).astype(int)
+    return {
+        'total': int(len(products)),
+        'categories': {str(k): int(v) for k, v in products['Category_Name'].value_counts().items()},
+        'price_buckets': np.bincount(buckets, minlength=len(PRICE_BUCKETS)).tolist(),
+        'ratings': np.bincount(stars, minlength=6).tolist(),
+    }
+
+
+class CatalogCache:
+    def __init__(self, db: DatabaseManager, refresh_interval: float = 5.0,
+                 full_resync_interval: float = 600.0):
+        self.db = db
+        # Minimum seconds between delta polls
+        self.refresh_interval = refresh_interval
+        # Deleted rows leave no rowversion behind; a periodic full reload drops them
+        self.full_resync_interval = full_resync_interval
+        self._products = pd.DataFrame()
+        self._token: Optional[bytes] = None
+        self._version = 0
+        self._facets: Optional[Dict[str, Any]] = None
+        self._facets_version = -1
+        self._refreshed_at = 0.0
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    # ==================== REFRESH ====================
+
+    def refresh(self, force: bool = False):
+        """
+        Apply changes since the last watermark. Readers never wait on a
+        refresh another thread is already running; they get the current copy.
+        """
+        now = time.monotonic()
+        if not force and now - self._refreshed_at < self.refresh_interval:
+            return
+        if not self._lock.acquire(blocking=force):
+            return
+        try:
+            if now - self._loaded_at >= self.full_resync_interval:
+                token = None
+            else:
+                token = self._token
+
+            changed, next_token = self.db.get_products_changed_since(token)
+            if next_token is None or (token is not None and changed.empty):
+                # Error, or nothing new (rowversions are database-wide, so
+                # the watermark can move without any listing changing)
+                self._token = next_token or self._token
+                self._refreshed_at = time.monotonic()
+                return
+
+            if token is None:
+                products = changed
+                self._loaded_at = now
+            else:
+                products = self._products
+                if not changed.empty:
+                    products = products[~products['Product_ID'].isin(changed['Product_ID'])]
+                    products = pd.concat([products, changed], ignore_index=True)
+
+            if not products.empty:
+                products = products[products['Product_Status'] == 'Active']
+                products = products.sort_values('Product_ID', ascending=False, ignore_index=True)
+
+            # Swap in a new frame; readers holding the old one are unaffected
+            self._products = products
+            self._token = next_token
+            self._version += 1
+            self._refreshed_at = time.monotonic()
+        finally:
+            self._lock.release()
+
+    @property
+    def version(self) -> int:
+        """Bumped each time the in-memory copy changes; 0 until the first load."""
+        return self._version
+
+    def invalidate(self):
+        """Pick up this process's own writes on the next read."""
+        self._refreshed_at = 0.0
+
+    # ==================== READS ====================
+
+    def active_products(self) -> pd.DataFrame:
+        """Active listings, newest first. Treat the frame as read-only."""
+        self.refresh()
+        return self._products
+
+    def facets(self) -> Dict[str, Any]:
+        """Facet counts for the whole active catalog, recomputed only when it changes."""
+        products = self.active_products()
+        version = self._version
+        if self._facets is None or self._facets_version != version:
+            self._facets = catalog_facets(products)
+            self._facets_version = version
+        return self._facets
+
+    def get_product(self, product_id: int) -> Optional[pd.Series]:
+        products = self.active_products()
+        if products.empty:
+            return None
+        match = products[products['Product_ID'] == product_id]
+        return None if match.empty else match.iloc[0]
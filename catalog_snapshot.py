@@ -0,0 +1,359 @@
+"""
+Memory-mapped, columnar snapshots of the active catalog.
+
+One publisher per host (python jobs.py publish-catalog-snapshot) writes
+each generation to <root>/catalog-<generation>.snap and then points
+<root>/CURRENT at it with an atomic rename. Every Streamlit process maps
+the current file read-only, so the catalog lives once in the host's page
+cache instead of once per process, and a new worker is warm immediately.
+The publisher also touches <root>/HEARTBEAT on every check, changed or
+not, so readers can tell a quiet catalog from a stopped publisher.
+
+File layout (little-endian, every block 8-byte aligned):
+    b'CATSNAP1' | uint64 header length | JSON header | column blocks
+
+Numeric columns are plain arrays read as zero-copy numpy views. Text
+columns are an int64 offsets array plus a UTF-8 blob and are decoded
+only for the rows a page actually shows. Low-cardinality text is
+dictionary-encoded (int32 codes, -1 = NULL).
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b'CATSNAP1'
+POINTER_FILE = 'CURRENT'
+HEARTBEAT_FILE = 'HEARTBEAT'
+
+# Column -> storage kind. Columns missing from the source frame are skipped.
+SNAPSHOT_SCHEMA = {
+    'Product_ID': 'i8',
+    'Seller_ID': 'i8',
+    'Quantity': 'i8',
+    'Unit_price': 'f8',
+    'Standard_price': 'f8',
+    'Seller_Rating': 'f8',
+    'Rank_Score': 'f8',
+    'Primary_Media_ID': 'f8',       # nullable, so stored as float (NaN = NULL)
+    'Created_date': 'datetime',
+    'Category_Name': 'dict',
+    'Product_Status': 'dict',
+    'Seller': 'dict',
+    'Product_Name': 'str',
+    'Description': 'str',
+    'Primary_Media_Link': 'str',
+}
+
+# Lower-cased "name\ndescription", searched in place inside the mapping
+SEARCH_COLUMN = 'Search_Text'
+
+
+def default_root() -> str:
+    return os.environ.get(
+        "CATALOG_SNAPSHOT_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots")
+    )
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+# ==================== PUBLISHING ====================
+
+def _encode_strings(values: Iterable) -> List[np.ndarray]:
+    """Offsets (n + 1), UTF-8 blob, null flags."""
+    encoded, nulls = [], []
+    for value in values:
+        if not isinstance(value, str) and pd.isna(value):
+            encoded.append(b'')
+            nulls.append(1)
+        else:
+            encoded.append(str(value).encode('utf-8'))
+            nulls.append(0)
+    offsets = np.zeros(len(encoded) + 1, dtype='<i8')
+    if encoded:
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    return [offsets, blob, np.array(nulls, dtype=np.uint8)]
+
+
+def _encode_column(kind: str, series: pd.Series):
+    """Return (header spec without offsets, [arrays])."""
+    if kind == 'i8':
+        return {'kind': kind}, [series.fillna(0).astype('<i8').to_numpy()]
+    if kind == 'f8':
+        return {'kind': kind}, [pd.to_numeric(series, errors='coerce').astype('<f8').to_numpy()]
+    if kind == 'datetime':
+        values = pd.to_datetime(series, errors='coerce')
+        return {'kind': kind}, [values.to_numpy(dtype='datetime64[ns]').view('<i8')]
+    if kind == 'dict':
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        return {'kind': kind}, [codes.astype('<i4')] + _encode_strings(uniques)
+    return {'kind': 'str'}, _encode_strings(series)
+
+
+def publish_snapshot(products: pd.DataFrame, root: str = None, keep: int = 3,
+                     facets: Dict = None) -> str:
+    """
+    Write `products` as a new generation and make it current. `facets`
+    (precomputed filter-bar counts) is stored in the header as-is.
+    Returns the path of the new snapshot file.
+    """
+    root = root or default_root()
+    os.makedirs(root, exist_ok=True)
+    generation = time.time_ns()
+
+    products = products.reset_index(drop=True)
+    columns = {name: kind for name, kind in SNAPSHOT_SCHEMA.items() if name in products.columns}
+    search_text = (
+        products.get('Product_Name', pd.Series('', index=products.index)).fillna('').astype(str)
+        + '\n'
+        + products.get('Description', pd.Series('', index=products.index)).fillna('').astype(str)
+    ).str.lower()
+
+    specs, blocks = {}, []
+    for name, kind in list(columns.items()) + [(SEARCH_COLUMN, 'str')]:
+        spec, arrays = _encode_column(kind, search_text if name == SEARCH_COLUMN else products[name])
+        spec['blocks'] = []
+        for array in arrays:
+            spec['blocks'].append({'dtype': array.dtype.str, 'count': int(array.size)})
+            blocks.append((spec['blocks'][-1], array))
+        specs[name] = spec
+
+    # Lay out the blocks, then write the header that points at them
+    position = 0
+    for spec, array in blocks:
+        spec['offset'] = position
+        position = _align(position + array.nbytes)
+
+    header = json.dumps({
+        'generation': generation,
+        'created': time.time(),
+        'rows': int(len(products)),
+        'columns': specs,
+        'facets': facets,
+    }).encode('utf-8')
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    filename = f"catalog-{generation}.snap"
+    path = os.path.join(root, filename)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        for spec, array in blocks:
+            f.seek(data_start + spec['offset'])
+            f.write(array.tobytes())
+        f.truncate(data_start + position)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+    pointer_tmp = os.path.join(root, f"{POINTER_FILE}.{os.getpid()}.tmp")
+    with open(pointer_tmp, 'w') as f:
+        f.write(filename)
+    os.replace(pointer_tmp, os.path.join(root, POINTER_FILE))
+
+    touch_heartbeat(root)
+    _prune(root, keep)
+    return path
+
+
+def touch_heartbeat(root: str = None):
+    """Record that the publisher has just confirmed CURRENT is up to date."""
+    root = root or default_root()
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, HEARTBEAT_FILE)
+    with open(path, 'a'):
+        pass
+    os.utime(path, None)
+
+
+def _prune(root: str, keep: int):
+    """Remove old generations. Readers that still map one keep their pages."""
+    snapshots = sorted(n for n in os.listdir(root) if n.startswith('catalog-') and n.endswith('.snap'))
+    for name in snapshots[:-keep]:
+        try:
+            os.remove(os.path.join(root, name))
+        except OSError:
+            pass    # still open on platforms that forbid unlinking mapped files
+
+
+# ==================== READING ====================
+
+class CatalogSnapshot:
+    """One mapped generation. Arrays returned are read-only views."""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not a catalog snapshot: {path}")
+        (header_len,) = struct.unpack_from('<Q', self._mm, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        header = json.loads(self._mm[header_start:header_start + header_len])
+        self._data_start = _align(header_start + header_len)
+        self.path = path
+        self.generation = header['generation']
+        self.created = header['created']
+        self.rows = header['rows']
+        # Filter-bar counts for the whole generation, or None if not published
+        self.facets: Optional[dict] = header.get('facets')
+        self._columns: Dict[str, dict] = header['columns']
+
+    def __len__(self) -> int:
+        return self.rows
+
+    @property
+    def columns(self) -> List[str]:
+        return [name for name in self._columns if name != SEARCH_COLUMN]
+
+    def _block(self, name: str, index: int) -> np.ndarray:
+        block = self._columns[name]['blocks'][index]
+        return np.frombuffer(self._mm, dtype=np.dtype(block['dtype']), count=block['count'],
+                             offset=self._data_start + block['offset'])
+
+    def _decode(self, offsets: np.ndarray, blob_block: dict, nulls: np.ndarray, rows: np.ndarray) -> list:
+        base = self._data_start + blob_block['offset']
+        values = []
+        for row in rows:
+            if nulls[row]:
+                values.append(None)
+            else:
+                values.append(self._mm[base + offsets[row]:base + offsets[row + 1]].decode('utf-8'))
+        return values
+
+    def numeric(self, name: str) -> np.ndarray:
+        """Zero-copy view of an i8/f8/datetime column."""
+        return self._block(name, 0)
+
+    def column(self, name: str, rows: np.ndarray) -> pd.Series:
+        """Materialize one column for the given row positions."""
+        spec = self._columns[name]
+        kind = spec['kind']
+        if kind in ('i8', 'f8'):
+            return pd.Series(self.numeric(name)[rows])
+        if kind == 'datetime':
+            return pd.Series(pd.to_datetime(self.numeric(name)[rows]))
+        if kind == 'dict':
+            codes = self._block(name, 0)[rows]
+            dictionary = self._decode(self._block(name, 1), spec['blocks'][2], self._block(name, 3),
+                                      np.arange(spec['blocks'][3]['count']))
+            return pd.Series([dictionary[c] if c >= 0 else None for c in codes], dtype=object)
+        return pd.Series(self._decode(self._block(name, 0), spec['blocks'][1], self._block(name, 2), rows),
+                         dtype=object)
+
+    def equals(self, name: str, value) -> np.ndarray:
+        """Boolean mask of rows where a dictionary-encoded column == value."""
+        spec = self._columns[name]
+        dictionary = self._decode(self._block(name, 1), spec['blocks'][2], self._block(name, 3),
+                                  np.arange(spec['blocks'][3]['count']))
+        if value not in dictionary:
+            return np.zeros(self.rows, dtype=bool)
+        return self._block(name, 0) == dictionary.index(value)
+
+    def search(self, text: str) -> np.ndarray:
+        """
+        Row positions whose name or description contains `text`
+        (case-insensitive), found by scanning the mapped blob in place.
+        """
+        needle = text.lower().encode('utf-8')
+        if not needle:
+            return np.arange(self.rows)
+        offsets = self._block(SEARCH_COLUMN, 0)
+        blob = self._columns[SEARCH_COLUMN]['blocks'][1]
+        start = self._data_start + blob['offset']
+        end = start + blob['count']
+        hits = []
+        position = self._mm.find(needle, start, end)
+        while position != -1:
+            row = int(np.searchsorted(offsets, position - start, side='right')) - 1
+            row_end = start + int(offsets[row + 1])
+            if position + len(needle) > row_end:
+                # Match runs into the next row's text; not a real hit
+                position = self._mm.find(needle, position + 1, end)
+                continue
+            hits.append(row)
+            # Skip to the next row; one hit per row is enough
+            position = self._mm.find(needle, row_end, end)
+        return np.array(hits, dtype=np.int64)
+
+    def to_frame(self, rows: np.ndarray = None, columns: List[str] = None) -> pd.DataFrame:
+        rows = np.arange(self.rows) if rows is None else np.asarray(rows, dtype=np.int64)
+        return pd.DataFrame({name: self.column(name, rows) for name in (columns or self.columns)})
+
+    def select(self, search: str = None, equals: Dict[str, object] = None,
+               sort_by: str = 'Product_ID', ascending: bool = False) -> pd.DataFrame:
+        """Filter and sort on the mapped columns, then decode only the matches."""
+        rows = self.search(search) if search else np.arange(self.rows)
+        for name, value in (equals or {}).items():
+            rows = rows[self.equals(name, value)[rows]]
+        keys = self.numeric(sort_by)[rows]
+        order = np.argsort(keys, kind='stable')
+        if not ascending:
+            order = order[::-1]
+        return self.to_frame(rows[order])
+
+    def find(self, product_id: int) -> Optional[pd.Series]:
+        rows = np.flatnonzero(self.numeric('Product_ID') == product_id)
+        return None if rows.size == 0 else self.to_frame(rows[:1]).iloc[0]
+
+
+class SnapshotReader:
+    """
+    Follows <root>/CURRENT and swaps to each new generation. Returns
+    None when there is no snapshot or the publisher's heartbeat is older
+    than `max_age` seconds (publisher stopped), so callers can fall back.
+    A snapshot of a quiet catalog stays in use however old it is.
+    """
+
+    def __init__(self, root: str = None, check_interval: float = 1.0, max_age: float = 120.0):
+        self.root = root or default_root()
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._checked_at = 0.0
+        self._heartbeat = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[CatalogSnapshot]:
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval and self._lock.acquire(blocking=False):
+            try:
+                self._checked_at = now
+                self._follow_pointer()
+            finally:
+                self._lock.release()
+        snapshot = self._snapshot
+        if snapshot is None or time.time() - max(self._heartbeat, snapshot.created) > self.max_age:
+            return None
+        return snapshot
+
+    def _follow_pointer(self):
+        try:
+            self._heartbeat = os.path.getmtime(os.path.join(self.root, HEARTBEAT_FILE))
+        except OSError:
+            pass
+        try:
+            with open(os.path.join(self.root, POINTER_FILE)) as f:
+                filename = f.read().strip()
+        except OSError:
+            return
+        path = os.path.join(self.root, filename)
+        if self._snapshot is not None and self._snapshot.path == path:
+            return
+        try:
+            # Readers holding the previous generation keep using it until
+            # they drop their reference; the mapping closes with it.
+            self._snapshot = CatalogSnapshot(path)
+        except Exception as e:
+            print(f"Error mapping catalog snapshot {path}: {e}")
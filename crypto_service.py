@@ -0,0 +1,156 @@
+"""
+Batch Fernet encryption/decryption, key rotation and password hashing.
+
+Keys come from the environment:
+    APP_SECRET_KEY     current secret; new tokens are encrypted with it
+    APP_PREVIOUS_KEYS  comma-separated older secrets, still accepted for
+                       decryption until a rotation job has re-encrypted
+                       everything under the current one
+
+Secrets are turned into Fernet keys the same way DatabaseManager always
+has, so existing tokens stay readable.
+"""
+import hashlib
+import os
+from base64 import urlsafe_b64encode
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Union
+
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+
+DEFAULT_SECRET = "super-secret-key-for-demo-1234"
+
+Token = Union[bytes, str, None]
+
+
+def fernet_key(secret: str) -> bytes:
+    """Fernet requires a 32-byte urlsafe base64 key"""
+    return urlsafe_b64encode(secret.encode("utf-8")[:32].ljust(32, b'0'))
+
+
+def configured_secrets() -> List[str]:
+    """[current, previous...] from the environment."""
+    current = os.environ.get("APP_SECRET_KEY", DEFAULT_SECRET)
+    previous = [s.strip() for s in os.environ.get("APP_PREVIOUS_KEYS", "").split(",") if s.strip()]
+    return [current] + [s for s in previous if s != current]
+
+
+def build_fernet(secrets: Sequence[str] = None) -> MultiFernet:
+    """Encrypts with the first secret, decrypts with any of them."""
+    return MultiFernet([Fernet(fernet_key(s)) for s in (secrets or configured_secrets())])
+
+
+def hash_password(password: str) -> str:
+    """Hash password using PBKDF2 (salt:hash hex string)."""
+    salt = os.urandom(16)
+    pwd_hash = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, 100_000)
+    return salt.hex() + ':' + pwd_hash.hex()
+
+
+# ==================== WORKER FUNCTIONS ====================
+# Module-level so they can be pickled into the process pool.
+
+_worker_fernet: Optional[MultiFernet] = None
+
+
+def _init_worker(secrets: Sequence[str]):
+    global _worker_fernet
+    _worker_fernet = build_fernet(secrets)
+
+
+def _as_bytes(token: Token) -> Optional[bytes]:
+    if token is None:
+        return None
+    return token.encode("utf-8") if isinstance(token, str) else bytes(token)
+
+
+def _encrypt_chunk(values: Sequence[Optional[str]], fernet: MultiFernet = None) -> List[Optional[bytes]]:
+    fernet = fernet or _worker_fernet
+    return [None if v is None else fernet.encrypt(str(v).encode("utf-8")) for v in values]
+
+
+def _decrypt_chunk(tokens: Sequence[Token], fernet: MultiFernet = None) -> List[Optional[str]]:
+    fernet = fernet or _worker_fernet
+    out = []
+    for token in tokens:
+        try:
+            out.append(None if token is None else fernet.decrypt(_as_bytes(token)).decode("utf-8"))
+        except InvalidToken:
+            out.append(None)
+    return out
+
+
+def _rotate_chunk(tokens: Sequence[Token], fernet: MultiFernet = None) -> List[Optional[bytes]]:
+    """Re-encrypt under the current key; unreadable tokens come back as None."""
+    fernet = fernet or _worker_fernet
+    out = []
+    for token in tokens:
+        try:
+            out.append(None if token is None else fernet.rotate(_as_bytes(token)))
+        except InvalidToken:
+            out.append(None)
+    return out
+
+
+def _hash_chunk(passwords: Sequence[str], fernet: MultiFernet = None) -> List[str]:
+    return [hash_password(p) for p in passwords]
+
+
+# ==================== SERVICE ====================
+
+class BatchCrypto:
+    """
+    Encrypts, decrypts and rotates lists of values in chunks spread over
+    a process pool (Fernet is pure CPU work, so threads would serialize on
+    the GIL). Lists shorter than one chunk are handled in-process.
+    """
+
+    # PBKDF2 costs ~0.1s per password, so hashing uses much smaller chunks
+    HASH_CHUNK_SIZE = 8
+
+    def __init__(self, secrets: Sequence[str] = None, workers: int = None, chunk_size: int = 500):
+        self.secrets = list(secrets or configured_secrets())
+        self.fernet = build_fernet(self.secrets)
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _map(self, func, values: Sequence, chunk_size: int = None) -> list:
+        values = list(values)
+        chunk_size = chunk_size or self.chunk_size
+        if len(values) <= chunk_size or self.workers <= 1:
+            return func(values, self.fernet)
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker, initargs=(self.secrets,)
+            )
+        chunks = [values[i:i + chunk_size] for i in range(0, len(values), chunk_size)]
+        out = []
+        for result in self._pool.map(func, chunks):
+            out.extend(result)
+        return out
+
+    def encrypt_many(self, values: Sequence[Optional[str]]) -> List[Optional[bytes]]:
+        return self._map(_encrypt_chunk, values)
+
+    def decrypt_many(self, tokens: Sequence[Token]) -> List[Optional[str]]:
+        """Plaintexts in order; None for NULLs and tokens no configured key can read."""
+        return self._map(_decrypt_chunk, tokens)
+
+    def rotate_many(self, tokens: Sequence[Token]) -> List[Optional[bytes]]:
+        return self._map(_rotate_chunk, tokens)
+
+    def hash_passwords(self, passwords: Sequence[str]) -> List[str]:
+        """hash_password() for each value, in the same order."""
+        return self._map(_hash_chunk, passwords, chunk_size=self.HASH_CHUNK_SIZE)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,101 +1,836 @@
 import pyodbc
 import pandas as pd
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, List, Tuple
+import threading
 import time
 import warnings
 from contextlib import contextmanager
+from datetime import date, datetime
 import os
 import hashlib
-from cryptography.fernet import Fernet
-from base64 import urlsafe_b64encode
+import itertools
+import json
+import math
+import re
+from crypto_service import build_fernet, hash_password
 
 import random
 
 # Suppress pandas SQLAlchemy warning for pyodbc
 warnings.filterwarnings('ignore', message='pandas only supports SQLAlchemy connectable')
 
+# Additive counters kept in dbo.User_Activity_Stats (see PSM/create_tables.sql)
+ACTIVITY_COUNTERS = (
+    'Total_Products_Listed', 'Active_Listings', 'Products_Sold',
+    'Orders_As_Seller', 'Total_Revenue_As_Seller',
+    'Orders_As_Buyer', 'Total_Spent_As_Buyer',
+    'Ratings_Received_Count', 'Ratings_Received_Sum', 'Ratings_Given_Count',
+    'Disputes_Filed',
+)
+
+
+def activity_merge_sql(source: str) -> str:
+    """
+    Build a MERGE that adds the counters produced by `source` onto
+    dbo.User_Activity_Stats. `source` must be a SELECT returning UserID,
+    every column in ACTIVITY_COUNTERS and First_Listing_Date (or NULL),
+    with at most one row per UserID.
+    """
+    updates = ",\n            ".join(f"t.{c} = t.{c} + s.{c}" for c in ACTIVITY_COUNTERS)
+    columns = ", ".join(ACTIVITY_COUNTERS)
+    values = ", ".join(f"s.{c}" for c in ACTIVITY_COUNTERS)
+    return f"""
+    MERGE dbo.User_Activity_Stats WITH (HOLDLOCK) AS t
+    USING ({source}) AS s
+    ON t.UserID = s.UserID
+    WHEN MATCHED THEN
+        UPDATE SET
+            {updates},
+            t.First_Listing_Date = CASE
+                WHEN s.First_Listing_Date IS NOT NULL
+                 AND (t.First_Listing_Date IS NULL OR s.First_Listing_Date < t.First_Listing_Date)
+                THEN s.First_Listing_Date ELSE t.First_Listing_Date END,
+            t.Last_Updated = GETDATE()
+    WHEN NOT MATCHED THEN
+        INSERT (UserID, {columns}, First_Listing_Date, Last_Updated)
+        VALUES (s.UserID, {values}, s.First_Listing_Date, GETDATE());
+    """
+
+
+# Applies a batch of inserted ratings captured in a @Ratings table variable
+# (Rater_UserID, Rated_UserID, Rating_Value) by an OUTPUT clause.
+RATING_ACTIVITY_SQL = activity_merge_sql("""
+        SELECT UserID,
+               0 AS Total_Products_Listed, 0 AS Active_Listings, 0 AS Products_Sold,
+               0 AS Orders_As_Seller, 0 AS Total_Revenue_As_Seller,
+               0 AS Orders_As_Buyer, 0 AS Total_Spent_As_Buyer,
+               SUM(Received_Count) AS Ratings_Received_Count,
+               SUM(Received_Sum) AS Ratings_Received_Sum,
+               SUM(Given_Count) AS Ratings_Given_Count,
+               0 AS Disputes_Filed,
+               CAST(NULL AS DATE) AS First_Listing_Date
+        FROM (
+            SELECT Rated_UserID AS UserID, 1 AS Received_Count, Rating_Value AS Received_Sum, 0 AS Given_Count
+            FROM @Ratings
+            UNION ALL
+            SELECT Rater_UserID, 0, 0, 1
+            FROM @Ratings
+        ) r
+        GROUP BY UserID""")
+
+# Write-behind entry kind -> DatabaseManager method that applies a batch
+WRITE_BEHIND_HANDLERS = {
+    'rating': '_apply_ratings',
+}
+
+# Hot tables and the cold copies dbo.usp_ArchiveOrders moves finished orders into
+HISTORY_TABLES = {
+    'Order': ('[Order]', 'Order_Archive'),
+    'Escrow': ('Escrow', 'Escrow_Archive'),
+    'Order_Collection': ('Order_Collection', 'Order_Collection_Archive'),
+    'Rating': ('Rating', 'Rating_Archive'),
+    'Dispute': ('Dispute', 'Dispute_Archive'),
+}
+
+
+def history_sql(template: str, include_archived: bool = False) -> str:
+    """
+    Render a SELECT written against {Order}, {Escrow}, {Order_Collection},
+    {Rating} and {Dispute} placeholders over the hot tables and, when asked,
+    UNION ALL the same SELECT over the archive tables. {Archived} becomes
+    0 / 1 so callers can tell the rows apart. Callers append ORDER BY and
+    repeat their parameters once per branch.
+    """
+    hot = template.format(Archived=0, **{name: tables[0] for name, tables in HISTORY_TABLES.items()})
+    if not include_archived:
+        return hot
+    cold = template.format(Archived=1, **{name: tables[1] for name, tables in HISTORY_TABLES.items()})
+    return f"{hot}\nUNION ALL\n{cold}"
+
+
+# Listing columns shared by the full catalog read and the delta feed
+# (aliases: p = Product, c = Category, u = seller [User], pm = Product_Media)
+PRODUCT_LISTING_COLUMNS = """p.Product_ID, p.Product_Name, p.Description, p.Unit_price,
+               p.Quantity, p.Product_Status, c.Category_Name, u.User_Name as Seller,
+               p.Standard_price, p.Created_date,
+               p.Primary_Media_ID, pm.Media_link AS Primary_Media_Link,
+               p.Seller_ID, u.Agg_Seller_Rating AS Seller_Rating, p.Rank_Score"""
+
+# Price facet buckets over Unit_price: (label, low inclusive, high exclusive or None)
+PRICE_BUCKETS = [
+    ("Under $10", 0, 10),
+    ("$10 - $25", 10, 25),
+    ("$25 - $50", 25, 50),
+    ("$50 - $100", 50, 100),
+    ("$100 - $250", 100, 250),
+    ("$250 - $500", 250, 500),
+    ("$500+", 500, None),
+]
+
+# Sort keys the faceted search accepts -> ORDER BY over the listing columns
+FACET_SORTS = {
+    'newest': "p.Product_ID DESC",
+    'price_asc': "p.Unit_price ASC, p.Product_ID DESC",
+    'price_desc': "p.Unit_price DESC, p.Product_ID DESC",
+    'recommended': "p.Rank_Score DESC, p.Product_ID DESC",
+}
+
+
+# How long "Add to Cart" / "Buy Now" reserves a listing's units
+HOLD_MINUTES = 10
+
+SEARCH_TERM_RE = re.compile(r"\w{2,}")
+MAX_SAVED_SEARCHES = 20
+
+# Rollup_Watermark row of the daily sales rollup (Sales_Daily)
+SALES_ROLLUP = 'sales_daily'
+
+# Tables in the incremental Parquet export (parquet_export.py): source
+# and exported columns. [User] is an allowlist so names, emails, phones
+# and password hashes never leave the database, including columns added
+# later.
+EXPORT_TABLES: Dict[str, Tuple[str, str]] = {
+    'Product': ('Product', "Product_ID, Category_ID, Seller_ID, Product_Name, Description, Standard_price, "
+                           "Unit_price, Quantity, Product_Status, Created_date, Primary_Media_ID, Rank_Score"),
+    'Order': ('[Order]', "OrderID, Product_ID, Seller_ID, Buyer_ID, Order_Date, Quantity, Status"),
+    'Escrow': ('Escrow', "EscrowID, OrderID, Amount, Status, Created_Date, Release_Date"),
+    'Rating': ('Rating', "RatingID, Order_ID, Rater_UserID, Rated_UserID, Rating_Value, Rating_Date"),
+    'Dispute': ('Dispute', "Dispute_ID, EscrowID, FiledByUserID, Description, Open_Date, "
+                           "Resolution_Details, Resolved_Date, Status"),
+    'User': ('[User]', "UserID, CampusID, Verification_Status, Agg_Seller_Rating"),
+    # Cold copies moved by usp_ArchiveOrders; rows arrive here once, when archived
+    'Order_Archive': ('Order_Archive', "OrderID, Product_ID, Seller_ID, Buyer_ID, Order_Date, Quantity, "
+                                       "Status, Archived_At"),
+    'Escrow_Archive': ('Escrow_Archive', "EscrowID, OrderID, Amount, Status, Created_Date, Release_Date"),
+    'Rating_Archive': ('Rating_Archive', "RatingID, Order_ID, Rater_UserID, Rated_UserID, Rating_Value, Rating_Date"),
+    'Dispute_Archive': ('Dispute_Archive', "Dispute_ID, EscrowID, FiledByUserID, Description, Open_Date, "
+                                           "Resolution_Details, Resolved_Date, Status"),
+}
+
+
+def search_terms(text: str, limit: int = None) -> List[str]:
+    """
+    Distinct lowercase words of `text` as saved-search terms; a trailing
+    plural "s" is folded so "textbooks" and "textbook" meet.
+    """
+    terms = []
+    for word in SEARCH_TERM_RE.findall((text or "").lower()):
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        word = word[:50]
+        if word not in terms:
+            terms.append(word)
+            if limit and len(terms) >= limit:
+                break
+    return terms
+
+
+def category_term(category_id: int) -> str:
+    """Pseudo-term indexing a saved search's category next to its words."""
+    return f"#c{int(category_id)}"
+
+
+def price_bucket_sql(column: str) -> str:
+    """CASE expression mapping `column` to its PRICE_BUCKETS index."""
+    whens = " ".join(f"WHEN {column} < {high} THEN {i}"
+                     for i, (_, _, high) in enumerate(PRICE_BUCKETS) if high is not None)
+    return f"CASE {whens} ELSE {len(PRICE_BUCKETS) - 1} END"
+
+
+# Order counters for a cart checkout: one row per seller plus the buyer,
+# from the @Lines table variable (Seller_ID, Quantity, Unit_price) and @Buyer.
+CART_ACTIVITY_SQL = activity_merge_sql("""
+        SELECT UserID,
+               0 AS Total_Products_Listed, 0 AS Active_Listings, 0 AS Products_Sold,
+               SUM(Orders_As_Seller) AS Orders_As_Seller, SUM(Revenue) AS Total_Revenue_As_Seller,
+               SUM(Orders_As_Buyer) AS Orders_As_Buyer, SUM(Spent) AS Total_Spent_As_Buyer,
+               0 AS Ratings_Received_Count, 0 AS Ratings_Received_Sum, 0 AS Ratings_Given_Count,
+               0 AS Disputes_Filed,
+               CAST(NULL AS DATE) AS First_Listing_Date
+        FROM (
+            SELECT Seller_ID AS UserID, 1 AS Orders_As_Seller, Quantity * Unit_price AS Revenue,
+                   0 AS Orders_As_Buyer, 0 AS Spent
+            FROM @Lines
+            UNION ALL
+            SELECT @Buyer, 0, 0, COUNT(*), SUM(Quantity * Unit_price)
+            FROM @Lines
+        ) x
+        GROUP BY UserID""")
+
+
+# Applies Active/Sold listing transitions captured in a @StatusChanges
+# table variable (Seller_ID, Old_Status, New_Status) by an OUTPUT clause.
+PRODUCT_STATUS_ACTIVITY_SQL = activity_merge_sql("""
+        SELECT Seller_ID AS UserID,
+               0 AS Total_Products_Listed,
+               SUM(CASE WHEN New_Status = 'Active' THEN 1 ELSE 0 END)
+                 - SUM(CASE WHEN Old_Status = 'Active' THEN 1 ELSE 0 END) AS Active_Listings,
+               SUM(CASE WHEN New_Status = 'Sold' THEN 1 ELSE 0 END)
+                 - SUM(CASE WHEN Old_Status = 'Sold' THEN 1 ELSE 0 END) AS Products_Sold,
+               0 AS Orders_As_Seller, 0 AS Total_Revenue_As_Seller,
+               0 AS Orders_As_Buyer, 0 AS Total_Spent_As_Buyer,
+               0 AS Ratings_Received_Count, 0 AS Ratings_Received_Sum, 0 AS Ratings_Given_Count,
+               0 AS Disputes_Filed,
+               CAST(NULL AS DATE) AS First_Listing_Date
+        FROM @StatusChanges
+        WHERE Old_Status <> New_Status
+        GROUP BY Seller_ID""")
+
+
+# ==================== CONNECTION HEALTH ====================
+
+# SQLSTATEs that retrying cannot fix (bad login, missing driver, missing
+# database/object, syntax). Everything else on connect is treated as transient.
+FATAL_SQLSTATES = {'28000', 'IM002', 'IM003', 'IM004', '42000', '42S01', '42S02'}
+
+
+def is_transient_error(error: Exception) -> bool:
+    """True for ODBC errors worth retrying (network, timeouts, server busy)."""
+    if not isinstance(error, pyodbc.Error):
+        return False
+    sqlstate = error.args[0] if error.args else ''
+    return sqlstate not in FATAL_SQLSTATES
+
+
+# Lock conflicts worth re-running a whole transaction for: deadlock victim,
+# lock request timeout, snapshot update conflict, and in-memory OLTP
+# validation/commit-dependency failures.
+RETRYABLE_TRANSACTION_ERRORS = {1205, 1222, 3960, 41302, 41305, 41325, 41301}
+
+
+def transaction_error_code(error: Exception) -> Optional[int]:
+    """SQL Server native error number from a pyodbc message ('... (1205) ...')."""
+    if not isinstance(error, pyodbc.Error) or len(error.args) < 2:
+        return None
+    for code in re.findall(r'\((\d+)\)', str(error.args[1])):
+        if int(code) in RETRYABLE_TRANSACTION_ERRORS:
+            return int(code)
+    return 1205 if error.args[0] == '40001' else None
+
+
+class TransactionAborted(Exception):
+    """Raised by a run_transaction body to roll back and return `result`."""
+
+    def __init__(self, result):
+        super().__init__(result)
+        self.result = result
+
+
+class DatabaseUnavailableError(Exception):
+    """Raised without touching the network while a server's circuit is open."""
+
+
+class QueryTimeoutError(Exception):
+    """A query ran past its timeout or the caller's deadline."""
+
+
+class QueryCancelledError(Exception):
+    """A read was cancelled because its page rerun or navigated away."""
+
+
+class CircuitBreaker:
+    """
+    Per-server breaker shared by every thread of the process.
+    closed -> open after `failure_threshold` consecutive failed connects;
+    open -> half_open once `reset_timeout` passes, letting one probe through;
+    the probe closes it again or re-opens it with a doubled timeout.
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 3,
+                 reset_timeout: float = 5.0, max_reset_timeout: float = 60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    @property
+    def probing(self) -> bool:
+        return self.state == self.HALF_OPEN
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.reset_timeout = self.base_reset_timeout
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN:
+                self.reset_timeout = min(self.reset_timeout * 2, self.max_reset_timeout)
+                self._open()
+            elif self.state == self.CLOSED and self.failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'Target': self.name,
+            'State': self.state,
+            'Consecutive_Failures': self.failures,
+            'Times_Opened': self.times_opened,
+            'Reset_Timeout': self.reset_timeout,
+        }
+
+
 class DatabaseManager:
-    def __init__(self):
-        self.server = 'localhost,1433'
-        self.database = 'campus_marketplace'
+    def __init__(self, server: str = None, database: str = None,
+                 replicas: List[Tuple[str, str]] = None, max_replica_lag: float = None):
+        self.server = server or os.environ.get("DB_SERVER", 'localhost,1433')
+        self.database = database or os.environ.get("DB_NAME", 'campus_marketplace')
         self.username = 'SA'
         self.password = 'DB_password'
         self.driver = '{ODBC Driver 18 for SQL Server}'
         self.max_retries = 3
-        self.retry_delay = 1
+        # Exponential backoff with full jitter: sleep U(0, min(cap, base * 2^attempt))
+        self.retry_delay = 0.2
+        self.retry_max_delay = 2.0
+        self.login_timeout = 5
+
+        # === Connection health ===
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._breakers_lock = threading.Lock()
+        self._metrics: Dict[str, int] = {}
+        self._metrics_lock = threading.Lock()
+
+        # === Query deadlines ===
+        # Seconds per statement unless a method passes its own (0 = no limit);
+        # `with db.deadline(s):` can only shorten it
+        self.default_query_timeout = int(os.environ.get("DB_QUERY_TIMEOUT", 30))
+        self.cancel_poll_interval = 0.2
+        self._statements: Dict[int, Tuple[Any, Optional[str], Any]] = {}
+        self._statements_lock = threading.Lock()
+        self._watchdog: Optional[threading.Thread] = None
+
+        # === Read replicas ===
+        # [(server, database), ...]; from DB_READ_REPLICAS as
+        # "server/database;server/database" when not passed in.
+        if replicas is None:
+            replicas = self._parse_replicas(os.environ.get("DB_READ_REPLICAS", ""))
+        self.replicas = list(replicas)
+        # Staleness budget in seconds. Replicas further behind than this
+        # are skipped; 0 trusts replicas without checking (local stand-ins).
+        if max_replica_lag is None:
+            max_replica_lag = float(os.environ.get("DB_REPLICA_MAX_LAG", 5))
+        self.max_replica_lag = max_replica_lag
+        self.replica_check_interval = 2.0
+        # After a session writes, its reads stay on the primary until every
+        # usable replica must have caught up (lag is capped by the budget).
+        self.sticky_window = max_replica_lag + self.replica_check_interval
+        self._replica_healthy = [True] * len(self.replicas)
+        self._replica_lag = [None] * len(self.replicas)
+        self._replica_checked_at = 0.0
+        self._replica_check_lock = threading.Lock()
+        # Shared turn counter: next() on itertools.count is atomic under the GIL
+        self._replica_turn = itertools.count()
+        self._heartbeat_stale = False
+        self._last_write = {}
+        self._last_write_lock = threading.Lock()
+        self._local = threading.local()
 
         # === Encryption setup for phone + password ===
-        # Use an environment variable in real deployments
-        base_key = os.environ.get("APP_SECRET_KEY", "super-secret-key-for-demo-1234")
-        # Fernet requires a 32-byte urlsafe base64 key
-        key = urlsafe_b64encode(base_key.encode("utf-8")[:32].ljust(32, b'0'))
-        self.fernet = Fernet(key)
-        
-    def get_connection(self):
-        """Create database connection with retry logic"""
-        for attempt in range(self.max_retries):
+        # Use an environment variable in real deployments. APP_SECRET_KEY
+        # encrypts; APP_PREVIOUS_KEYS still decrypt while a key rotation
+        # (python jobs.py rotate-phone-key) is in progress.
+        self.fernet = build_fernet()
+
+    @staticmethod
+    def _parse_replicas(spec: str) -> List[Tuple[str, str]]:
+        replicas = []
+        for entry in spec.split(";"):
+            entry = entry.strip()
+            if not entry:
+                continue
+            server, _, database = entry.rpartition("/")
+            replicas.append((server, database) if server else (database, 'campus_marketplace'))
+        return replicas
+
+    def _connect(self, server: str, database: str, read_only: bool = False):
+        """
+        Open a connection to one server. Transient failures are retried
+        with jittered exponential backoff; while the server's breaker is
+        open this fails immediately with DatabaseUnavailableError.
+        """
+        breaker = self._breaker(server, database)
+        if not breaker.allow():
+            self._count('breaker_rejections')
+            raise DatabaseUnavailableError(f"Database {server}/{database} is unavailable (circuit open)")
+
+        connection_string = (
+            f'DRIVER={self.driver};'
+            f'SERVER={server};'
+            f'DATABASE={database};'
+            f'UID={self.username};'
+            f'PWD={self.password};'
+            f'TrustServerCertificate=yes;'
+            + ('ApplicationIntent=ReadOnly;' if read_only else '')
+        )
+        # A half-open probe gets a single attempt
+        attempts = 1 if breaker.probing else self.max_retries
+        for attempt in range(attempts):
             try:
-                connection_string = (
-                    f'DRIVER={self.driver};'
-                    f'SERVER={self.server};'
-                    f'DATABASE={self.database};'
-                    f'UID={self.username};'
-                    f'PWD={self.password};'
-                    f'TrustServerCertificate=yes;'
-                )
-                return pyodbc.connect(connection_string)
+                conn = pyodbc.connect(connection_string, timeout=self.login_timeout)
+                breaker.record_success()
+                self._count('connections')
+                return conn
             except Exception as e:
-                if attempt < self.max_retries - 1:
-                    time.sleep(self.retry_delay)
-                else:
-                    raise e
-    
+                self._count('connect_failures')
+                if not is_transient_error(e):
+                    # The server answered (bad login, unknown database, ...)
+                    breaker.record_success()
+                    raise
+                if attempt == attempts - 1:
+                    breaker.record_failure()
+                    raise
+                self._count('connect_retries')
+                time.sleep(random.uniform(0, min(self.retry_max_delay, self.retry_delay * 2 ** attempt)))
+
+    def _breaker(self, server: str, database: str) -> CircuitBreaker:
+        name = f"{server}/{database}"
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._breakers_lock:
+                breaker = self._breakers.setdefault(name, CircuitBreaker(name))
+        return breaker
+
+    def _count(self, name: str, n: int = 1):
+        with self._metrics_lock:
+            self._metrics[name] = self._metrics.get(name, 0) + n
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Connection counters and per-server breaker state."""
+        with self._metrics_lock:
+            counters = dict(self._metrics)
+        return {
+            'counters': counters,
+            'breakers': [b.snapshot() for b in list(self._breakers.values())],
+        }
+
+    def get_connection(self, read_only: bool = False, timeout: int = None):
+        """
+        Create database connection with retry logic.
+        read_only=True may be served by a replica; writes, checkout and
+        escrow always use the primary. Statements on the connection time
+        out after `timeout` seconds (see _query_timeout).
+        """
+        seconds = self._query_timeout(timeout)
+        conn = self._open(read_only)
+        conn.timeout = seconds
+        return conn
+
+    def _open(self, read_only: bool):
+        if read_only:
+            index = self._pick_replica()
+            if index is not None:
+                server, database = self.replicas[index]
+                try:
+                    return self._connect(server, database, read_only=True)
+                except Exception as e:
+                    if not isinstance(e, DatabaseUnavailableError):
+                        print(f"Replica {server}/{database} unavailable, using primary: {e}")
+                    self._replica_healthy[index] = False
+        return self._connect(self.server, self.database)
+
     @contextmanager
-    def get_cursor(self):
-        """Context manager for database cursor"""
-        conn = self.get_connection()
+    def get_cursor(self, read_only: bool = False, timeout: int = None, replica_ok: bool = None):
+        """
+        Context manager for database cursor.
+        read_only: the statement may be cancelled on rerun; replica_ok
+        defaults to read_only. Writers call _note_write() after commit so
+        the session's next reads go to the primary (read-your-writes).
+        """
+        conn = self.get_connection(read_only if replica_ok is None else replica_ok, timeout)
         cursor = conn.cursor()
+        # Only reads are cancelled on rerun; writes run to commit or timeout
+        statement = self._track(cursor) if read_only else None
         try:
             yield conn, cursor
         finally:
+            self._untrack(statement)
             cursor.close()
             conn.close()
     
-    def execute_query(self, query: str, params: tuple = None) -> bool:
+    def execute_query(self, query: str, params: tuple = None, timeout: int = None) -> bool:
         """Execute INSERT, UPDATE, DELETE queries with transaction support"""
         try:
-            with self.get_cursor() as (conn, cursor):
+            with self.get_cursor(timeout=timeout) as (conn, cursor):
                 if params:
                     cursor.execute(query, params)
                 else:
                     cursor.execute(query)
                 conn.commit()
+                self._note_write()
                 return True
+        except (QueryTimeoutError, QueryCancelledError):
+            raise
         except Exception as e:
+            self._raise_if_interrupted(e)
             print(f"Error executing query: {e}")
             return False
     
-    def fetch_data(self, query: str, params: tuple = None) -> pd.DataFrame:
-        """Fetch data and return as DataFrame"""
+    def fetch_data(self, query: str, params: tuple = None, replica_ok: bool = False,
+                   timeout: int = None) -> pd.DataFrame:
+        """
+        Fetch data and return as DataFrame.
+        Pass replica_ok=True for reads that tolerate bounded staleness
+        (catalog, listings, history, admin reports).
+        Raises QueryTimeoutError / QueryCancelledError; other errors
+        return an empty DataFrame.
+        """
         try:
-            conn = self.get_connection()
-            if params:
-                df = pd.read_sql(query, conn, params=params)
-            else:
-                df = pd.read_sql(query, conn)
-            conn.close()
-            return df
+            with self.get_cursor(read_only=True, timeout=timeout, replica_ok=replica_ok) as (conn, cursor):
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                return self._frame(cursor)
+        except (QueryTimeoutError, QueryCancelledError):
+            raise
         except Exception as e:
+            self._raise_if_interrupted(e)
             print(f"Error fetching data: {e}")
             return pd.DataFrame()
+
+    @staticmethod
+    def _frame(cursor) -> pd.DataFrame:
+        """Current result set as a DataFrame (same conversions as pd.read_sql)."""
+        if cursor.description is None:
+            return pd.DataFrame()
+        columns = [col[0] for col in cursor.description]
+        return pd.DataFrame.from_records(
+            [tuple(row) for row in cursor.fetchall()], columns=columns, coerce_float=True
+        )
+
+    # ==================== DEADLINES & CANCELLATION ====================
+
+    @contextmanager
+    def deadline(self, seconds: float):
+        """
+        Bound every statement issued by this thread inside the block to
+        finish within `seconds` overall. Nested deadlines keep the earliest.
+        """
+        previous = getattr(self._local, 'deadline', None)
+        deadline = time.monotonic() + seconds
+        self._local.deadline = deadline if previous is None else min(previous, deadline)
+        try:
+            yield
+        finally:
+            self._local.deadline = previous
+
+    def _query_timeout(self, timeout: Optional[int]) -> int:
+        """Whole seconds for pyodbc's query timeout (0 = none)."""
+        seconds = self.default_query_timeout if timeout is None else timeout
+        deadline = getattr(self._local, 'deadline', None)
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._count('query_timeouts')
+                raise QueryTimeoutError("Deadline passed before the query started")
+            seconds = remaining if not seconds else min(seconds, remaining)
+        return int(math.ceil(seconds)) if seconds else 0
+
+    def _raise_if_interrupted(self, error: Exception):
+        """Turn ODBC timeout/cancel errors into the distinct exceptions pages handle."""
+        if not isinstance(error, pyodbc.Error) or not error.args:
+            return
+        if error.args[0] == 'HYT00':
+            self._count('query_timeouts')
+            raise QueryTimeoutError("The database took too long to answer; please try again") from error
+        if error.args[0] == 'HY008':
+            self._count('query_cancellations')
+            raise QueryCancelledError("Query cancelled") from error
+
+    def _track(self, cursor) -> Optional[int]:
+        session = getattr(self._local, 'session', None)
+        cancel_check = getattr(self._local, 'cancel_check', None)
+        if session is None and cancel_check is None:
+            return None
+        key = id(cursor)
+        with self._statements_lock:
+            self._statements[key] = (cursor, session, cancel_check)
+            if cancel_check is not None and self._watchdog is None:
+                self._watchdog = threading.Thread(target=self._watch, name="query-watchdog", daemon=True)
+                self._watchdog.start()
+        return key
+
+    def _untrack(self, key: Optional[int]):
+        if key is not None:
+            with self._statements_lock:
+                self._statements.pop(key, None)
+
+    def _watch(self):
+        """Cancel in-flight reads whose owner says it no longer needs them."""
+        while True:
+            time.sleep(self.cancel_poll_interval)
+            with self._statements_lock:
+                statements = list(self._statements.items())
+            for key, (cursor, _, cancel_check) in statements:
+                try:
+                    if cancel_check is not None and cancel_check():
+                        cursor.cancel()
+                        self._untrack(key)
+                except Exception:
+                    pass
+
+    def cancel_session(self, session_key: str) -> int:
+        """Cancel every in-flight read issued on behalf of a session."""
+        with self._statements_lock:
+            cursors = [(k, c) for k, (c, s, _) in self._statements.items() if s == session_key]
+        for key, cursor in cursors:
+            try:
+                cursor.cancel()
+            except Exception:
+                pass
+            self._untrack(key)
+        return len(cursors)
+
+    # ==================== TRANSACTIONS ====================
+
+    def run_transaction(self, body, name: str = 'transaction', max_attempts: int = 4,
+                        timeout: int = None):
+        """
+        Run `body(cursor)` in one transaction on the primary and commit.
+        If SQL Server aborts it for a lock conflict (deadlock victim, lock
+        timeout, ...) the whole body is re-run, up to `max_attempts` times
+        with short jittered backoff, so bodies must be safe to repeat.
+        A body can raise TransactionAborted(result) to roll back and
+        return `result`. Retries are counted in get_metrics(). A timeout
+        or cancel raises QueryTimeoutError / QueryCancelledError.
+        """
+        conn = self.get_connection(timeout=timeout)
+        try:
+            for attempt in range(1, max_attempts + 1):
+                cursor = conn.cursor()
+                try:
+                    result = body(cursor)
+                    conn.commit()
+                    self._note_write()
+                    if attempt > 1:
+                        self._count('transaction_retry_successes')
+                    return result
+                except TransactionAborted as abort:
+                    conn.rollback()
+                    return abort.result
+                except Exception as e:
+                    try:
+                        conn.rollback()
+                    except pyodbc.Error:
+                        pass
+                    code = transaction_error_code(e)
+                    if code is None:
+                        self._raise_if_interrupted(e)
+                        raise
+                    self._count('transaction_retries')
+                    self._count(f'transaction_retries.{name}')
+                    if attempt == max_attempts:
+                        self._count('transaction_retries_exhausted')
+                        raise
+                    print(f"↻ {name}: error {code}, retrying ({attempt}/{max_attempts - 1})")
+                    time.sleep(random.uniform(0, min(1.0, 0.05 * 2 ** attempt)))
+                finally:
+                    cursor.close()
+        finally:
+            conn.close()
+
+    # ==================== READ ROUTING ====================
+
+    def bind_session(self, session_key: Optional[str], cancel_check=None):
+        """
+        Attach the calling thread to a UI session so writes made on it
+        pin that session's reads to the primary (read-your-writes).
+        `cancel_check()` is polled from a watchdog thread while a read is
+        in flight; returning True cancels it (e.g. the page reran).
+        """
+        self._local.session = session_key
+        self._local.cancel_check = cancel_check
+
+    def _note_write(self):
+        session = getattr(self._local, 'session', None)
+        if session is None or not self.replicas:
+            return
+        now = time.monotonic()
+        with self._last_write_lock:
+            self._last_write[session] = now
+            if len(self._last_write) > 10000:
+                cutoff = now - self.sticky_window
+                self._last_write = {k: t for k, t in self._last_write.items() if t >= cutoff}
+
+    def _session_is_sticky(self) -> bool:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            return False
+        wrote_at = self._last_write.get(session)
+        return wrote_at is not None and time.monotonic() - wrote_at < self.sticky_window
+
+    def _pick_replica(self) -> Optional[int]:
+        """Round-robin over replicas within the staleness budget, or None for the primary."""
+        if not self.replicas or self._session_is_sticky():
+            return None
+        self._refresh_replica_health()
+        candidates = [i for i, ok in enumerate(self._replica_healthy) if ok]
+        if not candidates:
+            return None
+        return candidates[next(self._replica_turn) % len(candidates)]
+
+    def stamp_replica_heartbeat(self) -> bool:
+        """Stamp dbo.Replica_Heartbeat on the primary (python jobs.py replica-heartbeat)."""
+        return self.execute_query(
+            "UPDATE dbo.Replica_Heartbeat SET Beat_Time = SYSUTCDATETIME() WHERE Heartbeat_ID = 1"
+        )
+
+    def _read_heartbeat(self, server: str, database: str,
+                        read_only: bool = False) -> Optional[Tuple[datetime, float]]:
+        """(Beat_Time, its age in seconds) as one server sees it, or None."""
+        try:
+            conn = self._connect(server, database, read_only=read_only)
+            try:
+                row = conn.cursor().execute(
+                    "SELECT Beat_Time, DATEDIFF_BIG(MILLISECOND, Beat_Time, SYSUTCDATETIME()) "
+                    "FROM dbo.Replica_Heartbeat WHERE Heartbeat_ID = 1"
+                ).fetchone()
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"Error reading replica heartbeat on {server}/{database}: {e}")
+            return None
+        if not row or row[0] is None:
+            return None
+        return row[0], row[1] / 1000.0
+
+    def _refresh_replica_health(self):
+        """
+        Measure replica lag from dbo.Replica_Heartbeat at most once per
+        check interval, without writing. python jobs.py replica-heartbeat
+        stamps the primary's row on a fixed cadence, and a replica's lag is
+        how far its copy of the stamp is behind the primary's. If the
+        primary's own stamp is older than the budget, the job isn't running
+        and lag can't be measured, so reads stay on the primary.
+        Only one thread probes; the rest use the last result.
+        """
+        if time.monotonic() - self._replica_checked_at < self.replica_check_interval:
+            return
+        if not self._replica_check_lock.acquire(blocking=False):
+            return
+        try:
+            if self.max_replica_lag <= 0:
+                self._replica_healthy = [True] * len(self.replicas)
+                return
+            primary = self._read_heartbeat(self.server, self.database)
+            if primary is None or primary[1] > self.max_replica_lag:
+                if not self._heartbeat_stale:
+                    print("Replica heartbeat on the primary is missing or stale "
+                          "(is python jobs.py replica-heartbeat running?); reading from the primary")
+                self._heartbeat_stale = True
+                self._replica_lag = [None] * len(self.replicas)
+                self._replica_healthy = [False] * len(self.replicas)
+                return
+            self._heartbeat_stale = False
+
+            healthy, lags = [], []
+            for server, database in self.replicas:
+                replica = self._read_heartbeat(server, database, read_only=True)
+                lag = None if replica is None else max(0.0, (primary[0] - replica[0]).total_seconds())
+                lags.append(lag)
+                healthy.append(lag is not None and lag <= self.max_replica_lag)
+            self._replica_lag = lags
+            self._replica_healthy = healthy
+        finally:
+            self._replica_checked_at = time.monotonic()
+            self._replica_check_lock.release()
+
+    def get_replica_status(self) -> List[Dict[str, Any]]:
+        """Last measured lag per replica, for the admin dashboard."""
+        return [
+            {'Server': server, 'Database': database,
+             'Lag_Seconds': self._replica_lag[i], 'In_Rotation': self._replica_healthy[i]}
+            for i, (server, database) in enumerate(self.replicas)
+        ]
         
     # ==================== SECURITY HELPERS ====================
 
     def hash_password(self, password: str) -> str:
         """Hash password using PBKDF2 (salt:hash hex string)."""
-        salt = os.urandom(16)
-        pwd_hash = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, 100_000)
-        return salt.hex() + ':' + pwd_hash.hex()
+        return hash_password(password)
 
     def verify_password(self, password: str, stored: str) -> bool:
         """Verify password against stored salt:hash."""
@@ -120,11 +855,195 @@ class DatabaseManager:
         try:
             if encrypted_phone is None:
                 return ""
-            return self.fernet.decrypt(encrypted_phone.encode('utf-8')).decode('utf-8')
+            if isinstance(encrypted_phone, str):
+                encrypted_phone = encrypted_phone.encode('utf-8')
+            return self.fernet.decrypt(bytes(encrypted_phone)).decode('utf-8')
         except Exception:
             return ""
     
-    # ==================== AUTHENTICATION ====================
+    # ==================== KEY ROTATION ====================
+
+    def get_encrypted_phones_after(self, after_user_id: int, limit: int) -> List[Tuple[int, bytes]]:
+        """
+        Next keyset chunk of (UserID, Encrypted_Phone) after `after_user_id`,
+        read as a clustered-index range seek so no long-lived locks are held.
+        """
+        query = """
+        SELECT TOP (?) UserID, Encrypted_Phone
+        FROM [User]
+        WHERE UserID > ? AND Encrypted_Phone IS NOT NULL
+        ORDER BY UserID
+        """
+        with self.get_cursor(read_only=True, replica_ok=False) as (conn, cursor):
+            cursor.execute(query, (int(limit), int(after_user_id)))
+            return [(int(row[0]), bytes(row[1])) for row in cursor.fetchall()]
+
+    def update_encrypted_phones(self, rows: List[Tuple[int, bytes, bytes]]) -> int:
+        """
+        Swap (UserID, old_token, new_token) in one short statement. A row
+        whose token changed since it was read (e.g. the user edited their
+        phone) is left alone. Returns the number of rows updated.
+        Keep chunks under ~5000 rows so SQL Server doesn't escalate to a
+        table lock.
+        """
+        if not rows:
+            return 0
+        with self.get_cursor() as (conn, cursor):
+            cursor.execute("""
+            CREATE TABLE #Rotation (
+                UserID     INT PRIMARY KEY,
+                Old_Token  VARBINARY(1024) NOT NULL,
+                New_Token  VARBINARY(1024) NOT NULL
+            );
+            """)
+            cursor.fast_executemany = True
+            cursor.setinputsizes([(pyodbc.SQL_INTEGER, 0, 0),
+                                  (pyodbc.SQL_VARBINARY, 1024, 0),
+                                  (pyodbc.SQL_VARBINARY, 1024, 0)])
+            cursor.executemany("INSERT INTO #Rotation (UserID, Old_Token, New_Token) VALUES (?, ?, ?)", rows)
+            cursor.execute("""
+            SET NOCOUNT ON;
+            UPDATE u
+            SET Encrypted_Phone = r.New_Token
+            FROM [User] u
+            JOIN #Rotation r ON r.UserID = u.UserID
+            WHERE u.Encrypted_Phone = r.Old_Token;
+            DECLARE @Updated INT = @@ROWCOUNT;
+            DROP TABLE #Rotation;
+            SELECT @Updated;
+            """)
+            updated = int(cursor.fetchone()[0])
+            conn.commit()
+            self._note_write()
+            return updated
+
+    # ==================== ROSTER IMPORT ====================
+
+    def upsert_user_lookup(self, rows: List[Tuple[str, str]]) -> Tuple[bool, int, int, str]:
+        """
+        Bulk-load (Neu_Email, Expected_User_Name) pairs into User_Lookup:
+        one fast_executemany into a temp table, then a single MERGE.
+        Emails are matched case-insensitively (column collation) and
+        unchanged rows are not touched. Returns (success, inserted, updated, message).
+        """
+        if not rows:
+            return True, 0, 0, "Nothing to import"
+        try:
+            # MERGE rejects a source with duplicate keys; last row wins
+            staged = {}
+            for email, name in rows:
+                staged[email.strip().lower()] = (email.strip(), name.strip())
+
+            with self.get_cursor() as (conn, cursor):
+                cursor.execute("""
+                CREATE TABLE #Roster (
+                    Neu_Email          NVARCHAR(255) NOT NULL PRIMARY KEY,
+                    Expected_User_Name NVARCHAR(100) NOT NULL
+                );
+                """)
+                cursor.fast_executemany = True
+                cursor.setinputsizes([(pyodbc.SQL_WVARCHAR, 255, 0), (pyodbc.SQL_WVARCHAR, 100, 0)])
+                cursor.executemany(
+                    "INSERT INTO #Roster (Neu_Email, Expected_User_Name) VALUES (?, ?)",
+                    list(staged.values())
+                )
+                cursor.execute("""
+                SET NOCOUNT ON;
+                DECLARE @Actions TABLE (Action NVARCHAR(10));
+
+                MERGE dbo.User_Lookup WITH (HOLDLOCK) AS t
+                USING #Roster AS s
+                    ON t.Neu_Email = s.Neu_Email
+                WHEN MATCHED AND t.Expected_User_Name <> s.Expected_User_Name THEN
+                    UPDATE SET Expected_User_Name = s.Expected_User_Name
+                WHEN NOT MATCHED BY TARGET THEN
+                    INSERT (Neu_Email, Expected_User_Name) VALUES (s.Neu_Email, s.Expected_User_Name)
+                OUTPUT $action INTO @Actions;
+
+                DROP TABLE #Roster;
+                SELECT ISNULL(SUM(CASE WHEN Action = 'INSERT' THEN 1 ELSE 0 END), 0),
+                       ISNULL(SUM(CASE WHEN Action = 'UPDATE' THEN 1 ELSE 0 END), 0)
+                FROM @Actions;
+                """)
+                inserted, updated = cursor.fetchone()
+                conn.commit()
+                self._note_write()
+            return True, int(inserted), int(updated), f"{inserted} added, {updated} renamed"
+        except Exception as e:
+            print(f"Error importing roster: {e}")
+            return False, 0, 0, f"Error importing roster: {e}"
+
+    def get_registered_emails(self, emails: List[str]) -> set:
+        """Which of `emails` already have a [User] row (lowercased)."""
+        if not emails:
+            return set()
+        query = """
+        SELECT u.Email_ID
+        FROM OPENJSON(?) j
+        JOIN [User] u ON u.Email_ID = CAST(j.[value] AS NVARCHAR(255))
+        """
+        with self.get_cursor(read_only=True, replica_ok=False) as (conn, cursor):
+            cursor.execute(query, (json.dumps(list(emails)),))
+            return {str(row[0]).lower() for row in cursor.fetchall()}
+
+    def provision_users(self, rows: List[Tuple[int, str, str, str, bytes, bytes]]) -> Tuple[bool, List[str], str]:
+        """
+        Pre-create verified [User] rows from
+        (CampusID, User_Name, Email_ID, Phone_number, password_hash, encrypted_phone)
+        tuples in one set-based INSERT. Emails missing from User_Lookup or
+        already registered are skipped. Returns (success, created emails, message).
+        """
+        if not rows:
+            return True, [], "Nothing to provision"
+        try:
+            with self.get_cursor() as (conn, cursor):
+                cursor.execute("""
+                CREATE TABLE #NewUsers (
+                    Email_ID           NVARCHAR(255)   NOT NULL PRIMARY KEY,
+                    CampusID           INT             NOT NULL,
+                    User_Name          NVARCHAR(100)   NOT NULL,
+                    Phone_number       NVARCHAR(20)    NOT NULL,
+                    Encrypted_Password VARBINARY(256)  NOT NULL,
+                    Encrypted_Phone    VARBINARY(1024) NULL
+                );
+                """)
+                cursor.fast_executemany = True
+                cursor.setinputsizes([(pyodbc.SQL_WVARCHAR, 255, 0), (pyodbc.SQL_INTEGER, 0, 0),
+                                      (pyodbc.SQL_WVARCHAR, 100, 0), (pyodbc.SQL_WVARCHAR, 20, 0),
+                                      (pyodbc.SQL_VARBINARY, 256, 0), (pyodbc.SQL_VARBINARY, 1024, 0)])
+                cursor.executemany(
+                    "INSERT INTO #NewUsers (Email_ID, CampusID, User_Name, Phone_number, "
+                    "Encrypted_Password, Encrypted_Phone) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(email, int(campus_id), name, phone, pwd, enc_phone)
+                     for campus_id, name, email, phone, pwd, enc_phone in rows]
+                )
+                cursor.execute("""
+                SET NOCOUNT ON;
+                DECLARE @Created TABLE (Email_ID NVARCHAR(255));
+
+                INSERT INTO [User] (
+                    CampusID, User_Name, Verification_Status, Phone_number,
+                    Agg_Seller_Rating, Email_ID, Encrypted_Password, Encrypted_Phone
+                )
+                OUTPUT inserted.Email_ID INTO @Created
+                SELECT n.CampusID, n.User_Name, N'Verified', n.Phone_number,
+                       0, l.Neu_Email, n.Encrypted_Password, n.Encrypted_Phone
+                FROM #NewUsers n
+                JOIN dbo.User_Lookup l ON l.Neu_Email = n.Email_ID
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM [User] u WITH (UPDLOCK, HOLDLOCK) WHERE u.Email_ID = n.Email_ID
+                );
+
+                DROP TABLE #NewUsers;
+                SELECT Email_ID FROM @Created;
+                """)
+                created = [str(row[0]) for row in cursor.fetchall()]
+                conn.commit()
+                self._note_write()
+            return True, created, f"{len(created)} accounts created"
+        except Exception as e:
+            print(f"Error provisioning users: {e}")
+            return False, [], f"Error provisioning users: {e}"
 
     # ==================== AUTHENTICATION ====================
 
@@ -144,6 +1063,7 @@ class DatabaseManager:
                    u.Verification_Status,
                    u.Agg_Seller_Rating,
                    u.Encrypted_Password,
+                   u.CampusID,
                    c.Campus_Name
             FROM [User] u
             JOIN Campus c ON u.CampusID = c.CampusID
@@ -157,6 +1077,9 @@ class DatabaseManager:
             user = user_df.iloc[0]
             stored_hash = user['Encrypted_Password']
 
+            if isinstance(stored_hash, (bytes, bytearray)):
+                stored_hash = bytes(stored_hash).decode('ascii', errors='replace')
+
             # Seed data path: no encrypted password yet → accept any non-empty password
             if stored_hash is None or str(stored_hash).strip() == "":
                 if not password:
@@ -174,7 +1097,8 @@ class DatabaseManager:
                 'phone': str(user['Phone_number']),   # we keep showing plain phone
                 'rating': float(user['Agg_Seller_Rating']),
                 'verification': str(user['Verification_Status']),
-                'campus': str(user['Campus_Name'])
+                'campus': str(user['Campus_Name']),
+                'campus_id': int(user['CampusID'])
             }
 
         except Exception as e:
@@ -191,8 +1115,54 @@ class DatabaseManager:
         JOIN Campus c ON u.CampusID = c.CampusID
         ORDER BY u.UserID
         """
-        return self.fetch_data(query)
-    
+        return self.fetch_data(query, replica_ok=True, timeout=10)
+
+    def search_users(self, prefix: str = None, campus_id: int = None,
+                     verification_status: str = None, after_id: int = 0,
+                     limit: int = 50) -> pd.DataFrame:
+        """
+        One page of the admin user directory.
+
+        - prefix matches the start of Email_ID or User_Name (sargable LIKE 'x%',
+          served by the Email_ID unique index and IX_User_Name)
+        - keyset pagination: pass the last UserID of the previous page as after_id
+        - activity counts come from User_Activity_Stats (one PK seek per row)
+        """
+        filters = ["u.UserID > ?"]
+        params = [int(after_id or 0)]
+
+        if prefix:
+            pattern = (str(prefix).strip()
+                       .replace('[', '[[]').replace('%', '[%]').replace('_', '[_]')) + '%'
+            filters.append("(u.Email_ID LIKE ? OR u.User_Name LIKE ?)")
+            params.extend([pattern, pattern])
+        if campus_id is not None:
+            filters.append("u.CampusID = ?")
+            params.append(int(campus_id))
+        if verification_status:
+            filters.append("u.Verification_Status = ?")
+            params.append(str(verification_status))
+
+        query = f"""
+        WITH page AS (
+            SELECT TOP (?) u.UserID, u.User_Name, u.Email_ID, u.Phone_number,
+                   u.Verification_Status, u.Agg_Seller_Rating, c.Campus_Name
+            FROM [User] u
+            JOIN Campus c ON u.CampusID = c.CampusID
+            WHERE {' AND '.join(filters)}
+            ORDER BY u.UserID
+        )
+        SELECT page.*,
+               ISNULL(s.Total_Products_Listed, 0) AS Products_Listed,
+               ISNULL(s.Orders_As_Seller, 0) AS Orders_As_Seller,
+               ISNULL(s.Orders_As_Buyer, 0) AS Orders_As_Buyer,
+               ISNULL(s.Disputes_Filed, 0) AS Disputes_Filed
+        FROM page
+        LEFT JOIN User_Activity_Stats s ON s.UserID = page.UserID
+        ORDER BY page.UserID
+        """
+        return self.fetch_data(query, tuple([max(1, int(limit))] + params), replica_ok=True, timeout=5)
+
         # ==================== REGISTRATION (WITH USER_LOOKUP) ====================
 
         # ==================== REGISTRATION (WITH USER_LOOKUP) ====================
@@ -217,51 +1187,59 @@ class DatabaseManager:
           - Encrypted_Password: salted hash
         """
         try:
-            # 1) Check NEU eligibility from User_Lookup
-            lookup_query = "SELECT Expected_User_Name, Neu_Email FROM User_Lookup WHERE Neu_Email = ?"
-            lookup_df = self.fetch_data(lookup_query, (email,))
-            if lookup_df.empty:
-                return False, "Email not recognized as a Northeastern student. Please use your NEU email."
-
-            # 2) Check if already registered in [User]
-            existing_query = "SELECT UserID FROM [User] WHERE Email_ID = ?"
-            existing_df = self.fetch_data(existing_query, (email,))
-            if not existing_df.empty:
-                return False, "An account with this email already exists. Please log in instead."
-
-            # 3) Encrypt phone and hash password
+            # Hash/encrypt first so the checks and the insert are one round-trip
             encrypted_phone = self.encrypt_phone(phone)
             hashed_password = self.hash_password(password)
 
-            # 4) Insert into [User]
-            insert_query = """
-            INSERT INTO [User] (
-                CampusID,
-                User_Name,
-                Verification_Status,
-                Phone_number,
-                Agg_Seller_Rating,
-                Email_ID,
-                Encrypted_Password,
-                Encrypted_Phone
-            )
-            VALUES (?, ?, ?, ?, 0, ?, ?, ?)
+            # Eligibility check, duplicate check and insert in one batch.
+            # UPDLOCK/HOLDLOCK keeps two concurrent sign-ups for the same
+            # email from both passing the existence check.
+            query = """
+            SET NOCOUNT ON;
+            DECLARE @Email NVARCHAR(255) = ?;
+
+            IF NOT EXISTS (SELECT 1 FROM User_Lookup WHERE Neu_Email = @Email)
+                SELECT 'not_eligible';
+            ELSE
+            BEGIN
+                INSERT INTO [User] (
+                    CampusID,
+                    User_Name,
+                    Verification_Status,
+                    Phone_number,
+                    Agg_Seller_Rating,
+                    Email_ID,
+                    Encrypted_Password,
+                    Encrypted_Phone
+                )
+                SELECT ?, ?, ?, ?, 0, @Email, ?, ?
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM [User] WITH (UPDLOCK, HOLDLOCK) WHERE Email_ID = @Email
+                );
+                SELECT CASE WHEN @@ROWCOUNT = 1 THEN 'created' ELSE 'exists' END;
+            END
             """
-            ok = self.execute_query(
-                insert_query,
-                (
-                    int(campus_id),
-                    str(name),
-                    str(verification_status),
-                    str(phone),          # plain phone for UI
-                    str(email),
-                    hashed_password,
-                    encrypted_phone
+            with self.get_cursor() as (conn, cursor):
+                cursor.execute(
+                    query,
+                    (
+                        str(email),
+                        int(campus_id),
+                        str(name),
+                        str(verification_status),
+                        str(phone),          # plain phone for UI
+                        hashed_password.encode('ascii'),
+                        encrypted_phone.encode('utf-8')
+                    )
                 )
-            )
+                outcome = cursor.fetchone()[0]
+                conn.commit()
+                self._note_write()
 
-            if not ok:
-                return False, "Failed to register user due to a database error."
+            if outcome == 'not_eligible':
+                return False, "Email not recognized as a Northeastern student. Please use your NEU email."
+            if outcome == 'exists':
+                return False, "An account with this email already exists. Please log in instead."
 
             return True, "Account created successfully. You can now log in."
 
@@ -272,219 +1250,380 @@ class DatabaseManager:
     # ==================== PRODUCT OPERATIONS ====================
     
     def get_all_products(self) -> pd.DataFrame:
-        query = """
-        SELECT p.Product_ID, p.Product_Name, p.Description, p.Unit_price, 
-               p.Quantity, p.Product_Status, c.Category_Name, u.User_Name as Seller,
-               p.Standard_price, p.Created_date
+        query = f"""
+        SELECT {PRODUCT_LISTING_COLUMNS}
         FROM Product p
         JOIN Category c ON p.Category_ID = c.Category_ID
         JOIN [User] u ON p.Seller_ID = u.UserID
+        LEFT JOIN Product_Media pm ON pm.Media_ID = p.Primary_Media_ID
         ORDER BY p.Product_ID DESC
         """
-        return self.fetch_data(query)
+        return self.fetch_data(query, replica_ok=True, timeout=10)
+
+    def search_products_faceted(self, search: str = None, category: str = None,
+                                price_bucket: int = None, min_rating: float = None,
+                                sort: str = 'newest', page: int = 0,
+                                page_size: int = 60) -> Dict[str, Any]:
+        """
+        One page of active listings plus the facet counts for the filter bar,
+        in a single round-trip. The text search runs once into #Matches;
+        each facet then counts over the other filters only (so picking a
+        category still shows how many items every other category has):
+            products       page of PRODUCT_LISTING_COLUMNS
+            total          listings matching every filter
+            categories     {Category_Name: count}
+            price_buckets  [count per PRICE_BUCKETS entry]
+            ratings        [count per whole-star seller rating 0..5]
+        """
+        search_pattern = None
+        if search:
+            search_pattern = '%' + (str(search).strip()
+                                    .replace('[', '[[]').replace('%', '[%]').replace('_', '[_]')) + '%'
+        low = high = None
+        if price_bucket is not None:
+            _, low, high = PRICE_BUCKETS[int(price_bucket)]
+        order_by = FACET_SORTS.get(sort, FACET_SORTS['newest'])
+
+        query = f"""
+        SET NOCOUNT ON;
+        DECLARE @Search NVARCHAR(210) = ?, @Category NVARCHAR(100) = ?,
+                @MinPrice DECIMAL(10,2) = ?, @MaxPrice DECIMAL(10,2) = ?, @MinRating DECIMAL(3,2) = ?;
+
+        SELECT p.Product_ID, c.Category_Name, p.Unit_price, u.Agg_Seller_Rating AS Seller_Rating,
+               CASE WHEN @Category IS NULL OR c.Category_Name = @Category THEN 1 ELSE 0 END AS In_Category,
+               CASE WHEN (@MinPrice IS NULL OR p.Unit_price >= @MinPrice)
+                     AND (@MaxPrice IS NULL OR p.Unit_price < @MaxPrice) THEN 1 ELSE 0 END AS In_Price,
+               CASE WHEN @MinRating IS NULL OR u.Agg_Seller_Rating >= @MinRating THEN 1 ELSE 0 END AS In_Rating
+        INTO #Matches
+        FROM Product p
+        JOIN Category c ON p.Category_ID = c.Category_ID
+        JOIN [User] u ON p.Seller_ID = u.UserID
+        WHERE p.Product_Status = 'Active'
+          AND (@Search IS NULL OR p.Product_Name LIKE @Search OR p.Description LIKE @Search);
+
+        SELECT {PRODUCT_LISTING_COLUMNS}
+        FROM #Matches m
+        JOIN Product p ON p.Product_ID = m.Product_ID
+        JOIN Category c ON p.Category_ID = c.Category_ID
+        JOIN [User] u ON p.Seller_ID = u.UserID
+        LEFT JOIN Product_Media pm ON pm.Media_ID = p.Primary_Media_ID
+        WHERE m.In_Category = 1 AND m.In_Price = 1 AND m.In_Rating = 1
+        ORDER BY {order_by}
+        OFFSET ? ROWS FETCH NEXT ? ROWS ONLY;
+
+        SELECT COUNT(*) FROM #Matches WHERE In_Category = 1 AND In_Price = 1 AND In_Rating = 1;
+
+        SELECT Category_Name, COUNT(*) FROM #Matches
+        WHERE In_Price = 1 AND In_Rating = 1
+        GROUP BY Category_Name;
+
+        SELECT {price_bucket_sql('Unit_price')}, COUNT(*) FROM #Matches
+        WHERE In_Category = 1 AND In_Rating = 1
+        GROUP BY {price_bucket_sql('Unit_price')};
+
+        SELECT CAST(FLOOR(ISNULL(Seller_Rating, 0)) AS INT), COUNT(*) FROM #Matches
+        WHERE In_Category = 1 AND In_Price = 1
+        GROUP BY CAST(FLOOR(ISNULL(Seller_Rating, 0)) AS INT);
+
+        DROP TABLE #Matches;
+        """
+        params = (search_pattern, category or None, low, high,
+                  None if min_rating is None else float(min_rating),
+                  max(0, int(page)) * int(page_size), max(1, int(page_size)))
+        result = {
+            'products': pd.DataFrame(), 'total': 0, 'categories': {},
+            'price_buckets': [0] * len(PRICE_BUCKETS), 'ratings': [0] * 6,
+        }
+        try:
+            with self.get_cursor(read_only=True, timeout=10) as (conn, cursor):
+                cursor.execute(query, params)
+                result['products'] = self._frame(cursor)
+                cursor.nextset()
+                result['total'] = int(cursor.fetchone()[0])
+                cursor.nextset()
+                result['categories'] = {str(name): int(n) for name, n in cursor.fetchall()}
+                cursor.nextset()
+                for bucket, n in cursor.fetchall():
+                    result['price_buckets'][int(bucket)] = int(n)
+                cursor.nextset()
+                for stars, n in cursor.fetchall():
+                    result['ratings'][min(max(int(stars), 0), 5)] = int(n)
+            return result
+        except (QueryTimeoutError, QueryCancelledError):
+            raise
+        except Exception as e:
+            self._raise_if_interrupted(e)
+            print(f"Error in faceted search: {e}")
+            return result
+
+    def get_products_changed_since(self, token: Optional[bytes] = None) -> Tuple[pd.DataFrame, Optional[bytes]]:
+        """
+        Products whose row, or whose seller's [User] row, changed since
+        `token` (None = everything). Returns (rows, next_token); on error
+        returns (empty frame, token) so the caller simply retries later.
+
+        The upper bound is MIN_ACTIVE_ROWVERSION(), so a change that is
+        still uncommitted is picked up by a later call instead of being
+        skipped. Rowversions are local to a database, so this always
+        reads the primary.
+        """
+        query = f"""
+        SET NOCOUNT ON;
+        DECLARE @Since BINARY(8) = ?;
+        DECLARE @Upper BINARY(8) = MIN_ACTIVE_ROWVERSION();
+
+        SELECT @Upper;
+
+        WITH Changed AS (
+            SELECT Product_ID
+            FROM Product
+            WHERE Row_Version >= @Since AND Row_Version < @Upper
+            UNION
+            SELECT p.Product_ID
+            FROM [User] u
+            JOIN Product p ON p.Seller_ID = u.UserID
+            WHERE u.Row_Version >= @Since AND u.Row_Version < @Upper
+        )
+        SELECT {PRODUCT_LISTING_COLUMNS}
+        FROM Changed ch
+        JOIN Product p ON p.Product_ID = ch.Product_ID
+        JOIN Category c ON p.Category_ID = c.Category_ID
+        JOIN [User] u ON p.Seller_ID = u.UserID
+        LEFT JOIN Product_Media pm ON pm.Media_ID = p.Primary_Media_ID;
+        """
+        try:
+            conn = self.get_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(query, (token or bytes(8),))
+                next_token = bytes(cursor.fetchone()[0])
+                cursor.nextset()
+                return self._frame(cursor), next_token
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"Error fetching product changes: {e}")
+            return pd.DataFrame(), token
     
     def add_product(self, category_id: int, seller_id: int, name: str, 
                     description: str, standard_price: float, unit_price: float,
-                    quantity: int, status: str = 'Active') -> bool:
+                    quantity: int, status: str = 'Active', media=None) -> int:
+        """
+        Insert a listing (and its images) in one transaction.
+
+        media: optional list of (media_link, media_type); the first one
+               becomes the product's Primary_Media_ID.
+        Returns: new Product_ID, or 0 on failure
+        """
         query = """
         INSERT INTO Product (Category_ID, Seller_ID, Product_Name, Description, 
                            Standard_price, Unit_price, Quantity, Product_Status, Created_date)
+        OUTPUT inserted.Product_ID
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, GETDATE())
         """
-        return self.execute_query(query, (
-            int(category_id), int(seller_id), str(name), str(description),
-            float(standard_price), float(unit_price), int(quantity), str(status)
-        ))
-    
-    # ==================== ORDER OPERATIONS WITH DIRECT SQL ====================
-    
-    def create_order_with_collection(self, product_id: int, buyer_id: int, 
-                                    quantity: int, pickup_point_id: int,
-                                    scheduled_date=None, scheduled_time=None) -> Tuple[bool, int, str]:
+        try:
+            with self.get_cursor() as (conn, cursor):
+                cursor.execute(query, (
+                    int(category_id), int(seller_id), str(name), str(description),
+                    float(standard_price), float(unit_price), int(quantity), str(status)
+                ))
+                product_id = int(cursor.fetchone()[0])
+
+                primary_media_id = None
+                for media_link, media_type in (media or []):
+                    cursor.execute("""
+                        INSERT INTO Product_Media (Product_ID, Media_link, Media_Type)
+                        OUTPUT inserted.Media_ID
+                        VALUES (?, ?, ?)
+                    """, (product_id, str(media_link), str(media_type)))
+                    media_id = int(cursor.fetchone()[0])
+                    if primary_media_id is None:
+                        primary_media_id = media_id
+                if primary_media_id is not None:
+                    cursor.execute("UPDATE Product SET Primary_Media_ID = ? WHERE Product_ID = ?",
+                                   (primary_media_id, product_id))
+
+                self._bump_activity(
+                    cursor, seller_id, listed_today=True,
+                    Total_Products_Listed=1,
+                    Active_Listings=1 if status == 'Active' else 0,
+                    Products_Sold=1 if status == 'Sold' else 0
+                )
+                conn.commit()
+                self._note_write()
+        except Exception as e:
+            print(f"Error adding product: {e}")
+            return 0
+
+        if status == 'Active':
+            self.percolate_product(product_id, category_id, seller_id, name, description, unit_price)
+        return product_id
+
+    # ==================== SAVED SEARCHES ====================
+
+    def save_search(self, user_id: int, query: str, category_id: Optional[int] = None,
+                    max_price: Optional[float] = None) -> Tuple[bool, str]:
         """
-        Create order and collection using direct SQL queries (no stored procedure)
-        Returns: (success, order_id, message)
+        Store a saved search and index it in Saved_Search_Term: one row per
+        query word plus one for the category. A new listing matches when it
+        hits every one of those terms and is at or under max_price.
         """
-        conn = None
-        try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            print(f"🔍 Creating order with direct SQL:")
-            print(f"   ProductID: {product_id}, BuyerID: {buyer_id}, Quantity: {quantity}")
-            print(f"   PickupPointID: {pickup_point_id}")
-            
-            # Get seller from product
-            cursor.execute("SELECT Seller_ID, Quantity, Product_Status FROM Product WHERE Product_ID = ?", (product_id,))
-            product_result = cursor.fetchone()
-            
-            if not product_result:
-                return (False, 0, "Invalid Product_ID")
-            
-            seller_id = product_result[0]
-            available_qty = product_result[1]
-            product_status = product_result[2]
-            
-            # Validate
-            if product_status != 'Active':
-                return (False, 0, f"Product is {product_status}")
-            
-            if available_qty < quantity:
-                return (False, 0, f"Insufficient quantity. Only {available_qty} available")
-            
-            if buyer_id == seller_id:
-                return (False, 0, "Cannot buy your own product")
-            
-            # Insert Order
-            cursor.execute("""
-                INSERT INTO [Order] (Product_ID, Seller_ID, Buyer_ID, Order_Date, Quantity, Status)
-                VALUES (?, ?, ?, CAST(GETDATE() AS DATE), ?, N'Confirmed')
-            """, (product_id, seller_id, buyer_id, quantity))
-            
-            # Get the new order ID
-            cursor.execute("SELECT @@IDENTITY AS OrderID")
-            order_id = int(cursor.fetchone()[0])
-            
-            print(f"✅ Order created with ID: {order_id}")
-            
-            # Insert Order_Collection
-            cursor.execute("""
-                INSERT INTO Order_Collection (Order_ID, Pickup_Point_ID, Scheduled_Time, Scheduled_Date)
-                VALUES (?, ?, ?, ?)
-            """, (order_id, pickup_point_id, scheduled_time, scheduled_date))
-            
-            print(f"✅ Order_Collection created for Order #{order_id}")
-            
-            # Commit transaction
-            conn.commit()
-            cursor.close()
-            
-            return (True, order_id, "Order and collection created successfully")
-            
+        terms = search_terms(query, limit=10)
+        if category_id is not None:
+            terms.append(category_term(category_id))
+        if not terms:
+            return (False, "Enter a search term or pick a category")
+
+        sql = """
+        SET NOCOUNT ON;
+        DECLARE @UserID INT = ?;
+        IF (SELECT COUNT(*) FROM Saved_Search WITH (UPDLOCK, HOLDLOCK) WHERE UserID = @UserID) >= ?
+        BEGIN
+            SELECT CAST(NULL AS INT);
+            RETURN;
+        END;
+
+        DECLARE @Ids TABLE (Saved_Search_ID INT);
+        INSERT INTO Saved_Search (UserID, Query, Category_ID, Max_Price, Term_Count)
+        OUTPUT inserted.Saved_Search_ID INTO @Ids
+        VALUES (@UserID, ?, ?, ?, ?);
+
+        INSERT INTO Saved_Search_Term (Term, Saved_Search_ID)
+        SELECT j.[value], i.Saved_Search_ID
+        FROM OPENJSON(?) j CROSS JOIN @Ids i;
+
+        SELECT Saved_Search_ID FROM @Ids;
+        """
+        try:
+            with self.get_cursor() as (conn, cursor):
+                cursor.execute(sql, (
+                    int(user_id), MAX_SAVED_SEARCHES, (query or "").strip()[:200],
+                    None if category_id is None else int(category_id),
+                    None if max_price is None else float(max_price),
+                    len(terms), json.dumps(terms)
+                ))
+                row = cursor.fetchone()
+                if row is None or row[0] is None:
+                    conn.rollback()
+                    return (False, f"You can keep up to {MAX_SAVED_SEARCHES} saved searches")
+                conn.commit()
+                self._note_write()
+                return (True, "Search saved. New matching listings will show up in your sidebar")
         except Exception as e:
-            if conn:
-                conn.rollback()
-            print(f"❌ Error creating order: {e}")
-            import traceback
-            traceback.print_exc()
-            return (False, 0, f"Error: {str(e)}")
-        finally:
-            if conn:
-                conn.close()
-    
-    def initiate_escrow_verification(self, order_id: int) -> Tuple[bool, str, str]:
+            print(f"Error saving search: {e}")
+            return (False, f"Error: {str(e)}")
+
+    def get_saved_searches(self, user_id: int) -> pd.DataFrame:
+        query = """
+        SELECT s.Saved_Search_ID, s.Query, c.Category_Name, s.Max_Price, s.Created_At,
+               (SELECT COUNT(*) FROM Saved_Search_Match m WHERE m.Saved_Search_ID = s.Saved_Search_ID) AS Matches
+        FROM Saved_Search s
+        LEFT JOIN Category c ON c.Category_ID = s.Category_ID
+        WHERE s.UserID = ?
+        ORDER BY s.Saved_Search_ID DESC
+        """
+        return self.fetch_data(query, (int(user_id),))
+
+    def delete_saved_search(self, user_id: int, saved_search_id: int) -> bool:
+        """Terms and matches go with it (ON DELETE CASCADE)."""
+        try:
+            with self.get_cursor() as (conn, cursor):
+                cursor.execute("DELETE FROM Saved_Search WHERE Saved_Search_ID = ? AND UserID = ?",
+                               (int(saved_search_id), int(user_id)))
+                deleted = cursor.rowcount > 0
+                conn.commit()
+                self._note_write()
+                return deleted
+        except Exception as e:
+            print(f"Error deleting saved search: {e}")
+            return False
+
+    def percolate_product(self, product_id: int, category_id: int, seller_id: int,
+                          name: str, description: str, unit_price: float) -> int:
         """
-        Create escrow and generate verification code using direct SQL
-        Returns: (success, verification_code, message)
+        Match a new listing against every saved search at once. The
+        listing's words (and category pseudo-term) are looked up in
+        PK_Saved_Search_Term, so only searches sharing a term are touched,
+        however many are stored. Matches land in Saved_Search_Match, the
+        owners' inboxes. Best effort: the listing is already committed,
+        so failures are logged and return 0.
+        """
+        terms = search_terms(f"{name} {description}") + [category_term(category_id)]
+        query = """
+        SET NOCOUNT ON;
+        DECLARE @ProductID INT = ?, @SellerID INT = ?, @Price DECIMAL(10,2) = ?;
+
+        INSERT INTO Saved_Search_Match (Saved_Search_ID, UserID, Product_ID)
+        SELECT s.Saved_Search_ID, s.UserID, @ProductID
+        FROM (
+            SELECT t.Saved_Search_ID, COUNT(*) AS Hits
+            FROM Saved_Search_Term t
+            WHERE t.Term IN (SELECT [value] FROM OPENJSON(?))
+            GROUP BY t.Saved_Search_ID
+        ) h
+        JOIN Saved_Search s ON s.Saved_Search_ID = h.Saved_Search_ID
+        WHERE h.Hits = s.Term_Count
+          AND (s.Max_Price IS NULL OR @Price <= s.Max_Price)
+          AND s.UserID <> @SellerID;
+
+        SELECT @@ROWCOUNT;
         """
-        import random
-        
-        conn = None
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            print(f"🔍 Initiating escrow for Order #{order_id}")
-            
-            # Get buyer & seller info from order
-            cursor.execute("""
-                SELECT o.Buyer_ID, u.User_Name, o.Seller_ID
-                FROM [Order] o
-                JOIN [User] u ON o.Buyer_ID = u.UserID
-                WHERE o.OrderID = ?
-            """, (order_id,))
-            
-            order_result = cursor.fetchone()
-            if not order_result:
-                return (False, "", "Order not found")
-            
-            buyer_id = order_result[0]
-            buyer_name = order_result[1]
-            seller_id = order_result[2]
-            
-            # Check if escrow exists
-            cursor.execute("SELECT EscrowID FROM Escrow WHERE OrderID = ?", (order_id,))
-            escrow_result = cursor.fetchone()
-            
-            if not escrow_result:
-                return (False, "", "Escrow record not found for this order")
-            
-            # Update escrow status to 'Held'
-            cursor.execute("""
-                UPDATE Escrow
-                SET Status = N'Held',
-                    Created_Date = ISNULL(Created_Date, GETDATE())
-                WHERE OrderID = ?
-            """, (order_id,))
-            
-            print(f"✅ Escrow status set to 'Held' for Order #{order_id}")
-            
-            # Check if verification code already exists
-            cursor.execute("SELECT Verification_Code FROM Escrow_Verification WHERE OrderID = ?", (order_id,))
-            existing_code = cursor.fetchone()
-            
-            if existing_code:
-                verification_code = existing_code[0]
+            with self.get_cursor() as (conn, cursor):
+                cursor.execute(query, (int(product_id), int(seller_id), float(unit_price), json.dumps(terms)))
+                matched = int(cursor.fetchone()[0])
                 conn.commit()
-                cursor.close()
-                return (True, verification_code, "Escrow already initiated. Returning existing verification code")
-            
-            # Generate unique 6-digit verification code
-            max_attempts = 10
-            verification_code = None
-            
-            for attempt in range(max_attempts):
-                # Generate random 6-digit code
-                code = str(random.randint(0, 999999)).zfill(6)
-                
-                # Check if code is unique
-                cursor.execute("SELECT COUNT(*) FROM Escrow_Verification WHERE Verification_Code = ?", (code,))
-                count = cursor.fetchone()[0]
-                
-                if count == 0:
-                    verification_code = code
-                    break
-            
-            if not verification_code:
-                return (False, "", "Unable to generate unique verification code after multiple attempts")
-            
-            print(f"✅ Generated verification code: {verification_code}")
-            
-            # Insert verification record
-            cursor.execute("""
-                INSERT INTO Escrow_Verification (OrderID, Buyer_UserID, Seller_UserID, Buyer_Name, Verification_Code)
-                VALUES (?, ?, ?, ?, ?)
-            """, (order_id, buyer_id, seller_id, buyer_name, verification_code))
-            
-            print(f"✅ Verification record created for Order #{order_id}")
-            
-            # Commit transaction
-            conn.commit()
-            cursor.close()
-            
-            return (True, verification_code, "Escrow initiated and verification code generated")
-            
+                self._note_write()
+                self._count("saved_search_matches", matched)
+                return matched
         except Exception as e:
-            if conn:
-                conn.rollback()
-            print(f"❌ Error initiating escrow: {e}")
-            import traceback
-            traceback.print_exc()
-            return (False, "", f"Error: {str(e)}")
-        finally:
-            if conn:
-                conn.close()
+            print(f"Error matching saved searches: {e}")
+            return 0
+
+    def get_search_inbox(self, user_id: int, unseen_only: bool = True, limit: int = 5) -> pd.DataFrame:
+        """Newest saved-search matches for a user that are still Active (IX_Saved_Search_Match_Inbox)."""
+        seen_filter = "AND m.Is_Seen = 0" if unseen_only else ""
+        query = f"""
+        SELECT TOP (?) m.Saved_Search_ID, m.Matched_At, m.Is_Seen, s.Query AS Saved_Query,
+               {PRODUCT_LISTING_COLUMNS}
+        FROM Saved_Search_Match m
+        JOIN Saved_Search s ON s.Saved_Search_ID = m.Saved_Search_ID
+        JOIN Product p ON p.Product_ID = m.Product_ID
+        JOIN Category c ON p.Category_ID = c.Category_ID
+        JOIN [User] u ON p.Seller_ID = u.UserID
+        LEFT JOIN Product_Media pm ON pm.Media_ID = p.Primary_Media_ID
+        WHERE m.UserID = ? {seen_filter}
+          AND p.Product_Status = 'Active'
+        ORDER BY m.Matched_At DESC
+        """
+        return self.fetch_data(query, (int(limit), int(user_id)), timeout=5)
+
+    def mark_search_matches_seen(self, user_id: int, product_id: Optional[int] = None) -> int:
+        """Mark one product's matches (or all, when product_id is None) as seen."""
+        query = "UPDATE Saved_Search_Match SET Is_Seen = 1 WHERE UserID = ? AND Is_Seen = 0"
+        params = [int(user_id)]
+        if product_id is not None:
+            query += " AND Product_ID = ?"
+            params.append(int(product_id))
+        try:
+            with self.get_cursor() as (conn, cursor):
+                cursor.execute(query, params)
+                updated = cursor.rowcount
+                conn.commit()
+                self._note_write()
+                return updated
+        except Exception as e:
+            print(f"Error updating saved search inbox: {e}")
+            return 0
+
+    # ==================== ORDER OPERATIONS WITH DIRECT SQL ====================
     
     def verify_escrow_code(self, order_id: int, seller_id: int, entered_code: str) -> Tuple[bool, str]:
         """
         Verify code and complete payment using direct SQL
         Returns: (success, message)
         """
-        conn = None
-        try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
+        def body(cursor):
             print(f"🔍 Verifying code for Order #{order_id}")
             
             # Load verification data
@@ -497,7 +1636,7 @@ class DatabaseManager:
             verification_result = cursor.fetchone()
             
             if not verification_result:
-                return (False, "No verification code found for this order")
+                raise TransactionAborted((False, "No verification code found for this order"))
             
             stored_code = verification_result[0]
             is_used = verification_result[1]
@@ -505,15 +1644,15 @@ class DatabaseManager:
             
             # Validate seller
             if stored_seller_id != seller_id:
-                return (False, "Seller mismatch. You are not authorized for this order")
+                raise TransactionAborted((False, "Seller mismatch. You are not authorized for this order"))
             
             # Check if already used
             if is_used:
-                return (False, "Code already used")
+                raise TransactionAborted((False, "Code already used"))
             
             # Check code accuracy
             if stored_code != entered_code:
-                return (False, "Invalid verification code")
+                raise TransactionAborted((False, "Invalid verification code"))
             
             print(f"✅ Verification code matched!")
             
@@ -539,22 +1678,17 @@ class DatabaseManager:
                 WHERE OrderID = ?
             """, (order_id,))
             
-            # Commit transaction
-            conn.commit()
-            cursor.close()
-            
             return (True, "Code verified and payment completed")
-            
+        
+        try:
+            return self.run_transaction(body, 'verify_escrow')
+        except (QueryTimeoutError, QueryCancelledError):
+            raise
         except Exception as e:
-            if conn:
-                conn.rollback()
             print(f"❌ Error verifying code: {e}")
             import traceback
             traceback.print_exc()
             return (False, f"Error: {str(e)}")
-        finally:
-            if conn:
-                conn.close()
     
     def get_verification_code(self, order_id: int) -> Optional[str]:
         """Retrieve verification code for an order"""
@@ -568,23 +1702,500 @@ class DatabaseManager:
             print(f"Error getting verification code: {e}")
             return None
     
-    def get_all_orders(self) -> pd.DataFrame:
-        query = """
+    def get_all_orders(self, include_archived: bool = False) -> pd.DataFrame:
+        query = history_sql("""
         SELECT o.OrderID, p.Product_Name, 
                seller.User_Name as Seller, buyer.User_Name as Buyer,
-               o.Quantity, o.Status, o.Order_Date, o.Product_ID, o.Seller_ID, o.Buyer_ID
-        FROM [Order] o
+               o.Quantity, o.Status, o.Order_Date, o.Product_ID, o.Seller_ID, o.Buyer_ID,
+               {Archived} AS Is_Archived
+        FROM {Order} o
         JOIN Product p ON o.Product_ID = p.Product_ID
         JOIN [User] seller ON o.Seller_ID = seller.UserID
         JOIN [User] buyer ON o.Buyer_ID = buyer.UserID
-        ORDER BY o.OrderID DESC
-        """
-        return self.fetch_data(query)
+        """, include_archived) + "\nORDER BY OrderID DESC"
+        return self.fetch_data(query, replica_ok=True, timeout=15)
+
+    def get_buyer_orders(self, buyer_id: int, include_archived: bool = False) -> pd.DataFrame:
+        """A buyer's orders, newest first; archived ones only on request."""
+        query = history_sql("""
+        SELECT o.OrderID, o.Product_ID, o.Seller_ID, p.Product_Name, seller.User_Name as Seller,
+               o.Quantity, o.Status, o.Order_Date,
+               e.EscrowID, e.Amount, e.Status as Escrow_Status,
+               oc.Scheduled_Date, pp.Location_Name as Pickup_Location,
+               {Archived} AS Is_Archived
+        FROM {Order} o
+        JOIN Product p ON o.Product_ID = p.Product_ID
+        JOIN [User] seller ON o.Seller_ID = seller.UserID
+        LEFT JOIN {Escrow} e ON o.OrderID = e.OrderID
+        LEFT JOIN {Order_Collection} oc ON o.OrderID = oc.Order_ID
+        LEFT JOIN Pickup_Point pp ON oc.Pickup_Point_ID = pp.PickupPointID
+        WHERE o.Buyer_ID = ?
+        """, include_archived) + "\nORDER BY OrderID DESC"
+        params = (int(buyer_id),) * (2 if include_archived else 1)
+        return self.fetch_data(query, params, replica_ok=True, timeout=15)
+
+    def get_seller_orders(self, seller_id: int, include_archived: bool = False) -> pd.DataFrame:
+        """A seller's orders, newest first; archived ones only on request."""
+        query = history_sql("""
+        SELECT o.OrderID, p.Product_Name, buyer.User_Name as Buyer,
+               o.Quantity, o.Status, o.Order_Date,
+               e.EscrowID, e.Amount, e.Status as Escrow_Status,
+               oc.Scheduled_Date, pp.Location_Name as Pickup_Location,
+               {Archived} AS Is_Archived
+        FROM {Order} o
+        JOIN Product p ON o.Product_ID = p.Product_ID
+        JOIN [User] buyer ON o.Buyer_ID = buyer.UserID
+        LEFT JOIN {Escrow} e ON o.OrderID = e.OrderID
+        LEFT JOIN {Order_Collection} oc ON o.OrderID = oc.Order_ID
+        LEFT JOIN Pickup_Point pp ON oc.Pickup_Point_ID = pp.PickupPointID
+        WHERE o.Seller_ID = ?
+        """, include_archived) + "\nORDER BY OrderID DESC"
+        params = (int(seller_id),) * (2 if include_archived else 1)
+        return self.fetch_data(query, params, replica_ok=True, timeout=15)
     
     def update_order_status(self, order_id: int, status: str) -> bool:
         query = "UPDATE [Order] SET Status = ? WHERE OrderID = ?"
         return self.execute_query(query, (str(status), int(order_id)))
     
+    # ==================== CART CHECKOUT ====================
+
+    def checkout_cart(self, buyer_id: int, lines: List[Dict[str, Any]], pickup_point_id: int,
+                      scheduled_date=None, scheduled_time=None) -> Tuple[bool, List[Dict[str, Any]], str]:
+        """
+        Buy every line of a cart in one transaction and one round-trip.
+        lines: dicts with product_id, quantity and optionally unit_price
+               (the price the buyer saw; a different current price rejects
+               the line). Repeated products are merged.
+
+        The listings are locked (UPDLOCK) one at a time in Product_ID order,
+        so two carts sharing listings queue instead of deadlocking. Then
+        every line is checked against stock minus other buyers' active
+        holds, and the orders, collections, escrows,
+        verification codes, quantity updates and activity counters are
+        each written by one set-based statement; the buyer's own holds on
+        those listings are deleted. Any bad line aborts the whole cart.
+        Returns (success, [{product_id, order_id, verification_code,
+        quantity, amount}, ...], message).
+        """
+        merged: Dict[int, Dict[str, Any]] = {}
+        for line in lines:
+            product_id = int(line['product_id'])
+            entry = merged.setdefault(product_id, {'product_id': product_id, 'quantity': 0, 'unit_price': None})
+            entry['quantity'] += int(line['quantity'])
+            if line.get('unit_price') is not None:
+                entry['unit_price'] = float(line['unit_price'])
+        if not merged:
+            return (False, [], "Your cart is empty")
+
+        query = """
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+        DECLARE @Buyer INT = ?, @Point INT = ?, @Date DATE = ?, @Time TIME(0) = ?;
+
+        DECLARE @Lines TABLE (
+            Product_ID      INT PRIMARY KEY,
+            Quantity        INT NOT NULL,
+            Expected_Price  DECIMAL(10,2) NULL,
+            Seller_ID       INT NULL,
+            Unit_price      DECIMAL(10,2) NULL,
+            Available       INT NULL,
+            Product_Status  NVARCHAR(20) NULL,
+            OrderID         INT NULL,
+            Code            CHAR(6) NULL
+        );
+        INSERT INTO @Lines (Product_ID, Quantity, Expected_Price)
+        SELECT product_id, quantity, unit_price
+        FROM OPENJSON(?) WITH (product_id INT, quantity INT, unit_price DECIMAL(10,2));
+
+        -- Lock listings in Product_ID order (a consistent order for every cart)
+        DECLARE @Pid INT = (SELECT MIN(Product_ID) FROM @Lines);
+        WHILE @Pid IS NOT NULL
+        BEGIN
+            UPDATE l
+            SET Seller_ID = p.Seller_ID, Unit_price = p.Unit_price,
+                Available = p.Quantity - ISNULL((
+                    SELECT SUM(h.Quantity) FROM Product_Hold h
+                    WHERE h.Product_ID = p.Product_ID AND h.UserID <> @Buyer
+                      AND h.Expires_At > SYSUTCDATETIME()
+                ), 0),
+                Product_Status = p.Product_Status
+            FROM @Lines l
+            JOIN Product p WITH (UPDLOCK, ROWLOCK) ON p.Product_ID = l.Product_ID
+            WHERE l.Product_ID = @Pid;
+            SET @Pid = (SELECT MIN(Product_ID) FROM @Lines WHERE Product_ID > @Pid);
+        END;
+
+        SELECT Product_ID, Problem
+        FROM (
+            SELECT Product_ID,
+                   CASE WHEN Product_Status IS NULL THEN N'Listing not found'
+                        WHEN Seller_ID = @Buyer THEN N'Cannot buy your own product'
+                        WHEN Product_Status <> N'Active' THEN N'Listing is ' + Product_Status
+                        WHEN Quantity < 1 THEN N'Invalid quantity'
+                        WHEN Available < Quantity
+                            THEN N'Only ' + CAST(CASE WHEN Available > 0 THEN Available ELSE 0 END AS NVARCHAR(10))
+                                 + N' available'
+                        WHEN Expected_Price IS NOT NULL AND Expected_Price <> Unit_price
+                            THEN N'Price changed to $' + CAST(Unit_price AS NVARCHAR(20))
+                   END AS Problem
+            FROM @Lines
+        ) x
+        WHERE Problem IS NOT NULL;
+        IF @@ROWCOUNT > 0 RETURN;
+
+        DECLARE @Orders TABLE (OrderID INT, Product_ID INT);
+        INSERT INTO [Order] (Product_ID, Seller_ID, Buyer_ID, Order_Date, Quantity, Status)
+        OUTPUT inserted.OrderID, inserted.Product_ID INTO @Orders
+        SELECT Product_ID, Seller_ID, @Buyer, CAST(GETDATE() AS DATE), Quantity, N'Confirmed'
+        FROM @Lines;
+
+        UPDATE l SET OrderID = o.OrderID
+        FROM @Lines l JOIN @Orders o ON o.Product_ID = l.Product_ID;
+
+        INSERT INTO Order_Collection (Order_ID, Pickup_Point_ID, Scheduled_Time, Scheduled_Date)
+        SELECT OrderID, @Point, @Time, @Date FROM @Lines;
+
+        INSERT INTO Escrow (OrderID, Amount, Status, Created_Date)
+        SELECT OrderID, Quantity * Unit_price, N'Held', GETDATE() FROM @Lines;
+
+        -- Random 6-digit codes, redrawn until unique (UQ_EscrowVer_Code)
+        UPDATE @Lines SET Code = RIGHT('00000' + CAST(ABS(CHECKSUM(NEWID())) % 1000000 AS VARCHAR(6)), 6);
+        WHILE EXISTS (
+            SELECT 1 FROM @Lines l
+            WHERE EXISTS (SELECT 1 FROM Escrow_Verification v WHERE v.Verification_Code = l.Code)
+               OR (SELECT COUNT(*) FROM @Lines d WHERE d.Code = l.Code) > 1
+        )
+            UPDATE l
+            SET Code = RIGHT('00000' + CAST(ABS(CHECKSUM(NEWID())) % 1000000 AS VARCHAR(6)), 6)
+            FROM @Lines l
+            WHERE EXISTS (SELECT 1 FROM Escrow_Verification v WHERE v.Verification_Code = l.Code)
+               OR (SELECT COUNT(*) FROM @Lines d WHERE d.Code = l.Code) > 1;
+
+        INSERT INTO Escrow_Verification (OrderID, Buyer_UserID, Seller_UserID, Buyer_Name, Verification_Code)
+        SELECT l.OrderID, @Buyer, l.Seller_ID, u.User_Name, l.Code
+        FROM @Lines l
+        CROSS JOIN [User] u
+        WHERE u.UserID = @Buyer;
+
+        DECLARE @StatusChanges TABLE (Seller_ID INT, Old_Status NVARCHAR(20), New_Status NVARCHAR(20), Quantity INT);
+        UPDATE p
+        SET Quantity = p.Quantity - l.Quantity,
+            Product_Status = CASE WHEN p.Quantity - l.Quantity = 0 THEN N'Sold' ELSE p.Product_Status END
+        OUTPUT inserted.Seller_ID, deleted.Product_Status, inserted.Product_Status, inserted.Quantity
+            INTO @StatusChanges
+        FROM Product p
+        JOIN @Lines l ON l.Product_ID = p.Product_ID;
+
+        -- The buyer's holds on these listings become the orders
+        DELETE h
+        FROM Product_Hold h
+        JOIN @Lines l ON l.Product_ID = h.Product_ID
+        WHERE h.UserID = @Buyer;
+        """ + PRODUCT_STATUS_ACTIVITY_SQL + CART_ACTIVITY_SQL + """
+        SELECT Product_ID, OrderID, Code, Quantity, Quantity * Unit_price AS Amount
+        FROM @Lines
+        ORDER BY Product_ID;
+        """
+
+        def body(cursor):
+            # Slot first, so a full slot aborts before any insert: one place per order
+            if scheduled_date is not None and scheduled_time is not None:
+                slot_error = self._book_pickup_slot(cursor, pickup_point_id, scheduled_date,
+                                                    scheduled_time, count=len(merged))
+                if slot_error:
+                    raise TransactionAborted((False, [], slot_error))
+
+            cursor.execute(query, (
+                int(buyer_id), int(pickup_point_id), scheduled_date, scheduled_time,
+                json.dumps(list(merged.values()))
+            ))
+            problems = cursor.fetchall()
+            if problems:
+                details = "; ".join(f"#{int(pid)}: {problem}" for pid, problem in problems)
+                raise TransactionAborted((False, [], f"Some items can't be bought: {details}"))
+            cursor.nextset()
+            placed = [
+                {'product_id': int(pid), 'order_id': int(order_id), 'verification_code': code,
+                 'quantity': int(quantity), 'amount': float(amount)}
+                for pid, order_id, code, quantity, amount in cursor.fetchall()
+            ]
+            return (True, placed, f"{len(placed)} order(s) placed")
+
+        try:
+            success, placed, message = self.run_transaction(body, 'checkout_cart')
+            if success:
+                self._count("cart_checkouts")
+                self._count("cart_lines", len(placed))
+            return (success, placed, message)
+        except (QueryTimeoutError, QueryCancelledError):
+            raise
+        except Exception as e:
+            print(f"❌ Error checking out cart: {e}")
+            return (False, [], f"Error: {str(e)}")
+
+    # ==================== RESERVATIONS ====================
+
+    def hold_product(self, user_id: int, product_id: int, quantity: int,
+                     ttl_minutes: int = HOLD_MINUTES) -> Tuple[bool, int, Optional[Any], str]:
+        """
+        Reserve `quantity` units of a listing for a buyer for `ttl_minutes`
+        (creating or resizing their hold and restarting its clock). The
+        listing row is locked, so holds and checkouts on it queue; it
+        succeeds only if stock minus other buyers' active holds covers it.
+        Returns (success, available_to_this_buyer, expires_at_utc, message).
+        """
+        query = """
+        SET NOCOUNT ON;
+        DECLARE @Product INT = ?, @User INT = ?, @Qty INT = ?, @Minutes INT = ?;
+        DECLARE @Stock INT, @Status NVARCHAR(20), @Seller INT, @Held INT;
+
+        SELECT @Stock = Quantity, @Status = Product_Status, @Seller = Seller_ID
+        FROM Product WITH (UPDLOCK, ROWLOCK)
+        WHERE Product_ID = @Product;
+
+        SELECT @Held = ISNULL(SUM(Quantity), 0)
+        FROM Product_Hold
+        WHERE Product_ID = @Product AND UserID <> @User AND Expires_At > SYSUTCDATETIME();
+
+        IF @Status IS NULL OR @Status <> N'Active' OR @Seller = @User OR @Qty < 1 OR @Stock - @Held < @Qty
+        BEGIN
+            SELECT CAST(0 AS BIT), ISNULL(@Stock - @Held, 0), @Status, @Seller, CAST(NULL AS DATETIME2);
+            RETURN;
+        END;
+
+        MERGE Product_Hold WITH (HOLDLOCK) AS t
+        USING (SELECT @Product AS Product_ID, @User AS UserID) AS s
+        ON t.Product_ID = s.Product_ID AND t.UserID = s.UserID
+        WHEN MATCHED THEN
+            UPDATE SET Quantity = @Qty, Expires_At = DATEADD(MINUTE, @Minutes, SYSUTCDATETIME())
+        WHEN NOT MATCHED THEN
+            INSERT (Product_ID, UserID, Quantity, Expires_At)
+            VALUES (@Product, @User, @Qty, DATEADD(MINUTE, @Minutes, SYSUTCDATETIME()));
+
+        SELECT CAST(1 AS BIT), @Stock - @Held, @Status, @Seller, Expires_At
+        FROM Product_Hold
+        WHERE Product_ID = @Product AND UserID = @User;
+        """
+        try:
+            with self.get_cursor() as (conn, cursor):
+                cursor.execute(query, (int(product_id), int(user_id), int(quantity), int(ttl_minutes)))
+                held, available, status, seller_id, expires_at = cursor.fetchone()
+                conn.commit()
+                self._note_write()
+        except Exception as e:
+            print(f"Error reserving product: {e}")
+            return (False, 0, None, f"Error: {str(e)}")
+
+        available = max(int(available), 0)
+        if held:
+            self._count("holds_placed")
+            return (True, available, expires_at, f"Reserved for {int(ttl_minutes)} minutes")
+        if status is None:
+            return (False, 0, None, "Product not found")
+        if seller_id == user_id:
+            return (False, available, None, "Cannot buy your own product")
+        if status != 'Active':
+            return (False, available, None, f"Product is {status}")
+        self._count("holds_rejected")
+        return (False, available, None, f"Only {available} available right now (others are checking out)")
+
+    def release_holds(self, user_id: int, product_id: Optional[int] = None) -> int:
+        """Drop a buyer's hold on one listing, or all of them when product_id is None."""
+        query = "DELETE FROM Product_Hold WHERE UserID = ?"
+        params = [int(user_id)]
+        if product_id is not None:
+            query += " AND Product_ID = ?"
+            params.append(int(product_id))
+        try:
+            with self.get_cursor() as (conn, cursor):
+                cursor.execute(query, params)
+                released = cursor.rowcount
+                conn.commit()
+                self._note_write()
+                return released
+        except Exception as e:
+            print(f"Error releasing holds: {e}")
+            return 0
+
+    def get_held_quantity(self, product_id: int) -> int:
+        """Units of a listing under active holds (one seek on PK_Product_Hold)."""
+        result = self.fetch_data("""
+            SELECT ISNULL(SUM(Quantity), 0) AS Held
+            FROM Product_Hold
+            WHERE Product_ID = ? AND Expires_At > SYSUTCDATETIME()
+        """, (int(product_id),), timeout=5)
+        return 0 if result.empty else int(result.iloc[0]['Held'])
+
+    def release_expired_holds(self, batch_size: int = 500) -> Tuple[bool, int, str]:
+        """
+        Delete up to `batch_size` expired holds. Expired holds already stop
+        counting against stock, so this only keeps the table small; rows a
+        live transaction holds are skipped (READPAST) until the next sweep.
+        """
+        query = """
+        SET NOCOUNT ON;
+        DELETE TOP (?) FROM Product_Hold WITH (ROWLOCK, READPAST)
+        WHERE Expires_At <= SYSUTCDATETIME();
+        SELECT @@ROWCOUNT;
+        """
+        try:
+            with self.get_cursor() as (conn, cursor):
+                cursor.execute(query, (int(batch_size),))
+                released = int(cursor.fetchone()[0])
+                conn.commit()
+                self._note_write()
+                self._count("sweep_holds_released", released)
+                return (True, released, f"{released} expired hold(s) released")
+        except Exception as e:
+            print(f"Error releasing expired holds: {e}")
+            return (False, 0, f"Error: {str(e)}")
+
+    # ==================== PICKUP SLOTS ====================
+
+    def _book_pickup_slot(self, cursor, pickup_point_id: int, slot_date, start_time,
+                          count: int = 1) -> Optional[str]:
+        """
+        Take `count` places in a pickup slot inside the caller's transaction.
+        The day's Pickup_Slot_Booking row is created from the Pickup_Slot
+        template on first use; the increment is conditional on capacity, so
+        two checkouts can't both take the last place. Points without any
+        slots defined accept any time, as before.
+        Returns None when booked (or unslotted), otherwise the reason.
+        """
+        if slot_date < date.today():
+            return "Pickup date is in the past"
+        cursor.execute("""
+        SET NOCOUNT ON;
+        DECLARE @Point INT = ?, @Date DATE = ?, @Start TIME(0) = ?, @Weekday TINYINT = ?, @Count INT = ?;
+
+        INSERT INTO Pickup_Slot_Booking (Pickup_Point_ID, Slot_Date, Start_Time, Capacity)
+        SELECT s.Pickup_Point_ID, @Date, s.Start_Time, s.Capacity
+        FROM Pickup_Slot s
+        WHERE s.Pickup_Point_ID = @Point AND s.Weekday = @Weekday AND s.Start_Time = @Start
+          AND NOT EXISTS (
+              SELECT 1 FROM Pickup_Slot_Booking b WITH (UPDLOCK, HOLDLOCK)
+              WHERE b.Pickup_Point_ID = @Point AND b.Slot_Date = @Date AND b.Start_Time = @Start
+          );
+
+        UPDATE Pickup_Slot_Booking
+        SET Booked = Booked + @Count
+        WHERE Pickup_Point_ID = @Point AND Slot_Date = @Date AND Start_Time = @Start
+          AND Booked + @Count <= Capacity;
+        DECLARE @Booked INT = @@ROWCOUNT;
+
+        SELECT @Booked,
+               CASE WHEN EXISTS (SELECT 1 FROM Pickup_Slot WHERE Pickup_Point_ID = @Point) THEN 1 ELSE 0 END,
+               CASE WHEN EXISTS (SELECT 1 FROM Pickup_Slot
+                                 WHERE Pickup_Point_ID = @Point AND Weekday = @Weekday AND Start_Time = @Start)
+                    THEN 1 ELSE 0 END;
+        """, (int(pickup_point_id), slot_date, start_time, slot_date.weekday(), int(count)))
+        booked, slotted, offered = cursor.fetchone()
+        if booked or not slotted:
+            return None
+        if not offered:
+            return "That pickup time isn't one of this location's slots"
+        self._count("pickup_slot_full")
+        return "That pickup slot is full. Please pick another time"
+
+    def get_pickup_slots(self, pickup_point_id: int, slot_date) -> pd.DataFrame:
+        """
+        The slots a pickup point offers on `slot_date` with places left:
+        Start_Time, Slot_Minutes, Capacity, Booked, Remaining. Two primary
+        key seeks (template + that day's counters), however many orders
+        the point has collected.
+        """
+        query = """
+        SELECT s.Start_Time, s.Slot_Minutes,
+               ISNULL(b.Capacity, s.Capacity) AS Capacity,
+               ISNULL(b.Booked, 0) AS Booked,
+               ISNULL(b.Capacity, s.Capacity) - ISNULL(b.Booked, 0) AS Remaining
+        FROM Pickup_Slot s
+        LEFT JOIN Pickup_Slot_Booking b
+            ON b.Pickup_Point_ID = s.Pickup_Point_ID AND b.Slot_Date = ? AND b.Start_Time = s.Start_Time
+        WHERE s.Pickup_Point_ID = ? AND s.Weekday = ?
+        ORDER BY s.Start_Time
+        """
+        return self.fetch_data(query, (slot_date, int(pickup_point_id), slot_date.weekday()), timeout=5)
+
+    def get_pickup_slot_templates(self, pickup_point_id: int) -> pd.DataFrame:
+        query = """
+        SELECT Weekday, Start_Time, Slot_Minutes, Capacity
+        FROM Pickup_Slot
+        WHERE Pickup_Point_ID = ?
+        ORDER BY Weekday, Start_Time
+        """
+        return self.fetch_data(query, (int(pickup_point_id),), replica_ok=True, timeout=5)
+
+    def set_pickup_slots(self, pickup_point_id: int, weekdays: List[int], first_start, last_start,
+                         slot_minutes: int, capacity: int) -> Tuple[bool, str]:
+        """
+        Replace the point's slots on `weekdays` (0 = Monday) with one every
+        `slot_minutes` from `first_start` to `last_start`, each taking
+        `capacity` pickups. Days already booked keep their counters, and
+        their capacity moves to the new one (never below what is booked).
+        Passing capacity 0 removes the slots on those days.
+        """
+        starts = []
+        minute = first_start.hour * 60 + first_start.minute
+        last = last_start.hour * 60 + last_start.minute
+        while minute <= last and minute < 24 * 60:
+            starts.append(f"{minute // 60:02d}:{minute % 60:02d}:00")
+            minute += int(slot_minutes)
+        rows = [{'weekday': int(d), 'start': t} for d in weekdays for t in starts] if capacity > 0 else []
+
+        query = """
+        SET NOCOUNT ON;
+        DECLARE @Point INT = ?, @Minutes SMALLINT = ?, @Capacity SMALLINT = ?;
+
+        DELETE FROM Pickup_Slot
+        WHERE Pickup_Point_ID = @Point AND Weekday IN (SELECT CAST([value] AS TINYINT) FROM OPENJSON(?));
+
+        INSERT INTO Pickup_Slot (Pickup_Point_ID, Weekday, Start_Time, Slot_Minutes, Capacity)
+        SELECT @Point, j.weekday, j.start, @Minutes, @Capacity
+        FROM OPENJSON(?) WITH (weekday TINYINT, start TIME(0)) j;
+        DECLARE @Defined INT = @@ROWCOUNT;
+
+        UPDATE b
+        SET Capacity = CASE WHEN b.Booked > s.Capacity THEN b.Booked ELSE s.Capacity END
+        FROM Pickup_Slot_Booking b
+        JOIN Pickup_Slot s
+            ON s.Pickup_Point_ID = b.Pickup_Point_ID AND s.Start_Time = b.Start_Time
+        WHERE b.Pickup_Point_ID = @Point AND b.Slot_Date >= CAST(GETDATE() AS DATE)
+          AND s.Weekday = (DATEDIFF(DAY, '19000101', b.Slot_Date) % 7);  -- 1900-01-01 was a Monday
+
+        SELECT @Defined;
+        """
+        try:
+            with self.get_cursor() as (conn, cursor):
+                cursor.execute(query, (
+                    int(pickup_point_id), int(slot_minutes), int(capacity),
+                    json.dumps([int(d) for d in weekdays]), json.dumps(rows)
+                ))
+                defined = int(cursor.fetchone()[0])
+                conn.commit()
+                self._note_write()
+                return (True, f"{defined} slot(s) defined")
+        except Exception as e:
+            print(f"Error defining pickup slots: {e}")
+            return (False, f"Error: {str(e)}")
+
+    def get_seller_pickup_calendar(self, seller_id: int, start_date, days: int = 7) -> pd.DataFrame:
+        """A seller's scheduled, still-open pickups from `start_date` for `days` days, in time order."""
+        query = """
+        SELECT oc.Scheduled_Date, oc.Scheduled_Time, pp.Location_Name,
+               o.OrderID, p.Product_Name, o.Quantity, b.User_Name AS Buyer
+        FROM [Order] o
+        JOIN Order_Collection oc ON oc.Order_ID = o.OrderID
+        JOIN Pickup_Point pp ON pp.PickupPointID = oc.Pickup_Point_ID
+        JOIN Product p ON p.Product_ID = o.Product_ID
+        JOIN [User] b ON b.UserID = o.Buyer_ID
+        WHERE o.Seller_ID = ?
+          AND o.Status = N'Confirmed'
+          AND oc.Scheduled_Date >= ? AND oc.Scheduled_Date < DATEADD(DAY, ?, ?)
+        ORDER BY oc.Scheduled_Date, oc.Scheduled_Time
+        """
+        return self.fetch_data(query, (int(seller_id), start_date, int(days), start_date), timeout=5)
+
     # ==================== ESCROW OPERATIONS ====================
     
     def add_escrow(self, order_id: int, amount: float, status: str = 'Held') -> bool:
@@ -593,7 +2204,15 @@ class DatabaseManager:
         VALUES (?, ?, ?, GETDATE())
         """
         try:
-            return self.execute_query(query, (int(order_id), float(amount), str(status)))
+            with self.get_cursor() as (conn, cursor):
+                cursor.execute(query, (int(order_id), float(amount), str(status)))
+                cursor.execute("SELECT Seller_ID, Buyer_ID FROM [Order] WHERE OrderID = ?", (int(order_id),))
+                seller_id, buyer_id = cursor.fetchone()
+                self._bump_activity(cursor, seller_id, Total_Revenue_As_Seller=float(amount))
+                self._bump_activity(cursor, buyer_id, Total_Spent_As_Buyer=float(amount))
+                conn.commit()
+                self._note_write()
+                return True
         except Exception as e:
             print(f"Error adding escrow: {e}")
             import traceback
@@ -613,18 +2232,30 @@ class DatabaseManager:
     
     # ==================== DISPUTE OPERATIONS ====================
     
-    def get_all_disputes(self) -> pd.DataFrame:
-        query = """
+    def get_all_disputes(self, include_archived: bool = False) -> pd.DataFrame:
+        query = history_sql("""
         SELECT d.Dispute_ID, d.EscrowID, u.User_Name as Filed_By, d.FiledByUserID,
                d.Description, d.Status, d.Open_Date, d.Resolved_Date, d.Resolution_Details,
-               o.OrderID, e.Amount
-        FROM Dispute d
+               o.OrderID, e.Amount, {Archived} AS Is_Archived
+        FROM {Dispute} d
         JOIN [User] u ON d.FiledByUserID = u.UserID
-        JOIN Escrow e ON d.EscrowID = e.EscrowID
-        JOIN [Order] o ON e.OrderID = o.OrderID
-        ORDER BY d.Dispute_ID DESC
-        """
-        return self.fetch_data(query)
+        JOIN {Escrow} e ON d.EscrowID = e.EscrowID
+        JOIN {Order} o ON e.OrderID = o.OrderID
+        """, include_archived) + "\nORDER BY Dispute_ID DESC"
+        return self.fetch_data(query, replica_ok=True, timeout=15)
+
+    def get_user_disputes(self, user_id: int, include_archived: bool = False) -> pd.DataFrame:
+        """Disputes a user filed, newest first; archived ones only on request."""
+        query = history_sql("""
+        SELECT d.Dispute_ID, d.EscrowID, d.Description, d.Status, 
+               d.Open_Date, d.Resolved_Date, d.Resolution_Details,
+               e.OrderID, e.Amount, {Archived} AS Is_Archived
+        FROM {Dispute} d
+        JOIN {Escrow} e ON d.EscrowID = e.EscrowID
+        WHERE d.FiledByUserID = ?
+        """, include_archived) + "\nORDER BY Dispute_ID DESC"
+        params = (int(user_id),) * (2 if include_archived else 1)
+        return self.fetch_data(query, params, replica_ok=True, timeout=15)
     
     def add_dispute(self, escrow_id: int, filed_by: int, description: str,
                     status: str = 'Open') -> bool:
@@ -633,9 +2264,18 @@ class DatabaseManager:
                             Open_Date, Status)
         VALUES (?, ?, ?, GETDATE(), ?)
         """
-        return self.execute_query(query, (
-            int(escrow_id), int(filed_by), str(description), str(status)
-        ))
+        try:
+            with self.get_cursor() as (conn, cursor):
+                cursor.execute(query, (
+                    int(escrow_id), int(filed_by), str(description), str(status)
+                ))
+                self._bump_activity(cursor, filed_by, Disputes_Filed=1)
+                conn.commit()
+                self._note_write()
+                return True
+        except Exception as e:
+            print(f"Error adding dispute: {e}")
+            return False
     
     def update_dispute(self, dispute_id: int, status: str, 
                       resolution_details: str = None) -> bool:
@@ -651,7 +2291,54 @@ class DatabaseManager:
         else:
             query = "UPDATE Dispute SET Status = ? WHERE Dispute_ID = ?"
             return self.execute_query(query, (str(status), int(dispute_id)))
-    
+
+    def resolve_disputes_bulk(self, decisions) -> Tuple[bool, int, str]:
+        """
+        Apply refund / release / close decisions for many disputes at once.
+
+        decisions: iterable of dicts with keys
+            dispute_id, action ('refund' | 'release' | 'close'),
+            status (optional, defaults to 'Resolved' / 'Closed'),
+            resolution (optional text)
+
+        All decisions are shipped as one table-valued parameter to
+        dbo.usp_ResolveDisputesBulk, so the escrow and dispute updates
+        happen in a single round-trip and a single transaction.
+        Returns: (success, disputes_updated, message)
+        """
+        rows = []
+        seen = set()
+        for decision in decisions:
+            dispute_id = int(decision['dispute_id'])
+            action = str(decision['action']).lower()
+            if action not in ('refund', 'release', 'close'):
+                return (False, 0, f"Unknown action '{action}' for dispute #{dispute_id}")
+            if dispute_id in seen:
+                continue
+            seen.add(dispute_id)
+            status = decision.get('status') or ('Closed' if action == 'close' else 'Resolved')
+            resolution = decision.get('resolution') or None
+            rows.append((dispute_id, action, str(status), resolution))
+
+        if not rows:
+            return (True, 0, "No disputes selected")
+
+        try:
+            with self.get_cursor() as (conn, cursor):
+                cursor.execute("""
+                    SET NOCOUNT ON;
+                    DECLARE @Updated INT;
+                    EXEC dbo.usp_ResolveDisputesBulk @Decisions = ?, @Updated = @Updated OUTPUT;
+                    SELECT @Updated;
+                """, (['DisputeDecisionList', 'dbo'] + rows,))
+                updated = int(cursor.fetchone()[0] or 0)
+                conn.commit()
+                self._note_write()
+            return (True, updated, f"{updated} dispute(s) updated")
+        except Exception as e:
+            print(f"Error resolving disputes in bulk: {e}")
+            return (False, 0, f"Error: {str(e)}")
+
     # ==================== RATING OPERATIONS ====================
     
     def add_rating(self, order_id: int, rater_id: int, rated_id: int,
@@ -661,14 +2348,764 @@ class DatabaseManager:
                            Rating_Value, Rating_Date)
         VALUES (?, ?, ?, ?, GETDATE())
         """
-        return self.execute_query(query, (
-            int(order_id), int(rater_id), int(rated_id), float(rating_value)
-        ))
+        try:
+            with self.get_cursor() as (conn, cursor):
+                cursor.execute(query, (
+                    int(order_id), int(rater_id), int(rated_id), float(rating_value)
+                ))
+                self._bump_activity(cursor, rated_id,
+                                    Ratings_Received_Count=1,
+                                    Ratings_Received_Sum=float(rating_value))
+                self._bump_activity(cursor, rater_id, Ratings_Given_Count=1)
+                conn.commit()
+                self._note_write()
+                return True
+        except Exception as e:
+            print(f"Error adding rating: {e}")
+            return False
+
+    def _apply_ratings(self, cursor, payloads: List[Dict[str, Any]]):
+        """Set-based add_rating for a write-behind batch; already-rated orders are skipped."""
+        # One rating per order (UNIQUE); keep the first queued
+        payloads = list({int(p['Order_ID']): p for p in reversed(payloads)}.values())
+        cursor.execute(f"""
+        SET NOCOUNT ON;
+        DECLARE @Ratings TABLE (Rater_UserID INT, Rated_UserID INT, Rating_Value DECIMAL(3,2));
+
+        INSERT INTO Rating (Order_ID, Rater_UserID, Rated_UserID, Rating_Value, Rating_Date)
+        OUTPUT inserted.Rater_UserID, inserted.Rated_UserID, inserted.Rating_Value INTO @Ratings
+        SELECT j.Order_ID, j.Rater_UserID, j.Rated_UserID, j.Rating_Value, CAST(j.Rated_At AS DATE)
+        FROM OPENJSON(?) WITH (
+            Order_ID      INT,
+            Rater_UserID  INT,
+            Rated_UserID  INT,
+            Rating_Value  DECIMAL(3,2),
+            Rated_At      DATETIME2
+        ) j
+        WHERE NOT EXISTS (SELECT 1 FROM Rating r WHERE r.Order_ID = j.Order_ID);
+
+        {RATING_ACTIVITY_SQL}
+        """, (json.dumps(payloads),))
+
+    # ==================== WRITE-BEHIND ====================
+
+    def apply_write_behind(self, entries: List[Tuple[str, str, Dict[str, Any]]]) -> Tuple[bool, int, str]:
+        """
+        Apply queued (idempotency_key, kind, payload) entries in one
+        transaction. Keys are recorded in dbo.Write_Behind_Applied in the
+        same transaction, so an entry replayed after a crash is skipped.
+        Returns (success, entries applied now, message).
+        """
+        try:
+            with self.get_cursor() as (conn, cursor):
+                cursor.execute("""
+                SET NOCOUNT ON;
+                INSERT INTO dbo.Write_Behind_Applied (Idempotency_Key)
+                OUTPUT inserted.Idempotency_Key
+                SELECT DISTINCT j.[value]
+                FROM OPENJSON(?) j
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM dbo.Write_Behind_Applied a WITH (UPDLOCK, HOLDLOCK)
+                    WHERE a.Idempotency_Key = j.[value]
+                );
+                """, (json.dumps([key for key, _, _ in entries]),))
+                fresh = {row[0] for row in cursor.fetchall()}
+
+                by_kind: Dict[str, List[Dict[str, Any]]] = {}
+                for key, kind, payload in entries:
+                    if key in fresh:
+                        by_kind.setdefault(kind, []).append(payload)
+                        fresh.discard(key)
+                for kind, payloads in by_kind.items():
+                    if kind not in WRITE_BEHIND_HANDLERS:
+                        raise ValueError(f"Unknown write-behind kind: {kind}")
+                    getattr(self, WRITE_BEHIND_HANDLERS[kind])(cursor, payloads)
+
+                # Keys only need to outlive the local journal's replay window
+                cursor.execute("""
+                DELETE TOP (500) FROM dbo.Write_Behind_Applied
+                WHERE Applied_At < DATEADD(DAY, -7, SYSUTCDATETIME())
+                """)
+                conn.commit()
+                self._note_write()
+
+                applied = sum(len(p) for p in by_kind.values())
+                return (True, applied, f"Applied {applied} of {len(entries)} queued writes")
+        except Exception as e:
+            print(f"Error applying write-behind batch: {e}")
+            return (False, 0, str(e))
+
+    # ==================== USER ACTIVITY STATS ====================
+
+    def _bump_activity(self, cursor, user_id: int, listed_today: bool = False, **deltas):
+        """
+        Add deltas to one user's User_Activity_Stats row, inside the caller's
+        transaction so the counters commit (or roll back) with the write.
+        """
+        unknown = set(deltas) - set(ACTIVITY_COUNTERS)
+        if unknown:
+            raise ValueError(f"Unknown activity counters: {sorted(unknown)}")
+        columns = ", ".join(f"? AS {c}" for c in ACTIVITY_COUNTERS)
+        source = (f"SELECT ? AS UserID, {columns}, "
+                  f"CASE WHEN ? = 1 THEN CAST(GETDATE() AS DATE) END AS First_Listing_Date")
+        params = ([int(user_id)]
+                  + [deltas.get(c, 0) for c in ACTIVITY_COUNTERS]
+                  + [1 if listed_today else 0])
+        cursor.execute(activity_merge_sql(source), params)
+
+    def get_user_activity(self, user_id: int) -> Dict[str, Any]:
+        """Single-row read of a user's precomputed activity stats (zeros if none yet)."""
+        query = f"""
+        SELECT {', '.join(ACTIVITY_COUNTERS)}, First_Listing_Date
+        FROM User_Activity_Stats
+        WHERE UserID = ?
+        """
+        result = self.fetch_data(query, (int(user_id),), replica_ok=True, timeout=5)
+        if result.empty:
+            stats = {c: 0 for c in ACTIVITY_COUNTERS}
+            stats['First_Listing_Date'] = None
+        else:
+            stats = result.iloc[0].to_dict()
+
+        received = int(stats['Ratings_Received_Count'])
+        stats['Avg_Rating_Received'] = (
+            float(stats['Ratings_Received_Sum']) / received if received else None
+        )
+        first = stats['First_Listing_Date']
+        stats['Days_Since_First_Listing'] = (
+            (pd.Timestamp.today().normalize() - pd.Timestamp(first)).days
+            if first is not None and pd.notna(first) else None
+        )
+        return stats
+
+    def rebuild_user_activity_stats(self) -> Tuple[bool, int, str]:
+        """
+        Recompute User_Activity_Stats from the base tables.
+
+        Each source table is aggregated on its own before joining to [User],
+        so there is no cross-product between a user's products, orders,
+        ratings and disputes. Use after bulk loads or to repair drift.
+        Returns: (success, users_written, message)
+        """
+        # Archived orders, ratings and disputes still count
+        orders = history_sql(
+            "SELECT o.Seller_ID, o.Buyer_ID, e.Amount FROM {Order} o LEFT JOIN {Escrow} e ON e.OrderID = o.OrderID",
+            include_archived=True
+        )
+        ratings = history_sql("SELECT Rater_UserID, Rated_UserID, Rating_Value FROM {Rating}", include_archived=True)
+        disputes = history_sql("SELECT FiledByUserID FROM {Dispute}", include_archived=True)
+
+        query = f"""
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+        BEGIN TRAN;
+
+        DELETE FROM User_Activity_Stats WITH (TABLOCKX);
+
+        WITH AllOrders AS ({orders}),
+             AllRatings AS ({ratings}),
+             AllDisputes AS ({disputes})
+        INSERT INTO User_Activity_Stats (UserID, {', '.join(ACTIVITY_COUNTERS)}, First_Listing_Date, Last_Updated)
+        SELECT u.UserID,
+               ISNULL(p.Listed, 0), ISNULL(p.Active, 0), ISNULL(p.Sold, 0),
+               ISNULL(so.Orders, 0), ISNULL(so.Amount, 0),
+               ISNULL(bo.Orders, 0), ISNULL(bo.Amount, 0),
+               ISNULL(rr.Ratings, 0), ISNULL(rr.Rating_Sum, 0), ISNULL(rg.Ratings, 0),
+               ISNULL(d.Disputes, 0),
+               p.First_Listing_Date,
+               GETDATE()
+        FROM [User] u
+        LEFT JOIN (
+            SELECT Seller_ID,
+                   COUNT(*) AS Listed,
+                   SUM(CASE WHEN Product_Status = 'Active' THEN 1 ELSE 0 END) AS Active,
+                   SUM(CASE WHEN Product_Status = 'Sold' THEN 1 ELSE 0 END) AS Sold,
+                   MIN(Created_date) AS First_Listing_Date
+            FROM Product GROUP BY Seller_ID
+        ) p ON p.Seller_ID = u.UserID
+        LEFT JOIN (
+            SELECT Seller_ID, COUNT(*) AS Orders, SUM(Amount) AS Amount
+            FROM AllOrders GROUP BY Seller_ID
+        ) so ON so.Seller_ID = u.UserID
+        LEFT JOIN (
+            SELECT Buyer_ID, COUNT(*) AS Orders, SUM(Amount) AS Amount
+            FROM AllOrders GROUP BY Buyer_ID
+        ) bo ON bo.Buyer_ID = u.UserID
+        LEFT JOIN (
+            SELECT Rated_UserID, COUNT(*) AS Ratings, SUM(Rating_Value) AS Rating_Sum
+            FROM AllRatings GROUP BY Rated_UserID
+        ) rr ON rr.Rated_UserID = u.UserID
+        LEFT JOIN (
+            SELECT Rater_UserID, COUNT(*) AS Ratings
+            FROM AllRatings GROUP BY Rater_UserID
+        ) rg ON rg.Rater_UserID = u.UserID
+        LEFT JOIN (
+            SELECT FiledByUserID, COUNT(*) AS Disputes
+            FROM AllDisputes GROUP BY FiledByUserID
+        ) d ON d.FiledByUserID = u.UserID;
+
+        DECLARE @Written INT = @@ROWCOUNT;
+        COMMIT TRAN;
+        SELECT @Written;
+        """
+        try:
+            with self.get_cursor(timeout=0) as (conn, cursor):
+                cursor.execute(query)
+                written = int(cursor.fetchone()[0])
+                conn.commit()
+                self._note_write()
+            return (True, written, f"Rebuilt activity stats for {written} users")
+        except Exception as e:
+            print(f"Error rebuilding activity stats: {e}")
+            return (False, 0, f"Error: {str(e)}")
     
+    # ==================== ARCHIVAL ====================
+
+    def archive_orders_batch(self, cutoff_date, batch_size: int = 1000) -> Tuple[bool, int, str]:
+        """
+        Move one batch of finished orders dated before `cutoff_date` (with
+        their escrow, collection, rating, disputes and escrow audit rows)
+        into the archive tables via dbo.usp_ArchiveOrders. Each call is one
+        short transaction; loop until it returns 0.
+        Returns: (success, orders_archived, message)
+        """
+        try:
+            with self.get_cursor() as (conn, cursor):
+                cursor.execute("""
+                    SET NOCOUNT ON;
+                    DECLARE @Archived INT;
+                    EXEC dbo.usp_ArchiveOrders @CutoffDate = ?, @BatchSize = ?, @Archived = @Archived OUTPUT;
+                    SELECT @Archived;
+                """, (cutoff_date, int(batch_size)))
+                archived = int(cursor.fetchone()[0] or 0)
+                conn.commit()
+                self._note_write()
+            return (True, archived, f"{archived} order(s) archived")
+        except Exception as e:
+            print(f"Error archiving orders: {e}")
+            return (False, 0, f"Error: {str(e)}")
+
+    # ==================== RANKING ====================
+
+    def get_rank_inputs(self, velocity_days: int = 14) -> pd.DataFrame:
+        """
+        One row per active product with what ranking.compute_rank_scores
+        needs: prices, Created_date, seller rating and rating count, units
+        ordered in the last `velocity_days`, and the current Rank_Score.
+        """
+        query = """
+        SELECT p.Product_ID, p.Unit_price, p.Standard_price, p.Created_date, p.Rank_Score,
+               u.Agg_Seller_Rating AS Seller_Rating,
+               ISNULL(s.Ratings_Received_Count, 0) AS Seller_Rating_Count,
+               ISNULL(v.Units, 0) AS Recent_Units
+        FROM Product p
+        JOIN [User] u ON u.UserID = p.Seller_ID
+        LEFT JOIN User_Activity_Stats s ON s.UserID = p.Seller_ID
+        LEFT JOIN (
+            SELECT Product_ID, SUM(Quantity) AS Units
+            FROM [Order]
+            WHERE Status IN (N'Confirmed', N'Delivered')
+              AND Order_Date >= DATEADD(DAY, -?, CAST(GETDATE() AS DATE))
+            GROUP BY Product_ID
+        ) v ON v.Product_ID = p.Product_ID
+        WHERE p.Product_Status = 'Active'
+        """
+        return self.fetch_data(query, (int(velocity_days),), replica_ok=True, timeout=0)
+
+    def update_rank_scores(self, rows: List[Tuple[int, float]]) -> Tuple[bool, int, str]:
+        """
+        Write (Product_ID, Rank_Score) pairs in one statement. Callers pass
+        only scores that moved, since every write bumps Row_Version and
+        sends the row through the catalog delta feed. Keep chunks under
+        ~5000 rows. Returns (success, rows updated, message).
+        """
+        if not rows:
+            return (True, 0, "Nothing to update")
+        try:
+            with self.get_cursor() as (conn, cursor):
+                cursor.execute("CREATE TABLE #Scores (Product_ID INT PRIMARY KEY, Rank_Score FLOAT NOT NULL);")
+                cursor.fast_executemany = True
+                cursor.setinputsizes([(pyodbc.SQL_INTEGER, 0, 0), (pyodbc.SQL_DOUBLE, 0, 0)])
+                cursor.executemany("INSERT INTO #Scores (Product_ID, Rank_Score) VALUES (?, ?)",
+                                   [(int(pid), float(score)) for pid, score in rows])
+                cursor.execute("""
+                SET NOCOUNT ON;
+                UPDATE p
+                SET Rank_Score = s.Rank_Score
+                FROM Product p
+                JOIN #Scores s ON s.Product_ID = p.Product_ID
+                WHERE p.Rank_Score <> s.Rank_Score;
+                DECLARE @Updated INT = @@ROWCOUNT;
+                DROP TABLE #Scores;
+                SELECT @Updated;
+                """)
+                updated = int(cursor.fetchone()[0])
+                conn.commit()
+                self._note_write()
+                return (True, updated, f"{updated} rank score(s) updated")
+        except Exception as e:
+            print(f"Error updating rank scores: {e}")
+            return (False, 0, f"Error: {str(e)}")
+
+    # ==================== TRENDING ====================
+
+    def record_product_stats(self, rows: List[Tuple[int, datetime, int, int]]) -> Tuple[bool, int, str]:
+        """
+        Add coalesced counters ((Product_ID, Bucket_Start, views, clicks),
+        one row per product and hour) to Product_Stats in one MERGE. Called
+        by view_counters.ViewCounters every flush interval. Returns
+        (success, rows upserted, message).
+        """
+        if not rows:
+            return (True, 0, "Nothing to record")
+        payload = json.dumps([
+            {'product_id': int(pid), 'bucket': bucket.strftime("%Y-%m-%dT%H:%M:%S"),
+             'views': int(views), 'clicks': int(clicks)}
+            for pid, bucket, views, clicks in rows
+        ])
+        query = """
+        SET NOCOUNT ON;
+        MERGE Product_Stats WITH (HOLDLOCK) AS t
+        USING (
+            SELECT product_id, bucket, SUM(views) AS views, SUM(clicks) AS clicks
+            FROM OPENJSON(?) WITH (product_id INT, bucket DATETIME2(0), views INT, clicks INT)
+            GROUP BY product_id, bucket
+        ) AS s
+        ON t.Bucket_Start = s.bucket AND t.Product_ID = s.product_id
+        WHEN MATCHED THEN
+            UPDATE SET Views = t.Views + s.views, Clicks = t.Clicks + s.clicks
+        WHEN NOT MATCHED THEN
+            INSERT (Bucket_Start, Product_ID, Views, Clicks)
+            VALUES (s.bucket, s.product_id, s.views, s.clicks);
+        SELECT @@ROWCOUNT;
+        """
+        try:
+            with self.get_cursor() as (conn, cursor):
+                cursor.execute(query, (payload,))
+                written = int(cursor.fetchone()[0])
+                conn.commit()
+                self._note_write()
+                self._count("product_stats_rows", written)
+                return (True, written, f"{written} counter row(s) recorded")
+        except Exception as e:
+            print(f"Error recording product stats: {e}")
+            return (False, 0, f"Error: {str(e)}")
+
+    def refresh_trending_products(self, window_hours: int = 48, half_life_hours: float = 12.0,
+                                  top_n: int = 20, click_weight: float = 3.0) -> Tuple[bool, int, str]:
+        """
+        Recompute Trending_Product from the last `window_hours` of
+        Product_Stats: each hour's views + click_weight * clicks, halved
+        every `half_life_hours`, summed per listing. The top_n active,
+        in-stock listings are kept per seller campus, plus an all-campus
+        list under Campus_ID 0. Returns (success, rows written, message).
+        """
+        query = """
+        SET NOCOUNT ON;
+        DECLARE @Window INT = ?, @HalfLife FLOAT = ?, @TopN INT = ?, @ClickWeight FLOAT = ?;
+        DECLARE @Now DATETIME2(0) = SYSUTCDATETIME();
+
+        SELECT u.CampusID AS Campus_ID, r.Product_ID, r.Score
+        INTO #Scored
+        FROM (
+            SELECT s.Product_ID,
+                   SUM((s.Views + @ClickWeight * s.Clicks)
+                       * POWER(CAST(0.5 AS FLOAT), DATEDIFF(MINUTE, s.Bucket_Start, @Now) / (60.0 * @HalfLife))) AS Score
+            FROM Product_Stats s
+            WHERE s.Bucket_Start >= DATEADD(HOUR, -@Window, @Now)
+            GROUP BY s.Product_ID
+        ) r
+        JOIN Product p ON p.Product_ID = r.Product_ID
+        JOIN [User] u ON u.UserID = p.Seller_ID
+        WHERE p.Product_Status = 'Active' AND p.Quantity > 0;
+
+        SELECT Campus_ID, Rank, Product_ID, Score
+        INTO #Trending
+        FROM (
+            SELECT Campus_ID, Product_ID, Score,
+                   ROW_NUMBER() OVER (PARTITION BY Campus_ID ORDER BY Score DESC, Product_ID DESC) AS Rank
+            FROM #Scored
+            UNION ALL
+            SELECT 0, Product_ID, Score,
+                   ROW_NUMBER() OVER (ORDER BY Score DESC, Product_ID DESC)
+            FROM #Scored
+        ) ranked
+        WHERE Rank <= @TopN;
+
+        DELETE FROM Trending_Product;
+        INSERT INTO Trending_Product (Campus_ID, Rank, Product_ID, Score)
+        SELECT Campus_ID, Rank, Product_ID, Score FROM #Trending;
+        DECLARE @Written INT = @@ROWCOUNT;
+
+        DROP TABLE #Trending;
+        DROP TABLE #Scored;
+        SELECT @Written;
+        """
+        try:
+            with self.get_cursor() as (conn, cursor):
+                cursor.execute(query, (int(window_hours), float(half_life_hours), int(top_n), float(click_weight)))
+                written = int(cursor.fetchone()[0])
+                conn.commit()
+                self._note_write()
+                return (True, written, f"{written} trending row(s) written")
+        except Exception as e:
+            print(f"Error refreshing trending products: {e}")
+            return (False, 0, f"Error: {str(e)}")
+
+    def prune_product_stats(self, retain_days: int = 14, batch_size: int = 5000) -> Tuple[bool, int, str]:
+        """Delete up to `batch_size` Product_Stats buckets older than `retain_days`."""
+        query = """
+        SET NOCOUNT ON;
+        DELETE TOP (?) FROM Product_Stats
+        WHERE Bucket_Start < DATEADD(DAY, -?, SYSUTCDATETIME());
+        SELECT @@ROWCOUNT;
+        """
+        try:
+            with self.get_cursor() as (conn, cursor):
+                cursor.execute(query, (int(batch_size), int(retain_days)))
+                deleted = int(cursor.fetchone()[0])
+                conn.commit()
+                self._note_write()
+                return (True, deleted, f"{deleted} old counter row(s) deleted")
+        except Exception as e:
+            print(f"Error pruning product stats: {e}")
+            return (False, 0, f"Error: {str(e)}")
+
+    def get_trending_products(self, campus_id: int, limit: int = 6) -> pd.DataFrame:
+        """
+        Precomputed trending listings for a campus (0 = all campuses), best
+        first: a seek on PK_Trending_Product joined to the listing columns.
+        Listings that sold out since the last refresh are skipped.
+        """
+        query = f"""
+        SELECT TOP (?) {PRODUCT_LISTING_COLUMNS}, t.Score AS Trending_Score
+        FROM Trending_Product t
+        JOIN Product p ON p.Product_ID = t.Product_ID
+        JOIN Category c ON p.Category_ID = c.Category_ID
+        JOIN [User] u ON p.Seller_ID = u.UserID
+        LEFT JOIN Product_Media pm ON pm.Media_ID = p.Primary_Media_ID
+        WHERE t.Campus_ID = ?
+          AND p.Product_Status = 'Active'
+          AND p.Quantity > 0
+        ORDER BY t.Rank
+        """
+        return self.fetch_data(query, (int(limit), int(campus_id)), replica_ok=True, timeout=5)
+
+    # ==================== SALES ROLLUPS ====================
+
+    def get_rollup_watermark(self, name: str = SALES_ROLLUP) -> Optional[date]:
+        """Last day `name` was rolled up through, or None before the first run."""
+        df = self.fetch_data(
+            "SELECT Rolled_Up_Through FROM Rollup_Watermark WHERE Rollup_Name = ?", (name,)
+        )
+        if df.empty:
+            return None
+        return pd.Timestamp(df.iloc[0]['Rolled_Up_Through']).date()
+
+    def get_first_sales_date(self) -> Optional[date]:
+        """Earliest Order_Date across [Order] and Order_Archive, for the first rollup."""
+        df = self.fetch_data("""
+        SELECT MIN(d) AS First_Date FROM (
+            SELECT MIN(Order_Date) AS d FROM [Order]
+            UNION ALL
+            SELECT MIN(Order_Date) FROM Order_Archive
+        ) x
+        """, replica_ok=True)
+        if df.empty or pd.isna(df.iloc[0]['First_Date']):
+            return None
+        return pd.Timestamp(df.iloc[0]['First_Date']).date()
+
+    def rollup_sales_daily(self, from_date: date, to_date: date) -> Tuple[bool, int, str]:
+        """
+        Recompute Sales_Daily for from_date..to_date (inclusive) from the
+        hot and archive tables, and move the watermark to to_date, in one
+        transaction. Every measure is dated by its own event (order placed,
+        escrow refunded, dispute opened), so a day's rows only change while
+        that day is recent. Returns (success, rows written, message).
+        """
+        query = """
+        SET NOCOUNT ON;
+        DECLARE @From DATE = ?, @To DATE = ?, @Name VARCHAR(50) = ?;
+        DECLARE @FromTs DATETIME = @From, @ToTs DATETIME = DATEADD(DAY, 1, CAST(@To AS DATETIME));
+
+        WITH AllOrders AS (
+            SELECT OrderID, Product_ID, Seller_ID FROM [Order]
+            UNION ALL
+            SELECT OrderID, Product_ID, Seller_ID FROM Order_Archive
+        ),
+        AllEscrows AS (
+            SELECT EscrowID, OrderID, Amount FROM Escrow
+            UNION ALL
+            SELECT EscrowID, OrderID, Amount FROM Escrow_Archive
+        ),
+        Facts AS (
+            -- Orders placed (all statuses; cancellations show up as refunds)
+            SELECT o.Order_Date AS Sales_Date, o.Product_ID, o.Seller_ID,
+                   1 AS Orders, o.Quantity AS Units, ISNULL(e.Amount, ea.Amount) AS GMV,
+                   0 AS Refunds, CAST(NULL AS DECIMAL(10,2)) AS Refund_Amount, 0 AS Disputes
+            FROM (
+                -- Status IN (...) lets IX_Order_Status seek on Order_Date
+                SELECT OrderID, Product_ID, Seller_ID, Order_Date, Quantity FROM [Order]
+                WHERE Status IN (N'Confirmed', N'Delivered', N'Cancelled')
+                  AND Order_Date BETWEEN @From AND @To
+                UNION ALL
+                SELECT OrderID, Product_ID, Seller_ID, Order_Date, Quantity FROM Order_Archive
+                WHERE Order_Date BETWEEN @From AND @To
+            ) o
+            LEFT JOIN Escrow e ON e.OrderID = o.OrderID
+            LEFT JOIN Escrow_Archive ea ON ea.OrderID = o.OrderID
+
+            UNION ALL
+            -- Refunds, on the day the escrow moved to Refunded
+            SELECT CAST(a.[Timestamp] AS DATE), o.Product_ID, o.Seller_ID,
+                   0, 0, NULL, 1, es.Amount, 0
+            FROM (
+                SELECT Escrow_ID, [Timestamp] FROM Escrow_Audit_Logs
+                WHERE [Timestamp] >= @FromTs AND [Timestamp] < @ToTs AND New_status = 'Refunded'
+                UNION ALL
+                SELECT Escrow_ID, [Timestamp] FROM Escrow_Audit_Logs_Archive
+                WHERE [Timestamp] >= @FromTs AND [Timestamp] < @ToTs AND New_status = 'Refunded'
+            ) a
+            JOIN AllEscrows es ON es.EscrowID = a.Escrow_ID
+            JOIN AllOrders o ON o.OrderID = es.OrderID
+
+            UNION ALL
+            -- Disputes, on the day they were opened
+            SELECT d.Open_Date, o.Product_ID, o.Seller_ID,
+                   0, 0, NULL, 0, NULL, 1
+            FROM (
+                SELECT EscrowID, Open_Date FROM Dispute WHERE Open_Date BETWEEN @From AND @To
+                UNION ALL
+                SELECT EscrowID, Open_Date FROM Dispute_Archive WHERE Open_Date BETWEEN @From AND @To
+            ) d
+            JOIN AllEscrows es ON es.EscrowID = d.EscrowID
+            JOIN AllOrders o ON o.OrderID = es.OrderID
+        )
+        SELECT f.Sales_Date, p.Category_ID, u.CampusID,
+               SUM(f.Orders) AS Orders, SUM(f.Units) AS Units, ISNULL(SUM(f.GMV), 0) AS GMV,
+               SUM(f.Refunds) AS Refunds, ISNULL(SUM(f.Refund_Amount), 0) AS Refund_Amount,
+               SUM(f.Disputes) AS Disputes
+        INTO #Rollup
+        FROM Facts f
+        JOIN Product p ON p.Product_ID = f.Product_ID
+        JOIN [User] u ON u.UserID = f.Seller_ID
+        GROUP BY f.Sales_Date, p.Category_ID, u.CampusID;
+
+        DELETE FROM Sales_Daily WHERE Sales_Date BETWEEN @From AND @To;
+        INSERT INTO Sales_Daily (Sales_Date, Category_ID, CampusID, Orders, Units, GMV,
+                                 Refunds, Refund_Amount, Disputes)
+        SELECT Sales_Date, Category_ID, CampusID, Orders, Units, GMV, Refunds, Refund_Amount, Disputes
+        FROM #Rollup;
+        DECLARE @Written INT = @@ROWCOUNT;
+
+        UPDATE Rollup_Watermark
+        SET Rolled_Up_Through = @To, Updated_At = SYSUTCDATETIME()
+        WHERE Rollup_Name = @Name;
+        IF @@ROWCOUNT = 0
+            INSERT INTO Rollup_Watermark (Rollup_Name, Rolled_Up_Through) VALUES (@Name, @To);
+
+        DROP TABLE #Rollup;
+        SELECT @Written;
+        """
+        try:
+            with self.get_cursor() as (conn, cursor):
+                cursor.execute(query, (from_date, to_date, SALES_ROLLUP))
+                written = int(cursor.fetchone()[0])
+                conn.commit()
+                self._note_write()
+                self._count("sales_rollup_rows", written)
+                return (True, written, f"{from_date}..{to_date}: {written} rollup row(s)")
+        except Exception as e:
+            print(f"Error rolling up sales: {e}")
+            return (False, 0, f"Error: {str(e)}")
+
+    def get_sales_rollup(self, start_date: date, end_date: date) -> pd.DataFrame:
+        """
+        Sales_Daily rows for start_date..end_date with category and campus
+        names: one clustered-key range, at most days x categories x
+        campuses rows however many orders they summarize.
+        """
+        query = """
+        SELECT s.Sales_Date, c.Category_Name, cp.Campus_Name,
+               s.Orders, s.Units, s.GMV, s.Refunds, s.Refund_Amount, s.Disputes
+        FROM Sales_Daily s
+        JOIN Category c ON c.Category_ID = s.Category_ID
+        JOIN Campus cp ON cp.CampusID = s.CampusID
+        WHERE s.Sales_Date BETWEEN ? AND ?
+        ORDER BY s.Sales_Date
+        """
+        return self.fetch_data(query, (start_date, end_date), replica_ok=True, timeout=10)
+
+    # ==================== PARQUET EXPORT ====================
+
+    def get_export_upper_bound(self) -> int:
+        """
+        MIN_ACTIVE_ROWVERSION() as an integer: every row version below it
+        is committed, so an export run that stops there skips nothing.
+        Rowversions are local to a database, so this reads the primary.
+        Returns 0 on error, which exports nothing.
+        """
+        df = self.fetch_data("SELECT CAST(MIN_ACTIVE_ROWVERSION() AS BIGINT) AS Upper_Version", timeout=5)
+        return 0 if df.empty else int(df.iloc[0]['Upper_Version'])
+
+    def get_export_page(self, table: str, after_version: int, upper_version: int,
+                        limit: int = 50000) -> pd.DataFrame:
+        """
+        Next page of EXPORT_TABLES[table] rows changed after `after_version`
+        and before `upper_version`, in Row_Version order (keyset paging on
+        IX_<table>_RowVersion), with Row_Version as a BIGINT column.
+        Returns an empty frame when done. Errors raise, so a failed page
+        is never mistaken for the end of the table.
+        """
+        source, columns = EXPORT_TABLES[table]
+        query = f"""
+        SELECT TOP (?) {columns}, CAST(Row_Version AS BIGINT) AS Row_Version
+        FROM {source}
+        WHERE Row_Version > CAST(CAST(? AS BIGINT) AS BINARY(8))
+          AND Row_Version < CAST(CAST(? AS BIGINT) AS BINARY(8))
+        ORDER BY Row_Version
+        """
+        with self.get_cursor(read_only=True, timeout=0, replica_ok=False) as (conn, cursor):
+            cursor.execute(query, (int(limit), int(after_version), int(upper_version)))
+            return self._frame(cursor)
+
+    # ==================== ESCROW SWEEPS ====================
+
+    def release_overdue_escrows(self, grace_hours: int = 48, batch_size: int = 500) -> Tuple[bool, int, str]:
+        """
+        Release one batch of Held escrows whose scheduled pickup passed more
+        than `grace_hours` ago without a dispute: escrow -> Released, order
+        -> Delivered, verification code removed. One short transaction;
+        rows locked by live traffic are skipped (READPAST) until the next run.
+        Returns: (success, escrows_released, message)
+        """
+        query = """
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+        DECLARE @Batch TABLE (EscrowID INT PRIMARY KEY, OrderID INT NOT NULL);
+
+        BEGIN TRAN;
+
+        INSERT INTO @Batch (EscrowID, OrderID)
+        SELECT TOP (?) e.EscrowID, e.OrderID
+        FROM Escrow e WITH (UPDLOCK, READPAST, ROWLOCK)
+        JOIN [Order] o ON o.OrderID = e.OrderID
+        JOIN Order_Collection oc ON oc.Order_ID = e.OrderID
+        WHERE e.Status = N'Held'
+          AND o.Status = N'Confirmed'
+          AND oc.Scheduled_Date IS NOT NULL
+          AND DATEADD(HOUR, ?, CAST(oc.Scheduled_Date AS DATETIME)
+                             + CAST(ISNULL(oc.Scheduled_Time, '23:59:59') AS DATETIME)) < GETDATE()
+          AND NOT EXISTS (
+              SELECT 1 FROM Dispute d
+              WHERE d.EscrowID = e.EscrowID AND d.Status IN ('Open', 'In Progress')
+          )
+        ORDER BY e.EscrowID;
+
+        UPDATE e
+        SET Status = N'Released', Release_Date = GETDATE()
+        FROM Escrow e JOIN @Batch b ON b.EscrowID = e.EscrowID;
+
+        UPDATE o
+        SET Status = N'Delivered'
+        FROM [Order] o JOIN @Batch b ON b.OrderID = o.OrderID;
+
+        DELETE v FROM Escrow_Verification v JOIN @Batch b ON b.OrderID = v.OrderID;
+
+        COMMIT TRAN;
+        SELECT COUNT(*) FROM @Batch;
+        """
+        try:
+            with self.get_cursor() as (conn, cursor):
+                cursor.execute(query, (int(batch_size), int(grace_hours)))
+                released = int(cursor.fetchone()[0])
+                conn.commit()
+                self._note_write()
+            self._count('sweep_escrows_released', released)
+            return (True, released, f"{released} escrow(s) released")
+        except Exception as e:
+            print(f"Error releasing overdue escrows: {e}")
+            return (False, 0, f"Error: {str(e)}")
+
+    def expire_stale_orders(self, max_age_days: int = 7, batch_size: int = 500) -> Tuple[bool, int, int, str]:
+        """
+        Cancel one batch of Confirmed orders older than `max_age_days` that
+        never got a pickup scheduled and have no open dispute. Held escrows
+        are refunded and the units go back on the listing (a Sold listing
+        becomes Active again): checkout_cart takes them in the order's own
+        transaction, so every expired order holds its units.
+        Returns: (success, orders_expired, units_restocked, message)
+        """
+        query = """
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+        DECLARE @Batch TABLE (
+            OrderID    INT PRIMARY KEY,
+            EscrowID   INT NULL,
+            Product_ID INT NOT NULL,
+            Quantity   INT NOT NULL
+        );
+        DECLARE @StatusChanges TABLE (Seller_ID INT, Old_Status NVARCHAR(20), New_Status NVARCHAR(20));
+
+        BEGIN TRAN;
+
+        INSERT INTO @Batch (OrderID, EscrowID, Product_ID, Quantity)
+        SELECT TOP (?) o.OrderID, e.EscrowID, o.Product_ID, o.Quantity
+        FROM [Order] o WITH (UPDLOCK, READPAST, ROWLOCK)
+        LEFT JOIN Escrow e ON e.OrderID = o.OrderID
+        LEFT JOIN Order_Collection oc ON oc.Order_ID = o.OrderID
+        WHERE o.Status = N'Confirmed'
+          AND o.Order_Date < DATEADD(DAY, -?, CAST(GETDATE() AS DATE))
+          AND oc.Scheduled_Date IS NULL
+          AND (e.EscrowID IS NULL OR e.Status = N'Held')
+          AND NOT EXISTS (
+              SELECT 1 FROM Dispute d
+              WHERE d.EscrowID = e.EscrowID AND d.Status IN ('Open', 'In Progress')
+          )
+        ORDER BY o.OrderID;
+
+        UPDATE o
+        SET Status = N'Cancelled'
+        FROM [Order] o JOIN @Batch b ON b.OrderID = o.OrderID;
+
+        UPDATE e
+        SET Status = N'Refunded', Release_Date = GETDATE()
+        FROM Escrow e JOIN @Batch b ON b.EscrowID = e.EscrowID;
+
+        DELETE v FROM Escrow_Verification v JOIN @Batch b ON b.OrderID = v.OrderID;
+
+        -- One UPDATE per product however many of its orders expired
+        UPDATE p
+        SET Quantity = p.Quantity + r.Units,
+            Product_Status = CASE WHEN p.Product_Status = N'Sold' THEN N'Active' ELSE p.Product_Status END
+        OUTPUT inserted.Seller_ID, deleted.Product_Status, inserted.Product_Status INTO @StatusChanges
+        FROM Product p
+        JOIN (
+            SELECT Product_ID, SUM(Quantity) AS Units
+            FROM @Batch
+            GROUP BY Product_ID
+        ) r ON r.Product_ID = p.Product_ID;
+        """ + PRODUCT_STATUS_ACTIVITY_SQL + """
+        COMMIT TRAN;
+        SELECT COUNT(*), ISNULL(SUM(Quantity), 0) FROM @Batch;
+        """
+        try:
+            with self.get_cursor() as (conn, cursor):
+                cursor.execute(query, (int(batch_size), int(max_age_days)))
+                expired, units = cursor.fetchone()
+                conn.commit()
+                self._note_write()
+            self._count('sweep_orders_expired', int(expired))
+            self._count('sweep_units_restocked', int(units))
+            return (True, int(expired), int(units), f"{expired} order(s) expired, {units} unit(s) restocked")
+        except Exception as e:
+            print(f"Error expiring stale orders: {e}")
+            return (False, 0, 0, f"Error: {str(e)}")
+
     # ==================== HELPER METHODS ====================
     
     def get_categories(self) -> pd.DataFrame:
-        return self.fetch_data("SELECT Category_ID, Category_Name FROM Category ORDER BY Category_Name")
+        return self.fetch_data("SELECT Category_ID, Category_Name FROM Category ORDER BY Category_Name", replica_ok=True, timeout=5)
     
     def get_pickup_points(self, campus_id: int = 1) -> pd.DataFrame:
         query = """
@@ -677,12 +3114,12 @@ class DatabaseManager:
         WHERE CampusID = ?
         ORDER BY Location_Name
         """
-        return self.fetch_data(query, (campus_id,))
+        return self.fetch_data(query, (campus_id,), replica_ok=True, timeout=5)
     
     def get_dashboard_stats(self) -> Dict[str, Any]:
         """Get dashboard statistics"""
         try:
-            with self.get_cursor() as (conn, cursor):
+            with self.get_cursor(read_only=True, timeout=5) as (conn, cursor):
                 stats = {}
                 
                 cursor.execute("SELECT COUNT(*) FROM [User]")
@@ -691,7 +3128,7 @@ class DatabaseManager:
                 cursor.execute("SELECT COUNT(*) FROM Product WHERE Product_Status = 'Active'")
                 stats['active_products'] = cursor.fetchone()[0]
                 
-                cursor.execute("SELECT COUNT(*) FROM [Order]")
+                cursor.execute("SELECT (SELECT COUNT(*) FROM [Order]) + (SELECT COUNT(*) FROM Order_Archive)")
                 stats['total_orders'] = cursor.fetchone()[0]
                 
                 cursor.execute("SELECT COUNT(*) FROM Dispute WHERE Status IN ('Open', 'In Progress')")
@@ -705,33 +3142,7 @@ class DatabaseManager:
             print(f"Error fetching dashboard stats: {e}")
             return {}
     
-    def check_product_availability(self, product_id: int, quantity: int) -> Tuple[bool, int, str]:
-        """
-        Check if product has enough quantity available
-        Returns: (available, current_quantity, status)
-        """
-        try:
-            query = "SELECT Quantity, Product_Status FROM Product WHERE Product_ID = ?"
-            result = self.fetch_data(query, (product_id,))
-            
-            if result.empty:
-                return (False, 0, "Product not found")
-            
-            current_qty = int(result.iloc[0]['Quantity'])
-            status = result.iloc[0]['Product_Status']
-            
-            if status != 'Active':
-                return (False, current_qty, f"Product is {status}")
-            
-            if current_qty < quantity:
-                return (False, current_qty, f"Only {current_qty} available")
-            
-            return (True, current_qty, "Available")
-            
-        except Exception as e:
-            return (False, 0, f"Error: {str(e)}")
-    
     def get_campuses(self) -> pd.DataFrame:
         """Return list of campuses."""
         query = "SELECT CampusID, Campus_Name FROM Campus ORDER BY Campus_Name"
-        return self.fetch_data(query)
\ No newline at end of file
+        return self.fetch_data(query, replica_ok=True, timeout=5)
\ No newline at end of file
@@ -0,0 +1,594 @@
+"""
+Maintenance jobs for the campus marketplace database.
+
+Run from the project root, e.g.:
+    python jobs.py rebuild-activity-stats
+    python jobs.py publish-catalog-snapshot --interval 5
+    python jobs.py rotate-phone-key --chunk-size 2000
+    python jobs.py import-roster fall_roster.csv --provision --credentials-out creds.csv
+    python jobs.py archive-orders --older-than-days 180
+    python jobs.py sweep-escrows --interval 300
+    python jobs.py refresh-rank-scores --interval 900
+    python jobs.py build-similar-items
+    python jobs.py build-similar-items --interval 60
+    python jobs.py refresh-trending --interval 300
+    python jobs.py rollup-sales --interval 600
+    python jobs.py export-parquet --root /data/marketplace --interval 3600
+    python jobs.py replica-heartbeat --interval 1
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+from catalog import CatalogCache, catalog_facets
+from catalog_snapshot import publish_snapshot, touch_heartbeat
+from crypto_service import BatchCrypto
+from database import DatabaseManager, EXPORT_TABLES
+from parquet_export import ParquetExporter
+from ranking import compute_rank_scores
+from roster_import import RosterImporter
+from similar_items import SimilarityModel
+
+
+# ==================== JOBS ====================
+
+def rebuild_activity_stats(db: DatabaseManager, args) -> int:
+    """Recompute User_Activity_Stats from the base tables."""
+    success, written, message = db.rebuild_user_activity_stats()
+    print(f"{'✅' if success else '❌'} {message}")
+    return 0 if success else 1
+
+
+def publish_catalog_snapshot(db: DatabaseManager, args) -> int:
+    """
+    Publish the active catalog as a memory-mapped snapshot. With
+    --interval, keep running and publish a new generation whenever the
+    rowversion delta feed reports a change; otherwise just touch the
+    heartbeat so readers keep trusting the current generation. Keep
+    --interval well under the readers' max_age (120s).
+    """
+    cache = CatalogCache(db, refresh_interval=0)
+    published = 0
+    while True:
+        cache.refresh(force=True)
+        if cache.version == 0:
+            print("❌ Could not load the catalog")
+            if not args.interval:
+                return 1
+        elif cache.version != published:
+            products = cache.active_products()
+            path = publish_snapshot(products, root=args.root, keep=args.keep,
+                                    facets=catalog_facets(products))
+            published = cache.version
+            print(f"✅ Published {len(products)} listings to {path}")
+        else:
+            touch_heartbeat(args.root)
+        if not args.interval:
+            return 0
+        time.sleep(args.interval)
+
+
+def _load_checkpoint(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_checkpoint(path: str, state: dict):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def rotate_phone_key(db: DatabaseManager, args) -> int:
+    """
+    Re-encrypt [User].Encrypted_Phone under the current APP_SECRET_KEY.
+    Set APP_SECRET_KEY to the new secret and list the old one in
+    APP_PREVIOUS_KEYS before running. Walks UserID in keyset chunks, one
+    short transaction per chunk, and records progress in a checkpoint
+    file so an interrupted run resumes where it stopped.
+    """
+    state = {} if args.restart else _load_checkpoint(args.checkpoint)
+    last_id = int(state.get("last_user_id", 0))
+    rotated = int(state.get("rotated", 0))
+    unreadable = int(state.get("unreadable", 0))
+    if last_id:
+        print(f"↻ Resuming after UserID {last_id} ({rotated} rotated so far)")
+
+    started = time.monotonic()
+    with BatchCrypto(workers=args.workers) as crypto:
+        while True:
+            chunk_started = time.monotonic()
+            rows = db.get_encrypted_phones_after(last_id, args.chunk_size)
+            if not rows:
+                break
+
+            new_tokens = crypto.rotate_many([token for _, token in rows])
+            updates = [(user_id, old, new) for (user_id, old), new in zip(rows, new_tokens) if new is not None]
+            unreadable += len(rows) - len(updates)
+            rotated += db.update_encrypted_phones(updates)
+            last_id = rows[-1][0]
+            _save_checkpoint(args.checkpoint, {"last_user_id": last_id, "rotated": rotated, "unreadable": unreadable})
+
+            # Throttle to --max-rows-per-sec to leave headroom for live traffic
+            if args.max_rows_per_sec:
+                budget = len(rows) / args.max_rows_per_sec
+                elapsed = time.monotonic() - chunk_started
+                if elapsed < budget:
+                    time.sleep(budget - elapsed)
+
+    if os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    print(f"✅ Rotated {rotated} phone numbers in {time.monotonic() - started:.1f}s"
+          + (f" ({unreadable} unreadable with the configured keys, left as-is)" if unreadable else ""))
+    return 0 if not unreadable else 1
+
+
+def import_roster(db: DatabaseManager, args) -> int:
+    """
+    Load a semester roster CSV into User_Lookup and, with --provision,
+    create the students' accounts up front. Safe to re-run: existing
+    lookup rows are only renamed and existing accounts are skipped.
+    """
+    if args.provision and not args.credentials_out:
+        print("❌ --provision needs --credentials-out for the generated passwords")
+        return 2
+    started = time.monotonic()
+    importer = RosterImporter(db, provision=args.provision, campus_id=args.campus_id,
+                              workers=args.workers, credentials_out=args.credentials_out)
+    stats = importer.import_file(args.path, batch_size=args.batch_size)
+    print(f"{'✅' if not stats['failed_batches'] else '❌'} {stats['rows']} rows in "
+          f"{time.monotonic() - started:.1f}s: {stats['added']} added, {stats['renamed']} renamed, "
+          f"{stats['provisioned']} accounts provisioned"
+          + (f", {stats['failed_batches']} batches failed" if stats['failed_batches'] else ""))
+    return 0 if not stats['failed_batches'] else 1
+
+
+def archive_orders(db: DatabaseManager, args) -> int:
+    """
+    Move finished orders older than --older-than-days into the archive
+    tables, one short transaction per --batch-size orders, pausing
+    between batches so live checkouts keep getting the locks they need.
+    """
+    cutoff = date.today() - timedelta(days=args.older_than_days)
+    started = time.monotonic()
+    total = batches = 0
+    while not args.max_batches or batches < args.max_batches:
+        success, archived, message = db.archive_orders_batch(cutoff, args.batch_size)
+        if not success:
+            print(f"❌ {message} (after {total} orders)")
+            return 1
+        if archived == 0:
+            break
+        total += archived
+        batches += 1
+        print(f"… batch {batches}: {archived} orders ({total} total)")
+        time.sleep(args.pause)
+    print(f"✅ Archived {total} orders placed before {cutoff} in {batches} batches, "
+          f"{time.monotonic() - started:.1f}s")
+    return 0
+
+
+def _drain(step, batch_size: int, pause: float, max_batches: int):
+    """Call `step()` until a batch comes back smaller than `batch_size`."""
+    batches = 0
+    while not max_batches or batches < max_batches:
+        result = step()
+        if not result[0]:
+            return result, batches
+        batches += 1
+        if result[1] < batch_size:
+            break
+        time.sleep(pause)
+    return result, batches
+
+
+def sweep_escrows(db: DatabaseManager, args) -> int:
+    """
+    Auto-release escrows whose pickup passed --grace-hours ago, expire
+    orders that never got a pickup within --expire-after-days (refund +
+    restock) and delete expired cart holds. Each sweep works in
+    --batch-size transactions; with
+    --interval it runs as a scheduler. Prints one JSON line of metrics
+    per run.
+    """
+    while True:
+        started = time.monotonic()
+        run = {"released": 0, "expired": 0, "restocked_units": 0, "holds_released": 0, "batches": 0, "errors": 0}
+
+        def release():
+            result = db.release_overdue_escrows(args.grace_hours, args.batch_size)
+            run["released"] += result[1]
+            return result
+
+        def expire():
+            result = db.expire_stale_orders(args.expire_after_days, args.batch_size)
+            run["expired"] += result[1]
+            run["restocked_units"] += result[2]
+            return result
+
+        def holds():
+            result = db.release_expired_holds(args.batch_size)
+            run["holds_released"] += result[1]
+            return result
+
+        for step in (release, expire, holds):
+            result, batches = _drain(step, args.batch_size, args.pause, args.max_batches)
+            run["batches"] += batches
+            if not result[0]:
+                run["errors"] += 1
+                print(f"❌ {result[-1]}")
+
+        run["seconds"] = round(time.monotonic() - started, 3)
+        print(json.dumps({"job": "sweep-escrows", "at": time.strftime("%Y-%m-%dT%H:%M:%S"), **run}), flush=True)
+        if not args.interval:
+            return 0 if not run["errors"] else 1
+        time.sleep(args.interval)
+
+
+def refresh_rank_scores(db: DatabaseManager, args) -> int:
+    """
+    Recompute Product.Rank_Score for every active listing in one
+    vectorized pass and write back only the scores that moved by at least
+    --min-change, in --chunk-size transactions.
+    """
+    while True:
+        started = time.monotonic()
+        failed = 0
+        inputs = db.get_rank_inputs(velocity_days=args.velocity_days)
+        if inputs.empty:
+            print("ℹ️ No active listings to rank")
+        else:
+            scores = compute_rank_scores(inputs)
+            changed = (abs(scores - inputs['Rank_Score'].to_numpy(dtype=float)) >= args.min_change)
+            rows = list(zip(inputs['Product_ID'].to_numpy()[changed].tolist(), scores[changed].tolist()))
+            updated = 0
+            for i in range(0, len(rows), args.chunk_size):
+                success, count, message = db.update_rank_scores(rows[i:i + args.chunk_size])
+                if not success:
+                    # Skip the chunk; the next refresh retries whatever is still stale
+                    failed += 1
+                    print(f"❌ {message}")
+                updated += count
+            print(f"{'❌' if failed else '✅'} Ranked {len(inputs)} listings, {updated} scores updated"
+                  f"{f', {failed} chunk(s) failed' if failed else ''} in {time.monotonic() - started:.1f}s")
+        if not args.interval:
+            return 1 if failed else 0
+        time.sleep(args.interval)
+
+
+def _similarity_documents(db: DatabaseManager, after_id: int, page_size: int) -> pd.DataFrame:
+    """Every active listing with Product_ID > after_id, paged by key."""
+    pages = []
+    while True:
+        page = db.get_similarity_documents(after_id, page_size)
+        if page.empty:
+            break
+        pages.append(page)
+        after_id = int(page['Product_ID'].iloc[-1])
+        if len(page) < page_size:
+            break
+    return pd.concat(pages, ignore_index=True) if pages else pd.DataFrame()
+
+
+def _write_neighbor_lists(db: DatabaseManager, lists, chunk_size: int) -> int:
+    """Replace neighbor lists chunk_size products at a time; returns rows written."""
+    written = 0
+    product_ids, rows = [], []
+    for product_id, neighbors in lists:
+        product_ids.append(product_id)
+        rows.extend((product_id, other, score) for other, score in neighbors)
+        if len(product_ids) >= chunk_size:
+            written += db.replace_similar_products(product_ids, rows)
+            product_ids, rows = [], []
+    if product_ids:
+        written += db.replace_similar_products(product_ids, rows)
+    return written
+
+
+def build_similar_items(db: DatabaseManager, args) -> int:
+    """
+    Fit the TF-IDF model over every active listing and rebuild
+    Product_Similar. With --interval, start from the saved model instead
+    (unless --rebuild) and keep folding in listings added since: each gets
+    its own top-k list, and is merged into the lists of its neighbors.
+    """
+    model = None if args.rebuild or not args.interval else SimilarityModel.load(args.root)
+    if model is None:
+        started = time.monotonic()
+        docs = _similarity_documents(db, 0, args.page_size)
+        if docs.empty:
+            print("ℹ️ No active listings to index")
+            return 0
+        model = SimilarityModel.fit(docs)
+        written = _write_neighbor_lists(
+            db, model.neighbors(model.matrix, model.product_ids, model.categories,
+                                k=args.k, min_score=args.min_score),
+            args.chunk_size
+        )
+        pruned = db.prune_similar_products()
+        model.save(args.root)
+        print(f"✅ Indexed {len(docs)} listings ({len(model.vocabulary)} terms), {written} neighbors written, "
+              f"{pruned} stale rows pruned in {time.monotonic() - started:.1f}s")
+
+    while args.interval:
+        time.sleep(args.interval)
+        docs = _similarity_documents(db, model.watermark, args.page_size)
+        if docs.empty:
+            continue
+        vectors = model.transform(docs)
+        model.add(docs, vectors)
+        lists = list(model.neighbors(vectors, docs['Product_ID'].to_numpy(), model.categories[-len(docs):],
+                                     k=args.k, min_score=args.min_score))
+        written = _write_neighbor_lists(db, lists, args.chunk_size)
+        reverse = [(other, product_id, score) for product_id, neighbors in lists for other, score in neighbors]
+        step = args.chunk_size * args.k
+        for i in range(0, len(reverse), step):
+            written += db.merge_similar_products(reverse[i:i + step], k=args.k)
+        model.save(args.root)
+        print(f"✅ Added {len(docs)} new listings, {written} neighbor rows written")
+    return 0
+
+
+def refresh_trending(db: DatabaseManager, args) -> int:
+    """
+    Rebuild Trending_Product from recent Product_Stats and delete counter
+    buckets older than --retain-days. With --interval it runs as a
+    scheduler.
+    """
+    while True:
+        started = time.monotonic()
+        success, written, message = db.refresh_trending_products(
+            window_hours=args.window_hours, half_life_hours=args.half_life_hours,
+            top_n=args.top_n, click_weight=args.click_weight
+        )
+        print(f"{'✅' if success else '❌'} {message} in {time.monotonic() - started:.1f}s")
+        result, _ = _drain(lambda: db.prune_product_stats(args.retain_days, args.batch_size),
+                           args.batch_size, 0.2, 0)
+        if not result[0]:
+            print(f"❌ {result[-1]}")
+        if not args.interval:
+            return 0 if success and result[0] else 1
+        time.sleep(args.interval)
+
+
+def rollup_sales(db: DatabaseManager, args) -> int:
+    """
+    Maintain the Sales_Daily rollup. Each run recomputes from --lag-days
+    before the watermark through today, --chunk-days per transaction; the
+    watermark moves with every committed range, so an interrupted run
+    resumes where it stopped. The first run (or --rebuild) starts from the
+    earliest order. With --interval it runs as a scheduler.
+    """
+    rebuild = args.rebuild
+    while True:
+        started = time.monotonic()
+        today = date.today()
+        watermark = None if rebuild else db.get_rollup_watermark()
+        if watermark is None:
+            start = db.get_first_sales_date() or today
+        else:
+            start = min(watermark - timedelta(days=args.lag_days), today)
+        rebuild = False
+
+        days, written, failed = 0, 0, False
+        while start <= today:
+            end = min(start + timedelta(days=args.chunk_days - 1), today)
+            success, rows, message = db.rollup_sales_daily(start, end)
+            if not success:
+                print(f"❌ {message}")
+                failed = True
+                break
+            days += (end - start).days + 1
+            written += rows
+            start = end + timedelta(days=1)
+        print(f"{'❌' if failed else '✅'} Rolled up {days} day(s), {written} row(s) "
+              f"in {time.monotonic() - started:.1f}s")
+        if not args.interval:
+            return 1 if failed else 0
+        time.sleep(args.interval)
+
+
+def export_parquet(db: DatabaseManager, args) -> int:
+    """
+    Export rows changed since the last run to Parquet files under --root,
+    one file per --page-size page and table. Watermarks are kept next to
+    the files, so a scheduled or interrupted run picks up where the last
+    one stopped; --restart re-exports the chosen tables from scratch.
+    """
+    tables = args.tables.split(",") if args.tables else list(EXPORT_TABLES)
+    unknown = [t for t in tables if t not in EXPORT_TABLES]
+    if unknown:
+        print(f"❌ Unknown table(s): {', '.join(unknown)} (choose from {', '.join(EXPORT_TABLES)})")
+        return 2
+    exporter = ParquetExporter(db, root=args.root, page_size=args.page_size, pause=args.pause)
+    if args.restart:
+        exporter.reset(tables)
+    while True:
+        started = time.monotonic()
+        result = exporter.run(tables, max_pages=args.max_pages)
+        failed = [table for table, totals in result.items() if "error" in totals]
+        if not result:
+            print("❌ Could not read the current row version")
+        elif failed:
+            print(f"❌ Export failed for {', '.join(failed)}")
+        print(json.dumps({"job": "export-parquet", "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                          "tables": result, "seconds": round(time.monotonic() - started, 3)}), flush=True)
+        if not args.interval:
+            return 0 if result and not failed else 1
+        time.sleep(args.interval)
+
+
+def replica_heartbeat(db: DatabaseManager, args) -> int:
+    """
+    Stamp dbo.Replica_Heartbeat on the primary every --interval seconds.
+    App processes only read the stamp to measure replica lag, so run
+    exactly one of these wherever DB_READ_REPLICAS is set, with --interval
+    well under DB_REPLICA_MAX_LAG.
+    """
+    failures = 0
+    while True:
+        if db.stamp_replica_heartbeat():
+            failures = 0
+        else:
+            failures += 1
+            print(f"❌ Could not stamp the replica heartbeat ({failures} in a row)", flush=True)
+        if not args.interval:
+            return 0 if not failures else 1
+        time.sleep(args.interval)
+
+
+# ==================== CLI ====================
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Campus Marketplace maintenance jobs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = subparsers.add_parser(
+        "rebuild-activity-stats",
+        help="Recompute the precomputed per-user activity summary"
+    )
+    rebuild.set_defaults(func=rebuild_activity_stats)
+
+    snapshot = subparsers.add_parser(
+        "publish-catalog-snapshot",
+        help="Write the active catalog to a shared memory-mapped snapshot"
+    )
+    snapshot.add_argument("--root", default=None, help="Snapshot directory (default: $CATALOG_SNAPSHOT_DIR or ./snapshots)")
+    snapshot.add_argument("--interval", type=float, default=0, help="Seconds between checks; 0 = publish once and exit")
+    snapshot.add_argument("--keep", type=int, default=3, help="Generations to keep on disk")
+    snapshot.set_defaults(func=publish_catalog_snapshot)
+
+    rotate = subparsers.add_parser(
+        "rotate-phone-key",
+        help="Re-encrypt Encrypted_Phone under the current APP_SECRET_KEY (resumable)"
+    )
+    rotate.add_argument("--chunk-size", type=int, default=2000, help="Users per transaction (keep under 5000)")
+    rotate.add_argument("--workers", type=int, default=None, help="Crypto processes (default: CPU count)")
+    rotate.add_argument("--max-rows-per-sec", type=float, default=20000, help="Throttle; 0 = unthrottled")
+    rotate.add_argument("--checkpoint", default=".rotate-phone-key.checkpoint", help="Progress file for resuming")
+    rotate.add_argument("--restart", action="store_true", help="Ignore any checkpoint and start from the first user")
+    rotate.set_defaults(func=rotate_phone_key)
+
+    roster = subparsers.add_parser(
+        "import-roster",
+        help="Bulk-load a roster CSV into User_Lookup (and optionally create accounts)"
+    )
+    roster.add_argument("path", help="CSV with email,name[,phone,campus_id,password] columns")
+    roster.add_argument("--batch-size", type=int, default=5000, help="Rows per round-trip")
+    roster.add_argument("--provision", action="store_true", help="Also create verified [User] rows")
+    roster.add_argument("--campus-id", type=int, default=1, help="CampusID for rows without a campus_id column")
+    roster.add_argument("--workers", type=int, default=None, help="Hashing processes (default: CPU count)")
+    roster.add_argument("--credentials-out", default=None, help="CSV to append email,password for generated passwords")
+    roster.set_defaults(func=import_roster)
+
+    archive = subparsers.add_parser(
+        "archive-orders",
+        help="Move finished orders past the cutoff into the archive tables"
+    )
+    archive.add_argument("--older-than-days", type=int, default=180, help="Archive orders placed before today minus this many days")
+    archive.add_argument("--batch-size", type=int, default=1000, help="Orders per transaction (keep under ~2000 to avoid lock escalation)")
+    archive.add_argument("--pause", type=float, default=0.5, help="Seconds to sleep between batches")
+    archive.add_argument("--max-batches", type=int, default=0, help="Stop after this many batches; 0 = until done")
+    archive.set_defaults(func=archive_orders)
+
+    sweep = subparsers.add_parser(
+        "sweep-escrows",
+        help="Auto-release overdue escrows, expire stale unscheduled orders, drop expired cart holds"
+    )
+    sweep.add_argument("--grace-hours", type=int, default=48, help="Hours after the scheduled pickup before auto-release")
+    sweep.add_argument("--expire-after-days", type=int, default=7, help="Cancel unscheduled Confirmed orders older than this")
+    sweep.add_argument("--batch-size", type=int, default=500, help="Rows per transaction")
+    sweep.add_argument("--pause", type=float, default=0.2, help="Seconds to sleep between batches")
+    sweep.add_argument("--max-batches", type=int, default=0, help="Per sweep and step; 0 = until done")
+    sweep.add_argument("--interval", type=float, default=0, help="Seconds between sweeps; 0 = run once and exit")
+    sweep.set_defaults(func=sweep_escrows)
+
+    rank = subparsers.add_parser(
+        "refresh-rank-scores",
+        help="Recompute Product.Rank_Score for the Recommended sort"
+    )
+    rank.add_argument("--velocity-days", type=int, default=14, help="Window for the sales-velocity signal")
+    rank.add_argument("--min-change", type=float, default=0.5, help="Skip writes for scores that moved less than this (0-100 scale)")
+    rank.add_argument("--chunk-size", type=int, default=2000, help="Products per transaction")
+    rank.add_argument("--interval", type=float, default=0, help="Seconds between refreshes; 0 = run once and exit")
+    rank.set_defaults(func=refresh_rank_scores)
+
+    similar = subparsers.add_parser(
+        "build-similar-items",
+        help="Precompute the Similar listings table (TF-IDF over name, description, category)"
+    )
+    similar.add_argument("--root", default=None, help="Model directory (default: $SIMILAR_MODEL_DIR or ./models/similar_items)")
+    similar.add_argument("--k", type=int, default=20, help="Neighbors stored per listing")
+    similar.add_argument("--min-score", type=float, default=0.05, help="Drop neighbors scoring below this (0-1)")
+    similar.add_argument("--page-size", type=int, default=50000, help="Listings read per query")
+    similar.add_argument("--chunk-size", type=int, default=200, help="Listings per write transaction (x k rows)")
+    similar.add_argument("--interval", type=float, default=0,
+                         help="Seconds between checks for new listings; 0 = full rebuild once and exit")
+    similar.add_argument("--rebuild", action="store_true", help="With --interval, do a full rebuild before following")
+    similar.set_defaults(func=build_similar_items)
+
+    trending = subparsers.add_parser(
+        "refresh-trending",
+        help="Recompute Trending on campus from the flushed view/click counters"
+    )
+    trending.add_argument("--window-hours", type=int, default=48, help="Counter history considered")
+    trending.add_argument("--half-life-hours", type=float, default=12.0, help="Age at which activity counts half")
+    trending.add_argument("--top-n", type=int, default=20, help="Listings kept per campus")
+    trending.add_argument("--click-weight", type=float, default=3.0, help="A cart click counts as this many views")
+    trending.add_argument("--retain-days", type=int, default=14, help="Delete counter buckets older than this")
+    trending.add_argument("--batch-size", type=int, default=5000, help="Counter rows deleted per transaction")
+    trending.add_argument("--interval", type=float, default=0, help="Seconds between refreshes; 0 = run once and exit")
+    trending.set_defaults(func=refresh_trending)
+
+    rollup = subparsers.add_parser(
+        "rollup-sales",
+        help="Update the daily sales rollup behind the admin Analytics tab"
+    )
+    rollup.add_argument("--lag-days", type=int, default=1,
+                        help="Days before the watermark recomputed each run (late commits, day boundaries)")
+    rollup.add_argument("--chunk-days", type=int, default=31, help="Days per transaction")
+    rollup.add_argument("--rebuild", action="store_true", help="Recompute everything from the earliest order")
+    rollup.add_argument("--interval", type=float, default=0, help="Seconds between runs; 0 = run once and exit")
+    rollup.set_defaults(func=rollup_sales)
+
+    export = subparsers.add_parser(
+        "export-parquet",
+        help="Incrementally export tables to partitioned Parquet files for offline analytics"
+    )
+    export.add_argument("--root", default=None, help="Export directory (default: $EXPORT_DIR or ./exports)")
+    export.add_argument("--tables", default=None,
+                        help=f"Comma-separated subset of {','.join(EXPORT_TABLES)} (default: all)")
+    export.add_argument("--page-size", type=int, default=50000, help="Rows per query and per file")
+    export.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between pages")
+    export.add_argument("--max-pages", type=int, default=0, help="Per table and run; 0 = until caught up")
+    export.add_argument("--restart", action="store_true", help="Drop the watermarks and export everything again")
+    export.add_argument("--interval", type=float, default=0, help="Seconds between runs; 0 = run once and exit")
+    export.set_defaults(func=export_parquet)
+
+    heartbeat = subparsers.add_parser(
+        "replica-heartbeat",
+        help="Stamp the primary's replica heartbeat on a fixed cadence (read-replica lag checks)"
+    )
+    heartbeat.add_argument("--interval", type=float, default=1.0, help="Seconds between stamps; 0 = stamp once and exit")
+    heartbeat.set_defaults(func=replica_heartbeat)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    db = DatabaseManager()
+    return args.func(db, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Local, content-addressed store for product images.
+
+- Originals live at  <root>/originals/<aa>/<sha256>.<ext>
+- Thumbnails live at <root>/thumbs/<aa>/<sha256>.jpg
+
+Uploads are named by the SHA-256 of their bytes, so re-uploading the same
+photo is free and a stored file never changes. Thumbnails are rendered
+once, off the request path, by a small background worker pool.
+"""
+import hashlib
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+from PIL import Image
+
+THUMBNAIL_SIZE = (480, 480)
+THUMBNAIL_QUALITY = 85
+
+# Accepted upload content types -> file extension
+IMAGE_TYPES = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+    'image/gif': 'gif',
+}
+
+
+class MediaStore:
+    def __init__(self, root: str = None, workers: int = 2):
+        self.root = root or os.environ.get(
+            "MEDIA_ROOT",
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "media")
+        )
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnailer")
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    # ==================== PATHS ====================
+
+    @staticmethod
+    def is_local(media_link) -> bool:
+        """True for links created by this store (as opposed to external URLs)."""
+        return isinstance(media_link, str) and media_link.startswith("originals/")
+
+    def path_for(self, media_link: str) -> str:
+        return os.path.join(self.root, *media_link.split("/"))
+
+    @staticmethod
+    def thumbnail_link(media_link: str) -> str:
+        digest = os.path.splitext(media_link.rsplit("/", 1)[-1])[0]
+        return f"thumbs/{digest[:2]}/{digest}.jpg"
+
+    # ==================== WRITES ====================
+
+    def save_upload(self, data: bytes, content_type: str) -> str:
+        """
+        Store an uploaded image and queue its thumbnail.
+        Returns the Media_link to record in Product_Media.
+        """
+        ext = IMAGE_TYPES.get(content_type)
+        if ext is None:
+            raise ValueError(f"Unsupported image type: {content_type}")
+
+        digest = hashlib.sha256(data).hexdigest()
+        media_link = f"originals/{digest[:2]}/{digest}.{ext}"
+        path = self.path_for(media_link)
+        if not os.path.exists(path):
+            self._write_atomic(path, data)
+
+        self.schedule_thumbnail(media_link)
+        return media_link
+
+    def schedule_thumbnail(self, media_link: str) -> Optional[Future]:
+        """Render the thumbnail in the background unless it exists or is already queued."""
+        if not self.is_local(media_link):
+            return None
+        if os.path.exists(self.path_for(self.thumbnail_link(media_link))):
+            return None
+        with self._lock:
+            future = self._pending.get(media_link)
+            if future is None:
+                future = self._pool.submit(self._render_thumbnail, media_link)
+                self._pending[media_link] = future
+                future.add_done_callback(lambda _: self._forget(media_link))
+            return future
+
+    def _forget(self, media_link: str):
+        with self._lock:
+            self._pending.pop(media_link, None)
+
+    def _render_thumbnail(self, media_link: str):
+        source = self.path_for(media_link)
+        target = self.path_for(self.thumbnail_link(media_link))
+        try:
+            with Image.open(source) as img:
+                img.thumbnail(THUMBNAIL_SIZE)
+                if img.mode not in ("RGB", "L"):
+                    img = img.convert("RGB")
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+                img.save(tmp, "JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
+                os.replace(tmp, target)
+        except Exception as e:
+            print(f"Error rendering thumbnail for {media_link}: {e}")
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    # ==================== READS ====================
+
+    def thumbnail_path(self, media_link) -> Optional[str]:
+        """
+        Path of the thumbnail on disk, or None if it isn't ready yet
+        (in which case rendering is queued so the next rerun has it).
+        """
+        if not self.is_local(media_link):
+            return None
+        path = self.path_for(self.thumbnail_link(media_link))
+        if os.path.exists(path):
+            return path
+        if os.path.exists(self.path_for(media_link)):
+            self.schedule_thumbnail(media_link)
+        return None
+
+    def original_path(self, media_link) -> Optional[str]:
+        if not self.is_local(media_link):
+            return None
+        path = self.path_for(media_link)
+        return path if os.path.exists(path) else None
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
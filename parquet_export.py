@@ -0,0 +1,133 @@
+"""
+Incremental Parquet export of the marketplace tables for offline
+analytics, so analyses read files instead of the production database.
+
+Every exported table (database.EXPORT_TABLES) carries a Row_Version
+column, so each run reads only rows inserted or changed since the last
+one: keyset pages of `page_size` rows in Row_Version order, below
+MIN_ACTIVE_ROWVERSION() taken at the start of the run. Each page becomes
+one file, so memory stays bounded by one page whatever the table size:
+
+    <root>/<table>/export_date=YYYY-MM-DD/part-<first>-<last>.parquet
+
+The per-table watermark lives in <root>/_export_state.json and moves only
+after a page's file is in place, so an interrupted run resumes from the
+last finished page.
+
+The files are a change log, not a mirror: a row updated between runs
+appears again with a higher Row_Version, and delivery is at-least-once.
+Readers keep the highest Row_Version per primary key. The archive
+tables are exported too: an order moved by python jobs.py archive-orders
+leaves the hot table's files as last exported and shows up once in the
+matching *_Archive files, including orders archived before the first
+export.
+"""
+import json
+import os
+import time
+from datetime import date
+from typing import Dict, Iterable, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from database import DatabaseManager, EXPORT_TABLES
+
+STATE_FILE = "_export_state.json"
+
+
+def default_root() -> str:
+    return os.environ.get(
+        "EXPORT_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "exports")
+    )
+
+
+class ParquetExporter:
+    def __init__(self, db: DatabaseManager, root: str = None, page_size: int = 50000,
+                 compression: str = "zstd", pause: float = 0.0):
+        self.db = db
+        self.root = root or default_root()
+        self.page_size = page_size
+        self.compression = compression
+        # Seconds between pages, to leave headroom for live traffic
+        self.pause = pause
+        os.makedirs(self.root, exist_ok=True)
+        self.state = self._load_state()
+
+    # ==================== STATE ====================
+
+    def _state_path(self) -> str:
+        return os.path.join(self.root, STATE_FILE)
+
+    def _load_state(self) -> Dict[str, Dict[str, int]]:
+        try:
+            with open(self._state_path()) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        tmp = f"{self._state_path()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+        os.replace(tmp, self._state_path())
+
+    def watermark(self, table: str) -> int:
+        return int(self.state.get(table, {}).get("last_version", 0))
+
+    def reset(self, tables: Iterable[str]):
+        """Forget the watermarks of `tables`; their next export starts from scratch."""
+        for table in tables:
+            self.state.pop(table, None)
+        self._save_state()
+
+    # ==================== EXPORT ====================
+
+    def _write_page(self, table: str, page, export_date: date) -> str:
+        first, last = int(page['Row_Version'].iloc[0]), int(page['Row_Version'].iloc[-1])
+        directory = os.path.join(self.root, table, f"export_date={export_date.isoformat()}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{first:016x}-{last:016x}.parquet")
+        tmp = f"{path}.tmp"
+        pq.write_table(pa.Table.from_pandas(page, preserve_index=False), tmp, compression=self.compression)
+        os.replace(tmp, path)
+        return path
+
+    def export_table(self, table: str, upper_version: int, max_pages: int = 0) -> Dict[str, int]:
+        """
+        Export `table` rows changed since its watermark and below
+        `upper_version`, one file per page. Returns {'rows', 'files'},
+        plus 'error' when a page failed; pages written before it are kept.
+        """
+        after = self.watermark(table)
+        export_date = date.today()
+        rows = files = 0
+        while not max_pages or files < max_pages:
+            try:
+                page = self.db.get_export_page(table, after, upper_version, self.page_size)
+            except Exception as e:
+                print(f"Error exporting {table} after row version {after}: {e}")
+                return {"rows": rows, "files": files, "error": str(e)}
+            if page.empty:
+                break
+            self._write_page(table, page, export_date)
+            after = int(page['Row_Version'].iloc[-1])
+            rows += len(page)
+            files += 1
+            totals = self.state.setdefault(table, {"last_version": 0, "rows": 0, "files": 0})
+            totals["last_version"] = after
+            totals["rows"] += len(page)
+            totals["files"] += 1
+            self._save_state()
+            if len(page) < self.page_size:
+                break
+            time.sleep(self.pause)
+        return {"rows": rows, "files": files}
+
+    def run(self, tables: Optional[Iterable[str]] = None, max_pages: int = 0) -> Dict[str, Dict[str, int]]:
+        """Export every table in `tables` (default: all of EXPORT_TABLES) up to one common upper bound."""
+        upper = self.db.get_export_upper_bound()
+        if not upper:
+            return {}
+        return {table: self.export_table(table, upper, max_pages) for table in (tables or EXPORT_TABLES)}
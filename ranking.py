@@ -0,0 +1,72 @@
+"""
+"Recommended" ranking score for active listings.
+
+Scores are computed offline in one vectorized pass over every active
+product (python jobs.py refresh-rank-scores) and persisted in
+Product.Rank_Score, so the marketplace sorts on a stored, indexed column
+(IX_Product_Rank) instead of computing anything per request.
+
+Each signal is scaled to 0..1 and the weighted sum is reported on 0..100:
+    rating    seller Agg_Seller_Rating, Bayesian-smoothed toward the
+              marketplace mean so one 5-star review doesn't beat fifty 4.8s
+    recency   exponential decay of Created_date (half-life in days)
+    discount  (Standard_price - Unit_price) / Standard_price
+    velocity  units ordered recently, saturating
+"""
+from datetime import datetime
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+RANK_WEIGHTS: Dict[str, float] = {
+    'rating': 0.35,
+    'recency': 0.30,
+    'discount': 0.20,
+    'velocity': 0.15,
+}
+
+# Ratings a seller needs before their own average outweighs the prior
+PRIOR_WEIGHT = 5.0
+HALF_LIFE_DAYS = 14.0
+# Recent units at which velocity reaches ~63% of its maximum
+VELOCITY_SCALE = 3.0
+
+
+def compute_rank_scores(inputs: pd.DataFrame, now: datetime = None,
+                        weights: Dict[str, float] = None) -> np.ndarray:
+    """
+    Rank_Score (0..100, two decimals) for each row of `inputs`, as returned
+    by DatabaseManager.get_rank_inputs().
+    """
+    if inputs.empty:
+        return np.zeros(0)
+    weights = weights or RANK_WEIGHTS
+    now = pd.Timestamp(now or datetime.now())
+
+    rating = inputs['Seller_Rating'].fillna(0).to_numpy(dtype=float)
+    count = inputs['Seller_Rating_Count'].fillna(0).to_numpy(dtype=float)
+    rated = count > 0
+    prior = float(np.average(rating[rated], weights=count[rated])) if rated.any() else 3.0
+    smoothed = (PRIOR_WEIGHT * prior + count * rating) / (PRIOR_WEIGHT + count)
+    rating_signal = np.clip((smoothed - 1.0) / 4.0, 0.0, 1.0)
+
+    created = pd.to_datetime(inputs['Created_date'])
+    age_days = np.maximum((now - created).dt.total_seconds().to_numpy() / 86400.0, 0.0)
+    recency_signal = np.exp2(-age_days / HALF_LIFE_DAYS)
+
+    standard = inputs['Standard_price'].to_numpy(dtype=float)
+    unit = inputs['Unit_price'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        discount_signal = np.where(standard > 0, (standard - unit) / standard, 0.0)
+    discount_signal = np.clip(discount_signal, 0.0, 1.0)
+
+    units = inputs['Recent_Units'].fillna(0).to_numpy(dtype=float)
+    velocity_signal = 1.0 - np.exp(-units / VELOCITY_SCALE)
+
+    total = sum(weights.values())
+    score = (weights['rating'] * rating_signal
+             + weights['recency'] * recency_signal
+             + weights['discount'] * discount_signal
+             + weights['velocity'] * velocity_signal) / total
+    return np.round(score * 100.0, 2)
@@ -0,0 +1,123 @@
+"""
+Semester roster import: streams a CSV of students into User_Lookup (the
+registration whitelist) and can pre-provision their [User] accounts.
+
+The file is read in fixed-size batches, so memory stays flat however
+large the roster is. Each batch is one fast_executemany + MERGE round-trip
+(DatabaseManager.upsert_user_lookup); with provisioning on, passwords are
+hashed across a process pool and the accounts are created with one
+set-based INSERT per batch (DatabaseManager.provision_users).
+
+Expected columns (header row required, names case-insensitive):
+    email, name                   always
+    phone, campus_id, password    optional, used when provisioning
+Rows without a password get a random one, written to the credentials
+file so it can be handed out.
+"""
+import csv
+import os
+import secrets
+from typing import Dict, Iterator, List, Optional
+
+from crypto_service import BatchCrypto
+from database import DatabaseManager
+
+
+def read_roster(path: str, batch_size: int) -> Iterator[List[Dict[str, str]]]:
+    """Yield batches of normalized rows; rows without an email or name are skipped."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        batch = []
+        for row in reader:
+            row = {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+            if not row.get("email") or not row.get("name"):
+                continue
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+class RosterImporter:
+    def __init__(self, db: DatabaseManager, provision: bool = False, campus_id: int = 1,
+                 workers: int = None, credentials_out: Optional[str] = None):
+        self.db = db
+        self.provision = provision
+        self.campus_id = campus_id
+        self.credentials_out = credentials_out
+        self.crypto = BatchCrypto(workers=workers) if provision else None
+        self.stats = {"rows": 0, "added": 0, "renamed": 0, "provisioned": 0, "failed_batches": 0}
+        self._credentials = None
+
+    def import_file(self, path: str, batch_size: int = 5000) -> Dict[str, int]:
+        try:
+            for batch in read_roster(path, batch_size):
+                self.import_batch(batch)
+                print(f"… {self.stats['rows']} rows: {self.stats['added']} added, "
+                      f"{self.stats['renamed']} renamed, {self.stats['provisioned']} provisioned")
+        finally:
+            self.close()
+        return self.stats
+
+    def import_batch(self, batch: List[Dict[str, str]]):
+        self.stats["rows"] += len(batch)
+        success, added, renamed, message = self.db.upsert_user_lookup(
+            [(row["email"], row["name"]) for row in batch]
+        )
+        if not success:
+            self.stats["failed_batches"] += 1
+            print(f"❌ {message}")
+            return
+        self.stats["added"] += added
+        self.stats["renamed"] += renamed
+        if self.provision:
+            self._provision(batch)
+
+    def _provision(self, batch: List[Dict[str, str]]):
+        # Skip students who already have an account before paying for PBKDF2
+        registered = self.db.get_registered_emails([row["email"] for row in batch])
+        seen = set()
+        new_rows = []
+        for row in batch:
+            key = row["email"].lower()
+            if key not in registered and key not in seen:
+                seen.add(key)
+                new_rows.append(row)
+        if not new_rows:
+            return
+
+        passwords = [row.get("password") or secrets.token_urlsafe(12) for row in new_rows]
+        hashes = self.crypto.hash_passwords(passwords)
+        phones = self.crypto.encrypt_many([row.get("phone") or None for row in new_rows])
+
+        success, created, message = self.db.provision_users([
+            (int(row.get("campus_id") or self.campus_id), row["name"], row["email"],
+             row.get("phone", ""), pwd_hash.encode("ascii"), phone_token)
+            for row, pwd_hash, phone_token in zip(new_rows, hashes, phones)
+        ])
+        if not success:
+            self.stats["failed_batches"] += 1
+            print(f"❌ {message}")
+            return
+        self.stats["provisioned"] += len(created)
+
+        generated = {row["email"].lower(): pwd for row, pwd in zip(new_rows, passwords) if not row.get("password")}
+        for email in created:
+            if email.lower() in generated:
+                self._write_credential(email, generated[email.lower()])
+
+    def _write_credential(self, email: str, password: str):
+        if self._credentials is None:
+            fd = os.open(self.credentials_out, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+            self._credentials = os.fdopen(fd, "a", newline="", encoding="utf-8")
+        csv.writer(self._credentials).writerow([email, password])
+        self._credentials.flush()
+
+    def close(self):
+        if self.crypto is not None:
+            self.crypto.close()
+        if self._credentials is not None:
+            self._credentials.close()
+            self._credentials = None
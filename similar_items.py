@@ -0,0 +1,195 @@
+"""
+"Similar listings" engine: TF-IDF over Product_Name + Description, plus a
+same-Category_Name bonus, with top-k neighbors precomputed into
+dbo.Product_Similar.
+
+Everything here runs offline (python jobs.py build-similar-items). The
+product page only reads Product_Similar by primary key, so the model is
+never touched at request time.
+
+    full build    fit on every active listing, then score it against
+                  itself in row batches (sparse Q @ X.T) and replace each
+                  product's neighbor list
+    incremental   --interval: listings added since the saved model's
+                  watermark are vectorized with the saved vocabulary,
+                  get their own top-k, and are merged into the lists of
+                  the listings they are similar to (--rebuild does a
+                  full build first)
+
+Category is deliberately not a term: a token shared by every listing in
+a category would make each row of Q @ X.T nearly dense at catalog scale.
+Candidates come from shared text terms only, and listings in the same
+category get CATEGORY_BONUS on top of their cosine. Very common terms
+(max_df) are dropped for the same reason; batch_size bounds memory.
+
+The model (vocabulary, idf, L2-normalized document matrix, Product_IDs,
+categories) is saved under SIMILAR_MODEL_DIR (default ./models/similar_items).
+"""
+import json
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+TOKEN_RE = re.compile(r"[a-z0-9]{2,}")
+
+STOP_WORDS = frozenset("""
+a an and are as at be but by for from has have in is it its of on or that the this to was
+were will with i you my your we our me very new used good great condition item items
+""".split())
+
+# Added to the cosine of a same-category candidate; scores are rescaled to 0..1
+CATEGORY_BONUS = 0.15
+
+
+def default_root() -> str:
+    return os.environ.get(
+        "SIMILAR_MODEL_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "similar_items")
+    )
+
+
+def tokenize(name, description) -> List[str]:
+    """Lowercase alphanumeric terms; the name is counted twice so titles outweigh boilerplate."""
+    text = f"{name or ''} {name or ''} {description or ''}".lower()
+    return [t for t in TOKEN_RE.findall(text) if t not in STOP_WORDS]
+
+
+def _documents(docs: pd.DataFrame) -> Iterator[List[str]]:
+    for name, description in zip(docs['Product_Name'], docs['Description']):
+        yield tokenize(name, description)
+
+
+def _categories(docs: pd.DataFrame) -> np.ndarray:
+    return docs['Category_Name'].fillna('').astype(str).to_numpy(dtype=str)
+
+
+def _l2_normalize(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.csr_matrix(sparse.diags(1.0 / norms) @ matrix)
+
+
+class SimilarityModel:
+    def __init__(self, vocabulary: Dict[str, int], idf: np.ndarray, matrix: sparse.csr_matrix,
+                 product_ids: np.ndarray, categories: np.ndarray):
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.matrix = matrix
+        self.product_ids = product_ids
+        self.categories = categories
+
+    # ==================== FITTING ====================
+
+    @classmethod
+    def fit(cls, docs: pd.DataFrame, min_df: int = 2, max_df: float = 0.1) -> 'SimilarityModel':
+        """
+        Build vocabulary, idf and the document matrix from `docs`
+        (Product_ID, Product_Name, Description, Category_Name). Terms in
+        fewer than `min_df` listings or more than `max_df` of them (and more
+        than 1000) are dropped.
+        """
+        tokenized = list(_documents(docs))
+        df = Counter()
+        for tokens in tokenized:
+            df.update(set(tokens))
+        n = len(tokenized)
+        # max_df only bites at scale; small catalogs keep their common terms
+        max_count = max(min_df, int(max_df * n), 1000)
+        terms = sorted(t for t, c in df.items() if min_df <= c <= max_count)
+        vocabulary = {t: i for i, t in enumerate(terms)}
+        counts = np.array([df[t] for t in terms], dtype=float)
+        idf = np.log((1.0 + n) / (1.0 + counts)) + 1.0
+
+        model = cls(vocabulary, idf, sparse.csr_matrix((0, len(terms))),
+                    docs['Product_ID'].to_numpy(dtype=np.int64), _categories(docs))
+        model.matrix = model._vectorize(tokenized)
+        return model
+
+    def _vectorize(self, tokenized: Iterable[List[str]]) -> sparse.csr_matrix:
+        indptr, indices, data = [0], [], []
+        for tokens in tokenized:
+            counts = Counter(self.vocabulary[t] for t in tokens if t in self.vocabulary)
+            indices.extend(counts.keys())
+            data.extend(counts.values())
+            indptr.append(len(indices))
+        tf = sparse.csr_matrix(
+            (np.asarray(data, dtype=float), np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(indptr) - 1, len(self.vocabulary))
+        )
+        tf.data = 1.0 + np.log(tf.data)          # sublinear tf
+        return _l2_normalize(tf @ sparse.diags(self.idf))
+
+    def transform(self, docs: pd.DataFrame) -> sparse.csr_matrix:
+        """Vectorize new listings with the fitted vocabulary (unknown terms are ignored)."""
+        return self._vectorize(_documents(docs))
+
+    def add(self, docs: pd.DataFrame, vectors: sparse.csr_matrix):
+        self.matrix = sparse.vstack([self.matrix, vectors], format='csr')
+        self.product_ids = np.concatenate([self.product_ids, docs['Product_ID'].to_numpy(dtype=np.int64)])
+        self.categories = np.concatenate([self.categories, _categories(docs)])
+
+    @property
+    def watermark(self) -> int:
+        """Highest Product_ID the model has seen."""
+        return int(self.product_ids.max()) if self.product_ids.size else 0
+
+    # ==================== NEIGHBORS ====================
+
+    def neighbors(self, vectors: sparse.csr_matrix, query_ids: np.ndarray, query_categories: np.ndarray,
+                  k: int = 20, min_score: float = 0.05,
+                  batch_size: int = 256) -> Iterator[Tuple[int, List[Tuple[int, float]]]]:
+        """
+        Yield (Product_ID, [(similar Product_ID, score), ...]) with up to k
+        neighbors per query row, best first. Scores are one sparse product
+        per batch of rows; only listings sharing at least one term with the
+        query are ever materialized.
+        """
+        corpus_t = self.matrix.T.tocsr()
+        for start in range(0, vectors.shape[0], batch_size):
+            scores = (vectors[start:start + batch_size] @ corpus_t).tocsr()
+            for row in range(scores.shape[0]):
+                product_id = int(query_ids[start + row])
+                lo, hi = scores.indptr[row], scores.indptr[row + 1]
+                columns = scores.indices[lo:hi]
+                same_category = self.categories[columns] == query_categories[start + row]
+                values = (scores.data[lo:hi] + CATEGORY_BONUS * same_category) / (1.0 + CATEGORY_BONUS)
+                ids = self.product_ids[columns]
+                keep = (ids != product_id) & (values >= min_score)
+                values, ids = values[keep], ids[keep]
+                if values.size > k:
+                    top = np.argpartition(-values, k)[:k]
+                    values, ids = values[top], ids[top]
+                order = np.argsort(-values, kind='stable')
+                yield product_id, [(int(ids[i]), float(values[i])) for i in order]
+
+    # ==================== PERSISTENCE ====================
+
+    def save(self, root: str = None):
+        root = root or default_root()
+        os.makedirs(root, exist_ok=True)
+        sparse.save_npz(os.path.join(root, "matrix.tmp.npz"), self.matrix)
+        np.save(os.path.join(root, "product_ids.tmp.npy"), self.product_ids)
+        np.save(os.path.join(root, "categories.tmp.npy"), self.categories)
+        with open(os.path.join(root, "vocabulary.tmp.json"), "w") as f:
+            json.dump({'vocabulary': self.vocabulary, 'idf': self.idf.tolist()}, f)
+        for name in ("matrix.npz", "product_ids.npy", "categories.npy", "vocabulary.json"):
+            base, ext = os.path.splitext(name)
+            os.replace(os.path.join(root, f"{base}.tmp{ext}"), os.path.join(root, name))
+
+    @classmethod
+    def load(cls, root: str = None) -> Optional['SimilarityModel']:
+        root = root or default_root()
+        try:
+            with open(os.path.join(root, "vocabulary.json")) as f:
+                meta = json.load(f)
+            matrix = sparse.load_npz(os.path.join(root, "matrix.npz")).tocsr()
+            product_ids = np.load(os.path.join(root, "product_ids.npy"))
+            categories = np.load(os.path.join(root, "categories.npy"))
+        except (OSError, ValueError):
+            return None
+        return cls(meta['vocabulary'], np.asarray(meta['idf'], dtype=float), matrix, product_ids, categories)
@@ -0,0 +1,138 @@
+"""
+Coalesced in-memory view and click counters behind "Trending on campus".
+
+A product-page view must not cost a SQL Server write. record() bumps a
+(Product_ID, hour bucket) counter in process memory instead: counters are
+split across `shards` dicts by Product_ID, each behind its own lock, so
+concurrent sessions almost never wait on each other. A background thread
+swaps the shards out every `flush_interval` seconds and sends the totals
+to DatabaseManager.record_product_stats() as one aggregated upsert into
+Product_Stats, however many views happened in between.
+
+    views   product page opened (once per session and product)
+    clicks  Add to Cart / Buy Now on the product page
+
+Counts are best effort, unlike WriteBehindQueue: a failed flush is kept
+and retried at the next interval, and close() flushes at shutdown, but a
+hard crash loses at most one interval of counts.
+"""
+import atexit
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from database import DatabaseManager
+
+BUCKET_SECONDS = 3600
+KINDS = {'view': 0, 'click': 1}
+
+
+class _Shard:
+    __slots__ = ('lock', 'counts')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # (Product_ID, bucket number) -> [views, clicks]
+        self.counts: Dict[Tuple[int, int], List[int]] = {}
+
+
+class ViewCounters:
+    def __init__(self, db: DatabaseManager, shards: int = 16, flush_interval: float = 30.0,
+                 max_pending: int = 100000):
+        self.db = db
+        self.flush_interval = flush_interval
+        # Counters kept across failed flushes; beyond this they are dropped
+        self.max_pending = max_pending
+        self._shards = [_Shard() for _ in range(max(1, shards))]
+        self._pending: Dict[Tuple[int, int], List[int]] = {}
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.metrics = {'flushes': 0, 'rows_flushed': 0, 'failed_flushes': 0, 'dropped': 0}
+
+    # ==================== PRODUCERS ====================
+
+    def record(self, product_id: int, kind: str = 'view', count: int = 1):
+        """Count a 'view' or 'click' for the current hour; memory only."""
+        index = KINDS[kind]
+        product_id = int(product_id)
+        key = (product_id, int(time.time()) // BUCKET_SECONDS)
+        shard = self._shards[product_id % len(self._shards)]
+        with shard.lock:
+            counts = shard.counts.get(key)
+            if counts is None:
+                counts = shard.counts[key] = [0, 0]
+            counts[index] += count
+
+    def record_view(self, product_id: int):
+        self.record(product_id, 'view')
+
+    def record_click(self, product_id: int):
+        self.record(product_id, 'click')
+
+    # ==================== FLUSHING ====================
+
+    def _collect(self) -> Dict[Tuple[int, int], List[int]]:
+        """Swap every shard for an empty dict and merge them with leftovers of a failed flush."""
+        collected, self._pending = self._pending, {}
+        for shard in self._shards:
+            with shard.lock:
+                counts, shard.counts = shard.counts, {}
+            for key, (views, clicks) in counts.items():
+                total = collected.get(key)
+                if total is None:
+                    collected[key] = [views, clicks]
+                else:
+                    total[0] += views
+                    total[1] += clicks
+        return collected
+
+    def flush_once(self) -> int:
+        """
+        Upsert everything counted since the last flush. Returns rows sent,
+        0 when there was nothing to send, or -1 when the upsert failed.
+        """
+        with self._flush_lock:
+            collected = self._collect()
+            if not collected:
+                return 0
+            rows = [
+                (product_id, datetime.utcfromtimestamp(bucket * BUCKET_SECONDS), views, clicks)
+                for (product_id, bucket), (views, clicks) in collected.items()
+            ]
+            success, written, message = self.db.record_product_stats(rows)
+            if success:
+                self.metrics['flushes'] += 1
+                self.metrics['rows_flushed'] += written
+                return len(rows)
+
+            self.metrics['failed_flushes'] += 1
+            if len(collected) <= self.max_pending:
+                self._pending = collected
+            else:
+                self.metrics['dropped'] += len(collected)
+                print(f"View counters dropped {len(collected)} rows after a failed flush: {message}")
+            return -1
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush_once()
+
+    # ==================== LIFECYCLE ====================
+
+    def start(self) -> 'ViewCounters':
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="view-counters", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def close(self, timeout: float = 10.0):
+        """Stop the flusher and send what is left."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush_once()
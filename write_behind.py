@@ -0,0 +1,224 @@
+"""
+Durable write-behind queue for non-critical writes (ratings, and other
+kinds registered in database.WRITE_BEHIND_HANDLERS).
+
+enqueue() is a local SQLite append, so the button handler returns right
+away. A background thread drains the journal in batches through
+DatabaseManager.apply_write_behind(), one SQL Server transaction per
+batch, and deletes the entries only after that transaction commits.
+
+Delivery is at-least-once: a crash between the commit and the local
+delete replays the batch, and the server-side Write_Behind_Applied key
+table turns the replay into a no-op.
+"""
+import atexit
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from database import DatabaseManager
+
+
+class WriteBehindQueue:
+    def __init__(self, db: DatabaseManager, path: str = None, batch_size: int = 200,
+                 flush_interval: float = 0.5, max_attempts: int = 8):
+        self.db = db
+        self.path = path or os.environ.get(
+            "WRITE_BEHIND_JOURNAL",
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "write_behind.sqlite3")
+        )
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # A failing batch is split right away; an entry that still fails on
+        # its own backs off, and is parked as dead after this many attempts
+        self.max_attempts = max_attempts
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS journal (
+                seq          INTEGER PRIMARY KEY AUTOINCREMENT,
+                idem_key     TEXT    NOT NULL UNIQUE,
+                kind         TEXT    NOT NULL,
+                payload      TEXT    NOT NULL,
+                enqueued_at  REAL    NOT NULL,
+                attempts     INTEGER NOT NULL DEFAULT 0,
+                retry_at     REAL    NOT NULL DEFAULT 0,
+                dead         INTEGER NOT NULL DEFAULT 0,
+                last_error   TEXT
+            )
+        """)
+        # Journals written before per-entry backoff lack retry_at
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(journal)")}
+        if 'retry_at' not in columns:
+            self._conn.execute("ALTER TABLE journal ADD COLUMN retry_at REAL NOT NULL DEFAULT 0")
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._failures = 0
+        self.metrics = {'applied': 0, 'batches': 0, 'failed_batches': 0, 'dead': 0}
+
+    # ==================== PRODUCERS ====================
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], key: str = None) -> str:
+        """
+        Append a write to the local journal and return its idempotency key.
+        Re-enqueueing a key that is still queued is a no-op.
+        """
+        key = key or uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO journal (idem_key, kind, payload, enqueued_at) VALUES (?, ?, ?, ?)",
+                (key, kind, json.dumps(payload, default=str), time.time())
+            )
+        self._wake.set()
+        return key
+
+    def is_pending(self, key: str) -> bool:
+        """True while the write is queued locally (not yet in SQL Server)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM journal WHERE idem_key = ? AND dead = 0", (key,)
+            ).fetchone()
+        return row is not None
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM journal WHERE dead = 0").fetchone()[0]
+
+    def requeue_dead(self) -> int:
+        """Give parked entries another try (e.g. after fixing bad data)."""
+        with self._lock:
+            cursor = self._conn.execute("UPDATE journal SET dead = 0, attempts = 0, retry_at = 0 WHERE dead = 1")
+        self._wake.set()
+        return cursor.rowcount
+
+    # ==================== FLUSHING ====================
+
+    def _apply(self, rows):
+        entries = [(key, kind, json.loads(payload)) for _, key, kind, payload, _ in rows]
+        return self.db.apply_write_behind(entries)
+
+    def _remove(self, rows, applied: int):
+        seqs = [row[0] for row in rows]
+        with self._lock:
+            self._conn.execute(f"DELETE FROM journal WHERE seq IN ({','.join('?' * len(seqs))})", seqs)
+            self.metrics['applied'] += applied
+            self.metrics['batches'] += 1
+
+    def _fail(self, row, message: str):
+        """Back one entry off on its own, or park it once it is out of attempts."""
+        seq, key, _, _, attempts = row
+        attempts += 1
+        with self._lock:
+            if attempts >= self.max_attempts:
+                self._conn.execute(
+                    "UPDATE journal SET attempts = ?, last_error = ?, dead = 1 WHERE seq = ?",
+                    (attempts, message, seq)
+                )
+                self.metrics['dead'] += 1
+                print(f"Write-behind entry {key} parked after {attempts} attempts: {message}")
+            else:
+                delay = min(60.0, 2 ** min(attempts, 6)) * random.uniform(0.5, 1.0)
+                self._conn.execute(
+                    "UPDATE journal SET attempts = ?, last_error = ?, retry_at = ? WHERE seq = ?",
+                    (attempts, message, time.time() + delay, seq)
+                )
+
+    def flush_once(self) -> int:
+        """
+        Apply the oldest due batch. Returns entries removed from the journal,
+        0 when nothing is due, or -1 when nothing could be applied.
+        """
+        with self._flush_lock:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT seq, idem_key, kind, payload, attempts FROM journal "
+                    "WHERE dead = 0 AND retry_at <= ? ORDER BY seq LIMIT ?", (time.time(), self.batch_size)
+                ).fetchall()
+            if not rows:
+                return 0
+
+            # An entry that failed before is retried on its own
+            if rows[0][4] > 0:
+                rows = rows[:1]
+
+            success, applied, message = self._apply(rows)
+            if success:
+                self._remove(rows, applied)
+                return len(rows)
+
+            self.metrics['failed_batches'] += 1
+            if len(rows) == 1:
+                self._fail(rows[0], message)
+                return -1
+
+            # Split on the first failure: apply the entries one at a time so
+            # only the bad one backs off. Stop at the first that fails, so an
+            # outage costs one extra round trip rather than one per entry;
+            # the rest go out with the next batch.
+            removed = 0
+            for row in rows:
+                success, applied, message = self._apply([row])
+                if not success:
+                    self._fail(row, message)
+                    break
+                self._remove([row], applied)
+                removed += 1
+            return removed or -1
+
+    def drain(self, timeout: float = 10.0) -> bool:
+        """Flush until nothing is due or `timeout` passes. True if the journal is empty."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            result = self.flush_once()
+            if result == 0:
+                break
+            if result < 0:
+                time.sleep(min(0.5, max(0.0, deadline - time.monotonic())))
+        return self.pending_count() == 0
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            while not self._stop.is_set():
+                result = self.flush_once()
+                if result == 0:
+                    self._failures = 0
+                    break
+                if result < 0:
+                    # Back off while SQL Server is unhappy; entries stay journaled
+                    self._failures += 1
+                    delay = min(60.0, 2 ** min(self._failures, 6)) * random.uniform(0.5, 1.0)
+                    self._stop.wait(delay)
+                    break
+
+    # ==================== LIFECYCLE ====================
+
+    def start(self) -> 'WriteBehindQueue':
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def close(self, timeout: float = 10.0):
+        """Drain-on-shutdown: stop the worker and flush what is left."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.drain(timeout)
+        with self._lock:
+            self._conn.close()